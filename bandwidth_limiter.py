@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载限速
+所有下载连接共享的令牌桶限速器，支持按时段自动调整速度
+
+版本历史：
+==========
+
+v1.0 (2026-10-17)
+--------------
+- 初始版本
+  * 全局令牌桶：所有视频、音视频流、分段连接共用同一个速度上限
+  * 速度可在下载过程中随时调整，正在等待的连接立即按新速度继续
+  * 限速时段：如 "09:00-18:00 2" 表示工作时间限速 2 MB/s，时段外使用默认速度
+  * 速度为 0 时暂停所有数据传输（阻塞在条件变量上，不占用CPU），可用于按时段暂停下载
+"""
+import re
+import threading
+import time
+from datetime import datetime
+
+from job_control import JobCancelled, get_job_control
+
+
+# 速度文本：数字 + 可选单位（K/M/G，默认 MB/s）
+RATE_RE = re.compile(r'^(?P<value>\d+(?:\.\d+)?)\s*(?P<unit>[KMG]?)(?:i?B)?(?:/s)?$', re.IGNORECASE)
+RATE_UNITS = {'': 1024 * 1024, 'K': 1024, 'M': 1024 * 1024, 'G': 1024 * 1024 * 1024}
+# 表示不限速的文本
+UNLIMITED_TEXTS = ('', '不限', '不限速', '无', 'none', 'unlimited')
+# 限速时段："09:00-18:00 2"
+SCHEDULE_RULE_RE = re.compile(r'^(?P<start>\d{1,2}:\d{2})\s*[-~～到]\s*(?P<end>\d{1,2}:\d{2})\s+(?P<rate>.+)$')
+
+
+def parse_rate(text):
+    """
+    解析速度文本
+
+    Args:
+        text: 如 "2"（MB/s）、"500K"、"1.5MB/s"、"不限"
+
+    Returns:
+        float | None: 字节/秒，不限速时返回None
+
+    Raises:
+        ValueError: 无法识别的速度
+    """
+    text = text.strip()
+    if text.lower() in UNLIMITED_TEXTS:
+        return None
+    match = RATE_RE.match(text)
+    if not match:
+        raise ValueError(f'无法识别的速度: {text}')
+    return float(match.group('value')) * RATE_UNITS[match.group('unit').upper()]
+
+
+def parse_time(text):
+    """将 "HH:MM" 转换为当天的分钟数"""
+    hour, minute = (int(part) for part in text.split(':'))
+    if hour > 24 or minute > 59 or hour * 60 + minute > 24 * 60:
+        raise ValueError(f'无效的时间: {text}')
+    return hour * 60 + minute
+
+
+def parse_schedule(text):
+    """
+    解析限速时段
+
+    多个时段用分号、逗号或换行分隔，每个时段为 "开始-结束 速度"；
+    结束时间早于开始时间表示跨越午夜（如 "22:00-06:00 不限"）。
+
+    Args:
+        text: 如 "09:00-18:00 2; 18:00-09:00 不限"
+
+    Returns:
+        list: [(开始分钟, 结束分钟, 字节/秒或None, 原始文本)]
+
+    Raises:
+        ValueError: 格式错误
+    """
+    schedule = []
+    for rule in re.split(r'[;；,，\n]', text):
+        rule = rule.strip()
+        if not rule:
+            continue
+        match = SCHEDULE_RULE_RE.match(rule)
+        if not match:
+            raise ValueError(f'无法识别的时段: {rule}（格式如 09:00-18:00 2）')
+        schedule.append((parse_time(match.group('start')), parse_time(match.group('end')),
+                         parse_rate(match.group('rate')), rule))
+    return schedule
+
+
+def get_scheduled_rate(schedule, default_rate, now=None):
+    """
+    计算当前时间的限速
+
+    Args:
+        schedule: parse_schedule 的结果（先匹配的时段优先）
+        default_rate: 不在任何时段内时的速度
+        now: 当前时间（datetime），默认为现在
+
+    Returns:
+        tuple: (字节/秒或None, 匹配的时段文本或None)
+    """
+    now = now or datetime.now()
+    minute = now.hour * 60 + now.minute
+    for start, end, rate, rule in schedule:
+        if start <= end:
+            matched = start <= minute < end
+        else:
+            matched = minute >= start or minute < end
+        if matched:
+            return rate, rule
+    return default_rate, None
+
+
+class BandwidthLimiter:
+    """
+    令牌桶限速器（线程安全）
+
+    每读取一块数据后调用 consume(字节数)。令牌按速度持续补充，最多积累 BURST_SECONDS 秒的量；
+    令牌不足时允许透支当前这一块，之后的读取等待令牌补足，块大小不同的连接也能按总速度均匀分配。
+    """
+
+    # 桶容量（秒）：空闲后最多允许的突发数据量
+    BURST_SECONDS = 0.5
+    # 限速时单次读取的最大字节数（yt-dlp 的HTTP下载器会逐渐增大读取块，块越大速度越不均匀）
+    MAX_READ_SIZE = 64 * 1024
+
+    def __init__(self, rate=None):
+        """
+        Args:
+            rate: 速度上限（字节/秒），None 表示不限速，0 表示暂停
+        """
+        self._condition = threading.Condition()
+        self._rate = rate
+        self._tokens = 0.0
+        self._last_refill = time.monotonic()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def set_rate(self, rate):
+        """
+        调整速度上限（立即对所有连接生效）
+
+        Args:
+            rate: 字节/秒，None 表示不限速，0 表示暂停
+        """
+        with self._condition:
+            self._refill()
+            self._rate = rate
+            if rate:
+                self._tokens = min(self._tokens, rate * self.BURST_SECONDS)
+            self._condition.notify_all()
+
+    def wake(self):
+        """唤醒所有等待中的连接（任务取消时，等待的线程随即检查取消状态）"""
+        with self._condition:
+            self._condition.notify_all()
+
+    def _refill(self):
+        # 调用方已持有锁
+        now = time.monotonic()
+        if self._rate:
+            self._tokens = min(self._tokens + (now - self._last_refill) * self._rate, self._rate * self.BURST_SECONDS)
+        self._last_refill = now
+
+    def consume(self, nbytes):
+        """
+        登记读取的数据量，超出速度时阻塞
+
+        Args:
+            nbytes: 本次读取的字节数
+
+        Returns:
+            float: 等待的秒数
+
+        Raises:
+            JobCancelled: 等待期间当前线程所属的任务被取消
+        """
+        # 不限速时不加锁，直接返回
+        if self._rate is None:
+            return 0.0
+        control = get_job_control()
+        start = time.monotonic()
+        with self._condition:
+            while True:
+                if control is not None and control.cancelled:
+                    raise JobCancelled()
+                rate = self._rate
+                if rate is None:
+                    break
+                self._refill()
+                if rate > 0 and self._tokens >= 0:
+                    self._tokens -= nbytes
+                    break
+                # 速度为0（暂停）时一直等待，直到调整速度或被唤醒
+                self._condition.wait(-self._tokens / rate if rate > 0 else None)
+        return time.monotonic() - start
+
+    def wrap_response(self, response):
+        """
+        让响应的 read() 经过限速器
+
+        等待时间累计在 response.throttle_wait 中，测速逻辑（如CDN镜像切换）可以扣除限速造成的等待。
+
+        Args:
+            response: yt-dlp Response
+
+        Returns:
+            Response: 同一个响应对象
+        """
+        read = response.read
+
+        def throttled_read(amt=None):
+            # 指定读取长度时按 MAX_READ_SIZE 拆分（read 返回的数据可以少于请求的长度）
+            if self._rate is not None and amt is not None and amt > self.MAX_READ_SIZE:
+                amt = self.MAX_READ_SIZE
+            data = read(amt)
+            if data:
+                response.throttle_wait += self.consume(len(data))
+            return data
+
+        response.throttle_wait = 0.0
+        response.read = throttled_read
+        return response
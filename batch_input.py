@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量链接输入
+从粘贴的多行文本或 .txt/.csv 文件中提取链接，规范化、去重并并发解析为统一的下载队列
+
+版本历史：
+==========
+
+v1.0 (2026-10-17)
+--------------
+- 初始版本
+  * 支持完整链接、b23.tv 短链接、裸 BV 号和 av 号
+  * 去掉分享/统计参数，av 号统一转换为 BV 号，移动端链接转换为桌面端链接
+  * 收藏夹、UP主空间等列表并发展开为视频，同一视频出现在多个列表中时只保留一次
+  * 条目记录来源链接（'__source'），下载时按来源轮流
+"""
+import re
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from yt_dlp.networking import Request
+
+from playlist_pipeline import iter_playlist_entries
+
+
+# 文本中的链接、BV号、av号（CSV 的逗号、引号等作为分隔符）
+LINK_RE = re.compile(r'https?://[^\s,;"\'<>]+|\bBV[0-9A-Za-z]{10}\b|\b[aA][vV]\d+\b')
+VIDEO_PATH_RE = re.compile(r'^/video/(?P<id>BV[0-9A-Za-z]{10}|[aA][vV]\d+)/?$')
+
+# 分享、统计用的查询参数，不影响链接指向的内容
+TRACKING_PARAMS = frozenset((
+    'spm_id_from', 'vd_source', 'from_spmid', 'from', 'share_source', 'share_medium', 'share_plat',
+    'share_session_id', 'share_tag', 'share_from', 'unique_k', 'bbid', 'ts', 'timestamp', 'seid',
+    'buvid', 'is_story_h5', 'up_id', 'plat_id', 'msource', 'launch_id', 'live_from',
+))
+
+SHORT_LINK_HOSTS = ('b23.tv', 'bili2233.cn')
+
+# av号与BV号互转参数（B站公开的编码规则）
+_BV_ALPHABET = 'FcwAPNKTMug3GV5Lj7EJnHpWsx4tb8haYeviqBz6rkCy12mUSDQX9RdoZf'
+_BV_XOR = 23442827791579
+_BV_MAX_AID = 1 << 51
+
+
+def av_to_bv(aid):
+    """
+    将 av 号转换为 BV 号
+
+    Args:
+        aid: av 号（整数）
+
+    Returns:
+        str: BV 号
+    """
+    chars = ['B', 'V', '1'] + [''] * 9
+    index = len(chars) - 1
+    value = (_BV_MAX_AID | aid) ^ _BV_XOR
+    while value > 0:
+        chars[index] = _BV_ALPHABET[value % 58]
+        value //= 58
+        index -= 1
+    chars[3], chars[9] = chars[9], chars[3]
+    chars[4], chars[7] = chars[7], chars[4]
+    return ''.join(chars)
+
+
+def extract_links(text):
+    """
+    从文本中提取所有链接/BV号/av号（保持原顺序）
+
+    Args:
+        text: 粘贴的文本或 .txt/.csv 文件内容
+
+    Returns:
+        list: 链接字符串列表
+    """
+    return LINK_RE.findall(text)
+
+
+def normalize_link(link):
+    """
+    规范化单个链接
+
+    Args:
+        link: 链接、BV号或av号
+
+    Returns:
+        str | None: 规范化后的链接；b23.tv 短链接原样返回（需要联网解析），无法识别时返回None
+    """
+    link = link.strip()
+    if re.fullmatch(r'BV[0-9A-Za-z]{10}', link):
+        return f'https://www.bilibili.com/video/{link}'
+    if re.fullmatch(r'[aA][vV]\d+', link):
+        return f'https://www.bilibili.com/video/{av_to_bv(int(link[2:]))}'
+
+    parsed = urllib.parse.urlparse(link)
+    host = (parsed.hostname or '').lower()
+    if not host:
+        return None
+    if host in SHORT_LINK_HOSTS:
+        return link
+    # 移动端链接转换为桌面端
+    if host == 'm.bilibili.com':
+        host = 'www.bilibili.com'
+    elif host == 'bilibili.com':
+        host = 'www.bilibili.com'
+
+    query = [
+        (key, value) for key, value in urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+        if key not in TRACKING_PARAMS]
+    path = parsed.path
+    video_match = VIDEO_PATH_RE.match(path) if host == 'www.bilibili.com' else None
+    if video_match:
+        # 视频链接只保留分P参数，av号统一转换为BV号
+        video_id = video_match.group('id')
+        if video_id[:2].lower() == 'av':
+            video_id = av_to_bv(int(video_id[2:]))
+        path = f'/video/{video_id}'
+        query = [(key, value) for key, value in query if key == 'p' and value not in ('', '1')]
+    return urllib.parse.urlunparse(('https', host, path, '', urllib.parse.urlencode(query), ''))
+
+
+def get_dedupe_key(url):
+    """
+    视频去重键：视频链接使用 BV号（+分P），其他链接使用规范化后的链接本身
+
+    Args:
+        url: 规范化后的链接
+
+    Returns:
+        str: 去重键
+    """
+    parsed = urllib.parse.urlparse(url)
+    video_match = VIDEO_PATH_RE.match(parsed.path)
+    if parsed.hostname == 'www.bilibili.com' and video_match:
+        part = urllib.parse.parse_qs(parsed.query).get('p', ['1'])[0]
+        return f"{video_match.group('id')}#{part}"
+    return url
+
+
+class BatchResolver:
+    """
+    批量链接解析器
+
+    视频链接无需联网，直接生成下载条目；短链接解析跳转地址，列表链接获取全部视频。
+    需要联网的链接在线程池中并发解析，每个线程各自创建YoutubeDL实例。
+    """
+
+    def __init__(self, ydl_factory, workers=4):
+        """
+        Args:
+            ydl_factory: 创建YoutubeDL实例的函数
+            workers: 并发解析数
+        """
+        self.ydl_factory = ydl_factory
+        self.workers = workers
+        self._local = threading.local()
+        self._instances = []
+        self._instances_lock = threading.Lock()
+
+    def _get_ydl(self):
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            ydl = self._local.ydl = self.ydl_factory()
+            with self._instances_lock:
+                self._instances.append(ydl)
+        return ydl
+
+    @staticmethod
+    def make_entry(url):
+        """为单个视频链接生成下载条目"""
+        parsed = urllib.parse.urlparse(url)
+        video_match = VIDEO_PATH_RE.match(parsed.path)
+        entry = {'_type': 'url', 'url': url, 'ie_key': 'BiliBili'}
+        if video_match:
+            # 分P链接的视频ID与提取器一致（"BV号_p分P"），用于判断是否已下载
+            part = urllib.parse.parse_qs(parsed.query).get('p', [None])[0]
+            entry['id'] = video_match.group('id') + (f'_p{part}' if part else '')
+        return entry
+
+    def _resolve(self, url):
+        """解析需要联网的链接，返回下载条目列表"""
+        ydl = self._get_ydl()
+        if urllib.parse.urlparse(url).hostname in SHORT_LINK_HOSTS:
+            # 短链接：读取跳转后的地址再规范化
+            response = ydl.urlopen(Request(url, method='HEAD'))
+            response.close()
+            url = normalize_link(response.url)
+            if url is None:
+                return []
+        if VIDEO_PATH_RE.match(urllib.parse.urlparse(url).path):
+            return [self.make_entry(url)]
+
+        info = ydl.extract_info(url, download=False, process=False)
+        if not info:
+            return []
+        if 'entries' not in info:
+            return [{'_type': 'url', 'url': info.get('webpage_url') or url, 'ie_key': info.get('extractor_key'),
+                     'id': info.get('id'), 'title': info.get('title')}]
+        entries = []
+        for entry in iter_playlist_entries(info['entries']):
+            entry = dict(entry)
+            normalized = normalize_link(entry.get('url') or '')
+            if normalized and VIDEO_PATH_RE.match(urllib.parse.urlparse(normalized).path):
+                entry['url'] = normalized
+            entries.append(entry)
+        return entries
+
+    def resolve(self, links, progress=None):
+        """
+        规范化、去重并解析所有链接
+
+        Args:
+            links: 链接字符串列表
+            progress: 进度回调 progress(已处理链接数, 链接总数)
+
+        Returns:
+            tuple: (下载条目列表（按输入顺序、已去重）, 统计信息字典)
+        """
+        stats = {'input': len(links), 'invalid': 0, 'duplicate_links': 0, 'failed': 0, 'duplicate_videos': 0}
+        normalized_links = []
+        seen_links = set()
+        for link in links:
+            url = normalize_link(link)
+            if url is None:
+                stats['invalid'] += 1
+            elif url in seen_links:
+                stats['duplicate_links'] += 1
+            else:
+                seen_links.add(url)
+                normalized_links.append(url)
+
+        def resolve_link(url):
+            # 普通视频链接无需联网
+            if VIDEO_PATH_RE.match(urllib.parse.urlparse(url).path):
+                return [self.make_entry(url)]
+            try:
+                return self._resolve(url)
+            except Exception as e:
+                return e
+
+        results = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for index, result in enumerate(executor.map(resolve_link, normalized_links), 1):
+                    results.append((normalized_links[index - 1], result))
+                    if progress:
+                        progress(index, len(normalized_links))
+        finally:
+            with self._instances_lock:
+                for ydl in self._instances:
+                    ydl.close()
+                self._instances.clear()
+
+        entries = []
+        seen_videos = set()
+        errors = []
+        for url, result in results:
+            if isinstance(result, Exception):
+                stats['failed'] += 1
+                errors.append((url, str(result)))
+                continue
+            for entry in result:
+                key = get_dedupe_key(entry.get('url') or '')
+                if key in seen_videos:
+                    stats['duplicate_videos'] += 1
+                    continue
+                seen_videos.add(key)
+                entries.append({**entry, '__source': url})
+        stats['errors'] = errors
+        stats['videos'] = len(entries)
+        return entries, stats
@@ -7,6 +7,80 @@ Bilibili批量下载神器 - 图形界面版
 版本历史：
 ==========
 
+v1.5 (开发中)
+--------------
+- 下载性能优化
+  * 列表只解析一次，解析结果直接用于下载，不再重复请求整个收藏夹/UP主空间
+  * 日志中输出列表解析统计（请求页数、接口调用次数、耗时）
+  * 列表按页惰性获取，首页返回后立即开始下载，总数随分页获取逐步更新
+  * UP主空间等分页数已知的列表并发请求后续分页
+  * 预取后续视频的元数据（签名CDN地址过期前有效），上一个视频下载完立即开始下一个
+  * 下载记录改用 SQLite（archive.db），按ID索引查询并记录视频元数据，自动导入旧版 archive.txt
+  * 增量同步：列表从新到旧遍历，遇到连续多个已下载的视频即停止，不再请求完整列表
+  * 接口元数据缓存（metadata_cache.db）：重复下载、降级重试、切换链接时无需重新请求列表和视频详情
+  * 新增并发下载数设置，收藏夹/UP主空间可同时下载多个视频
+  * 同一视频的视频流和音频流同时下载，进度合并显示
+  * 新增单文件分段下载（可选），大文件拆分为多个连接同时下载
+  * 新增CDN优选（可选），下载前测速选择最快的镜像，速度过低时自动切换
+
+- 新增订阅管理
+  * 订阅收藏夹/UP主空间，后台按设定间隔检查新视频（检查时间随机错开），新视频自动加入下载队列
+  * 每次检查只获取上次之后的新视频，显示各订阅源的检查时间和接口请求次数
+
+- 下载任务持久化（jobs.db）
+  * 记录每个任务及其中每个视频的状态和临时文件，程序关闭或崩溃后启动时自动继续
+  * 列表已获取完毕的任务直接从记录恢复，无需重新获取列表，未完成的 .part 文件继续下载
+
+- 新增批量链接输入
+  * 支持多行粘贴或导入 .txt/.csv，识别 b23.tv 短链接、BV号、av号，去掉分享参数
+  * 链接去重后并发解析，收藏夹/UP主空间展开为视频，同一视频只下载一次
+
+- 下载调度
+  * 批量链接和订阅可设置优先级，排队任务按优先级开始，同一优先级内按来源轮流
+  * 长任务每下载一批视频后，如有其他来源的任务排队则让出，剩余视频稍后继续
+  * 可选小文件优先：从已预取的视频中优先下载预估最小的，完成数量增长更快
+
+- 暂停与取消
+  * 暂停改为事件等待，不再轮询：暂停期间不占用CPU，也不再读取网络数据和发起请求
+  * 切换链接时真正取消原任务（包括正在进行的解析、下载和 ffmpeg 合并），原下载线程退出后再开始新链接
+
+- 进度显示
+  * 下载线程只更新进度快照，进度条和进度文字由界面线程定时刷新（约 12 帧/秒），
+    多个视频并行下载时界面不再卡顿，下载线程也不再直接操作界面控件
+
+- 日志
+  * 可选择日志显示级别，低于该级别的日志在产生时直接丢弃
+  * 日志每 100ms 批量写入日志框，日志框只保留最近 2000 行，长时间下载界面不再变慢
+  * 完整日志写入 logs/bili_gui.log，按大小自动轮转（每个 5MB，保留 5 个）
+
+- 新增任务列表
+  * 显示当前任务中每个视频的标题、状态、速度、大小、剩余时间和错误信息
+  * 只渲染可见的行，且只刷新内容有变化的行，上万个视频也能流畅滚动
+  * 总进度按字节计算：每个视频按实际大小或解析格式得到的预估大小计入，长视频和短视频不再同等权重
+  * 进度显示已下载/总大小、平滑后的下载速度和整个任务的剩余时间
+
+- 下载限速
+  * 所有视频、音视频流和分段连接共用一个速度上限（令牌桶），下载中可随时调整
+  * 限速时段：如 "09:00-18:00 2" 表示工作时间限速 2 MB/s，时段外使用默认速度；速度为 0 时暂停数据传输
+
+- 失败重试与风控
+  * 错误分为临时错误、风控（HTTP 412/429、接口 -352 等）和永久错误，永久错误不再重试
+  * 临时错误按指数退避（带随机抖动）重试，失败的视频在列表处理完后再重试两轮
+  * 短时间内多次触发风控时熔断，所有下载线程暂停请求，连续熔断时暂停时间加倍
+  * 同时下载的视频数自动调整：成功时逐渐增加，触发风控时减半
+
+- 连接复用
+  * 所有任务、下载线程和降级重试共用一个连接池，不再为每个任务重新建立 HTTPS 连接
+  * DNS解析结果缓存 5 分钟；调试日志中输出每个任务的请求数、新建连接数和复用率
+
+- 浏览器Cookie缓存
+  * 浏览器Cookie只在数据库修改或提示需要登录时重新读取，批量下载中不再反复打开数据库（避免被浏览器锁定）
+  * 重新读取失败时继续使用缓存的Cookie；Windows 下保存 DPAPI 加密的快照，启动后无需再次解密数据库
+
+- 登录状态检查
+  * 获取列表前请求一次导航接口，显示是否已登录、用户名和大会员状态
+  * Cookie读取失败或已过期时直接以不登录模式获取列表，不会获取完列表后再不登录重新获取一遍
+
 v1.4 (2026-01-17)
 --------------
 - 新增激活验证功能
@@ -70,45 +144,120 @@ v1.0
 
 import customtkinter as ctk
 import yt_dlp
+from yt_dlp.cookies import CookieLoadError
+from yt_dlp.utils import format_bytes
 import threading
 import os
 import sys
 import shutil
 import time
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 import queue
 from datetime import datetime
 import re
+import logging
+from logging.handlers import RotatingFileHandler
 from license_client import LicenseClient, get_machine_code
+from stream_downloader import BiliYoutubeDL, get_download_owner
+from download_archive import DownloadArchive
+from metadata_cache import MetadataCache
+from job_control import JobControl, JobCancelled, bind_job_control, get_job_control
+from playlist_pipeline import (
+    iter_playlist_entries, estimate_entry_count, estimate_info_size, interleave_by_source, MetadataPrefetcher,
+)
+from subscriptions import SubscriptionStore, SubscriptionScheduler, RequestCountingLogger, poll_source
+from batch_input import BatchResolver, extract_links
+from status_table import StatusModel, ROW_ACTIVE, STATUS_TEXT, format_eta
+from progress_estimator import ProgressEstimator
+from bandwidth_limiter import BandwidthLimiter, parse_rate, parse_schedule, get_scheduled_rate
+from connection_pool import network_stats
+from cookie_cache import BrowserCookieCache, LOGIN_REQUIRED_RE, probe_login
+from retry_policy import (
+    CircuitBreaker, AdaptiveConcurrency, classify_error, has_http_rate_limit, is_unauthorized, backoff_delay,
+    ERROR_TRANSIENT, ERROR_RATE_LIMITED, ERROR_PERMANENT, API_HOST)
+from job_store import (
+    JobStore, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED, JOB_CANCELLED,
+    TASK_PENDING, TASK_DONE, TASK_SKIPPED, TASK_FAILED,
+    PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW,
+)
+
+
+# 日志级别（日志级别名 -> logging 级别）
+LOG_LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+}
+
+# 日志显示级别选项（显示文本 -> logging 级别）
+LOG_LEVEL_OPTIONS = {
+    "调试": logging.DEBUG,
+    "信息": logging.INFO,
+    "警告": logging.WARNING,
+    "错误": logging.ERROR,
+}
+
+# 任务优先级选项（显示文本 -> 优先级）
+PRIORITY_OPTIONS = {
+    "高": PRIORITY_HIGH,
+    "普通": PRIORITY_NORMAL,
+    "低": PRIORITY_LOW,
+}
 
 
 class MyLogger:
-    """自定义日志类，将yt-dlp输出重定向到GUI文本框"""
+    """自定义日志类，将yt-dlp输出重定向到GUI日志"""
     
-    def __init__(self, text_widget, log_queue, app=None):
-        self.text_widget = text_widget
-        self.log_queue = log_queue
-        self.app = app  # 保存app引用，用于暂停检查
+    # 提取器发起网络请求时的提示，如 "[BilibiliSpaceVideo] 3985676: Downloading space page 0"
+    EXTRACTOR_REQUEST_RE = re.compile(r'^\[[^\]]+\] [^:]+: Download')
+    
+    def __init__(self, log, is_enabled, on_error=None):
+        """
+        Args:
+            log: 日志函数 log(message, level)
+            is_enabled: 判断日志级别是否需要记录的函数，低于显示级别的日志在这里直接丢弃
+            on_error: 错误回调 on_error(message)，在出错的下载线程中调用（用于在任务列表中显示错误）
+        """
+        self.log = log
+        self.is_enabled = is_enabled
+        self.on_error = on_error
+        # 列表解析统计（接口请求次数、分页数）；多个下载线程和分页请求线程共用，由_stats_lock保护
+        self.api_requests = 0
+        self.pages_fetched = 0
+        self._stats_lock = threading.Lock()
+    
+    def reset_stats(self):
+        """重置列表解析统计"""
+        with self._stats_lock:
+            self.api_requests = 0
+            self.pages_fetched = 0
     
     def debug(self, msg):
-        # 第二道拦截（针对准备/解析阶段 - 关键黑科技）
-        # yt-dlp在解析网页时会不断调用debug日志，卡住这里可以卡住解析流程
-        if self.app is not None:
-            while self.app.is_paused:
-                time.sleep(0.1)
-        
+        # 解析阶段的暂停/取消由任务控制令牌在每个网络请求前处理（见 BiliYoutubeDL.urlopen）
         if msg.startswith('[debug]'):
             return
-        self.log_queue.put(('debug', msg))
+        
+        # 统计提取器的网络请求（用于输出列表解析耗费）
+        if self.EXTRACTOR_REQUEST_RE.match(msg):
+            with self._stats_lock:
+                self.api_requests += 1
+                if 'page' in msg.lower():
+                    self.pages_fetched += 1
+        if self.is_enabled('debug'):
+            self.log(msg, 'debug')
     
     def info(self, msg):
-        self.log_queue.put(('info', msg))
+        if self.is_enabled('info'):
+            self.log(msg, 'info')
     
     def warning(self, msg):
-        self.log_queue.put(('warning', msg))
+        self.log(msg, 'warning')
     
     def error(self, msg):
-        self.log_queue.put(('error', msg))
+        if self.on_error:
+            self.on_error(msg)
+        self.log(msg, 'error')
 
 
 class ActivationApp:
@@ -284,9 +433,488 @@ class ActivationApp:
         self.root.mainloop()
 
 
+class SubscriptionWindow:
+    """订阅管理窗口"""
+    
+    # 检查间隔选项（显示文本 -> 分钟）
+    INTERVAL_OPTIONS = {
+        "30 分钟": 30,
+        "1 小时": 60,
+        "3 小时": 180,
+        "6 小时": 360,
+        "12 小时": 720,
+        "24 小时": 1440,
+    }
+    # 订阅列表刷新间隔（毫秒）
+    REFRESH_INTERVAL = 2000
+    
+    def __init__(self, app):
+        """
+        初始化订阅管理窗口
+        
+        Args:
+            app: 主程序（BiliDownloaderGUI）实例
+        """
+        self.app = app
+        self.window = ctk.CTkToplevel(app.root)
+        self.window.title("订阅管理")
+        self.window.geometry("860x600")
+        # 订阅链接 -> (行框架, 信息标签)
+        self.rows = {}
+        
+        self.create_widgets()
+        self.refresh()
+    
+    def create_widgets(self):
+        """创建界面组件"""
+        add_frame = ctk.CTkFrame(self.window)
+        add_frame.pack(pady=(15, 8), padx=15, fill="x")
+        
+        add_label = ctk.CTkLabel(
+            add_frame,
+            text="添加订阅（收藏夹/UP主空间链接，每行一个）：",
+            font=ctk.CTkFont(size=13, weight="bold"),
+            anchor="w"
+        )
+        add_label.pack(anchor="w", padx=15, pady=(12, 6))
+        
+        self.url_text = ctk.CTkTextbox(add_frame, height=70, font=ctk.CTkFont(size=12))
+        self.url_text.pack(padx=15, fill="x")
+        
+        add_row = ctk.CTkFrame(add_frame, fg_color="transparent")
+        add_row.pack(padx=15, pady=(8, 12), fill="x")
+        
+        interval_label = ctk.CTkLabel(add_row, text="检查间隔：", font=ctk.CTkFont(size=13, weight="bold"))
+        interval_label.pack(side="left")
+        
+        self.interval_var = ctk.StringVar(value="1 小时")
+        interval_combo = ctk.CTkComboBox(
+            add_row,
+            values=list(self.INTERVAL_OPTIONS),
+            width=110,
+            variable=self.interval_var,
+            state="readonly"
+        )
+        interval_combo.pack(side="left", padx=(0, 15))
+        
+        priority_label = ctk.CTkLabel(add_row, text="优先级：", font=ctk.CTkFont(size=13, weight="bold"))
+        priority_label.pack(side="left")
+        
+        self.priority_var = ctk.StringVar(value="普通")
+        priority_combo = ctk.CTkComboBox(
+            add_row,
+            values=list(PRIORITY_OPTIONS),
+            width=80,
+            variable=self.priority_var,
+            state="readonly"
+        )
+        priority_combo.pack(side="left", padx=(0, 15))
+        
+        add_btn = ctk.CTkButton(add_row, text="添加订阅", command=self.add_subscriptions, width=100)
+        add_btn.pack(side="left")
+        
+        # 下载队列状态
+        self.queue_label = ctk.CTkLabel(add_row, text="", text_color="gray", font=ctk.CTkFont(size=12))
+        self.queue_label.pack(side="right")
+        
+        # 订阅列表
+        self.list_frame = ctk.CTkScrollableFrame(self.window)
+        self.list_frame.pack(pady=(0, 15), padx=15, fill="both", expand=True)
+    
+    def add_subscriptions(self):
+        """添加输入框中的所有订阅链接"""
+        interval = self.INTERVAL_OPTIONS[self.interval_var.get()]
+        priority = PRIORITY_OPTIONS[self.priority_var.get()]
+        urls = [line.strip() for line in self.url_text.get("1.0", "end").splitlines() if line.strip()]
+        added = sum(1 for url in urls if self.app.subscription_store.add(url, interval, priority))
+        if urls:
+            self.app.log(f"📡 已添加 {added} 个订阅（共输入 {len(urls)} 个链接）", "info")
+            self.app.subscription_scheduler.wake()
+        self.url_text.delete("1.0", "end")
+        self.refresh()
+    
+    def remove_subscription(self, url):
+        """删除订阅"""
+        self.app.subscription_store.remove(url)
+        self.refresh()
+    
+    def poll_now(self, url):
+        """立即检查订阅"""
+        self.app.subscription_scheduler.poll_now(url)
+    
+    @staticmethod
+    def format_time(timestamp):
+        """格式化时间戳（为空时显示 -）"""
+        if not timestamp:
+            return "-"
+        return datetime.fromtimestamp(timestamp).strftime("%m-%d %H:%M")
+    
+    def describe(self, subscription):
+        """生成订阅的显示文本"""
+        name = subscription.get('title') or subscription['url']
+        status = f"错误: {subscription['last_error']}" if subscription.get('last_error') else f"新视频 {subscription.get('last_new', 0)} 个"
+        priority = next(
+            (text for text, value in PRIORITY_OPTIONS.items() if value == subscription.get('priority', PRIORITY_NORMAL)), "普通")
+        return (
+            f"{name}\n"
+            f"每 {subscription['interval']} 分钟 | 优先级 {priority} | 上次检查 {self.format_time(subscription.get('last_poll'))} | "
+            f"下次检查 {self.format_time(subscription.get('next_poll'))} | {status} | "
+            f"接口请求 {subscription.get('last_api_requests', 0)} 次（累计 {subscription.get('total_api_requests', 0)} 次）"
+        )
+    
+    def refresh(self):
+        """刷新订阅列表（窗口关闭后停止）"""
+        if not self.window.winfo_exists():
+            return
+        
+        subscriptions = self.app.subscription_store.list()
+        urls = [subscription['url'] for subscription in subscriptions]
+        if urls != list(self.rows):
+            # 订阅增减时重建列表，否则只更新文本
+            for row_frame, _ in self.rows.values():
+                row_frame.destroy()
+            self.rows = {}
+            for subscription in subscriptions:
+                url = subscription['url']
+                row_frame = ctk.CTkFrame(self.list_frame)
+                row_frame.pack(pady=3, fill="x")
+                info_label = ctk.CTkLabel(row_frame, text="", justify="left", anchor="w", font=ctk.CTkFont(size=12))
+                info_label.pack(side="left", padx=10, pady=6, fill="x", expand=True)
+                remove_btn = ctk.CTkButton(
+                    row_frame, text="删除", width=60, fg_color="#d32f2f", hover_color="#b71c1c",
+                    command=lambda u=url: self.remove_subscription(u))
+                remove_btn.pack(side="right", padx=(0, 10))
+                poll_btn = ctk.CTkButton(row_frame, text="立即检查", width=80, command=lambda u=url: self.poll_now(u))
+                poll_btn.pack(side="right", padx=(0, 6))
+                self.rows[url] = (row_frame, info_label)
+        
+        for subscription in subscriptions:
+            self.rows[subscription['url']][1].configure(text=self.describe(subscription))
+        self.queue_label.configure(text=f"待下载队列: {self.app.job_store.count_queued()} 个")
+        
+        self.window.after(self.REFRESH_INTERVAL, self.refresh)
+
+
+class BatchInputWindow:
+    """批量链接输入窗口"""
+    
+    # 同时解析的链接数（收藏夹/UP主空间需要请求列表）
+    RESOLVE_WORKERS = 4
+    
+    def __init__(self, app):
+        """
+        初始化批量链接输入窗口
+        
+        Args:
+            app: 主程序（BiliDownloaderGUI）实例
+        """
+        self.app = app
+        self.window = ctk.CTkToplevel(app.root)
+        self.window.title("批量添加链接")
+        self.window.geometry("760x520")
+        self.is_resolving = False
+        self.status_text = ""
+        
+        self.create_widgets()
+    
+    def create_widgets(self):
+        """创建界面组件"""
+        tip_label = ctk.CTkLabel(
+            self.window,
+            text="粘贴链接（每行一个，支持 b23.tv 短链接、BV号、av号、收藏夹、UP主空间），或导入 .txt/.csv 文件：",
+            font=ctk.CTkFont(size=13, weight="bold"),
+            anchor="w"
+        )
+        tip_label.pack(anchor="w", padx=15, pady=(15, 8))
+        
+        self.links_text = ctk.CTkTextbox(self.window, font=ctk.CTkFont(size=12, family="Consolas"))
+        self.links_text.pack(padx=15, fill="both", expand=True)
+        
+        button_row = ctk.CTkFrame(self.window, fg_color="transparent")
+        button_row.pack(padx=15, pady=12, fill="x")
+        
+        import_btn = ctk.CTkButton(button_row, text="导入文件", command=self.import_file, width=100)
+        import_btn.pack(side="left", padx=(0, 10))
+        
+        priority_label = ctk.CTkLabel(button_row, text="优先级：", font=ctk.CTkFont(size=13, weight="bold"))
+        priority_label.pack(side="left")
+        
+        self.priority_var = ctk.StringVar(value="普通")
+        priority_combo = ctk.CTkComboBox(
+            button_row,
+            values=list(PRIORITY_OPTIONS),
+            width=80,
+            variable=self.priority_var,
+            state="readonly"
+        )
+        priority_combo.pack(side="left", padx=(0, 10))
+        
+        self.resolve_btn = ctk.CTkButton(button_row, text="解析并加入队列", command=self.start_resolve, width=140)
+        self.resolve_btn.pack(side="left")
+        
+        self.status_label = ctk.CTkLabel(button_row, text="", text_color="gray", font=ctk.CTkFont(size=12))
+        self.status_label.pack(side="right")
+    
+    def import_file(self):
+        """导入 .txt/.csv 文件内容到输入框"""
+        path = filedialog.askopenfilename(filetypes=[("文本/CSV", "*.txt *.csv"), ("所有文件", "*.*")])
+        if not path:
+            return
+        # 兼容带BOM的UTF-8和Excel导出的GBK编码
+        for encoding in ('utf-8-sig', 'gbk'):
+            try:
+                with open(path, 'r', encoding=encoding) as f:
+                    content = f.read()
+                break
+            except UnicodeDecodeError:
+                continue
+        else:
+            self.status_label.configure(text="文件编码无法识别")
+            return
+        self.links_text.insert("end", content.rstrip("\n") + "\n")
+    
+    def start_resolve(self):
+        """在后台线程中解析所有链接"""
+        if self.is_resolving:
+            return
+        links = extract_links(self.links_text.get("1.0", "end"))
+        if not links:
+            self.status_label.configure(text="没有识别到链接")
+            return
+        
+        self.is_resolving = True
+        self.resolve_btn.configure(state="disabled")
+        self.status_text = f"正在解析 {len(links)} 个链接..."
+        # 界面控件只在界面线程读取
+        poll_opts = self.app.build_poll_opts()
+        priority = PRIORITY_OPTIONS[self.priority_var.get()]
+        threading.Thread(target=self.resolve_worker, args=(links, poll_opts, priority), daemon=True).start()
+        self.update_status()
+    
+    def update_status(self):
+        """刷新解析进度（解析线程只修改 status_text，由界面线程显示）"""
+        if not self.window.winfo_exists():
+            return
+        self.status_label.configure(text=self.status_text)
+        if self.is_resolving:
+            self.window.after(200, self.update_status)
+        else:
+            self.resolve_btn.configure(state="normal")
+    
+    def resolve_worker(self, links, poll_opts, priority):
+        """解析链接并将结果作为一个批量任务加入下载队列"""
+        resolver = BatchResolver(
+            lambda: BiliYoutubeDL({**poll_opts, 'logger': RequestCountingLogger()}),
+            workers=self.RESOLVE_WORKERS)
+        
+        def progress(done, total):
+            self.status_text = f"正在解析: {done}/{total}"
+        
+        try:
+            entries, stats = resolver.resolve(links, progress)
+        except Exception as e:
+            self.status_text = f"解析失败: {str(e)}"
+            self.is_resolving = False
+            return
+        
+        log = self.app.log
+        log(f"📋 批量链接: 输入 {stats['input']} 个，无效 {stats['invalid']} 个，重复链接 {stats['duplicate_links']} 个，解析失败 {stats['failed']} 个", "info")
+        for url, error in stats['errors']:
+            log(f"   解析失败 {url}: {error}", "warning")
+        if entries:
+            self.app.job_store.add_batch_job(f"批量任务 ({len(entries)} 个视频)", entries, priority=priority)
+            log(f"📋 共 {len(entries)} 个视频加入下载队列（去掉重复视频 {stats['duplicate_videos']} 个）", "info")
+        self.status_text = f"已加入队列: {len(entries)} 个视频"
+        self.is_resolving = False
+
+
+class StatusWindow:
+    """
+    任务列表窗口（当前任务中每个视频的状态）
+    
+    表格只创建一屏的行，滚动时把可见范围内的数据填入这些行；
+    每次刷新只重新设置修订号有变化的行，视频数量再多刷新开销也不变。
+    """
+    
+    # 列：(列名, 标题, 宽度, 是否随窗口拉伸)
+    COLUMNS = (
+        ("title", "标题", 300, True),
+        ("status", "状态", 70, False),
+        ("speed", "速度", 100, False),
+        ("size", "大小", 160, False),
+        ("eta", "剩余时间", 80, False),
+        ("error", "错误", 220, True),
+    )
+    # 行高（像素）和表头高度（像素）
+    ROW_HEIGHT = 24
+    HEADING_HEIGHT = 28
+    # 刷新间隔（毫秒）
+    REFRESH_INTERVAL = 200
+    
+    def __init__(self, app):
+        """
+        初始化任务列表窗口
+        
+        Args:
+            app: 主程序（BiliDownloaderGUI）实例
+        """
+        self.app = app
+        self.model = app.status_model
+        self.window = ctk.CTkToplevel(app.root)
+        self.window.title("任务列表")
+        self.window.geometry("1000x600")
+        # 第一行可见行的行号，以及每个表格行当前显示的 (视频标识, 修订号)
+        self.offset = 0
+        self.visible_rows = 0
+        self.displayed = []
+        # 上次刷新时的数据修订号和行数，没有变化且未滚动时跳过刷新
+        self.rendered_revision = None
+        self.rendered_length = None
+        
+        self.create_widgets()
+        self.refresh()
+    
+    def create_widgets(self):
+        """创建界面组件"""
+        self.summary_label = ctk.CTkLabel(self.window, text="", anchor="w", font=ctk.CTkFont(size=13, weight="bold"))
+        self.summary_label.pack(anchor="w", padx=15, pady=(15, 8))
+        
+        table_frame = ctk.CTkFrame(self.window)
+        table_frame.pack(padx=15, pady=(0, 15), fill="both", expand=True)
+        
+        # 只配置命名样式，不切换全局主题（避免影响程序中其他 ttk 控件）
+        style = ttk.Style(self.window)
+        style.configure(
+            "Status.Treeview", background="#2b2b2b", fieldbackground="#2b2b2b", foreground="#dce4ee",
+            rowheight=self.ROW_HEIGHT, borderwidth=0)
+        style.configure("Status.Treeview.Heading", background="#3a3a3a", foreground="#dce4ee", relief="flat")
+        style.map("Status.Treeview", background=[("selected", "#1f538d")])
+        
+        self.tree = ttk.Treeview(
+            table_frame, columns=[name for name, *_ in self.COLUMNS], show="headings",
+            style="Status.Treeview", selectmode="browse")
+        for name, heading, width, stretch in self.COLUMNS:
+            self.tree.heading(name, text=heading, anchor="w")
+            self.tree.column(name, width=width, minwidth=50, stretch=stretch, anchor="w")
+        
+        # 滚动条按视频总数计算位置，与表格中实际的行无关
+        self.scrollbar = ctk.CTkScrollbar(table_frame, command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+        
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll_to(self.offset - 3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_to(self.offset + 3))
+    
+    def on_resize(self, event):
+        """窗口大小变化时重新计算一屏的行数"""
+        visible_rows = max(1, (event.height - self.HEADING_HEIGHT) // self.ROW_HEIGHT)
+        if visible_rows == self.visible_rows:
+            return
+        self.visible_rows = visible_rows
+        self.tree.delete(*self.tree.get_children())
+        for index in range(visible_rows):
+            self.tree.insert("", "end", iid=str(index), values=())
+        self.displayed = [None] * visible_rows
+        self.render(force=True)
+    
+    def on_mousewheel(self, event):
+        """鼠标滚轮滚动（Windows/macOS）"""
+        step = -3 if event.delta > 0 else 3
+        self.scroll_to(self.offset + step)
+        return "break"
+    
+    def on_scrollbar(self, action, value, unit=None):
+        """滚动条拖动或点击"""
+        if action == "moveto":
+            self.scroll_to(int(float(value) * len(self.model)))
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self.scroll_to(self.offset + int(value) * step)
+    
+    def scroll_to(self, offset):
+        """滚动到指定行"""
+        offset = max(0, min(offset, len(self.model) - self.visible_rows))
+        if offset != self.offset:
+            self.offset = offset
+            self.render(force=True)
+    
+    def render(self, force=False):
+        """
+        刷新表格（界面线程调用）
+        
+        Args:
+            force: 滚动或窗口大小变化后为True，否则数据没有变化时直接返回
+        """
+        total = len(self.model)
+        revision = self.model.revision
+        if not force and revision == self.rendered_revision and total == self.rendered_length:
+            return
+        self.rendered_revision = revision
+        self.rendered_length = total
+        
+        # 视频数量减少（开始新任务）时滚动位置可能超出范围
+        self.offset = max(0, min(self.offset, total - self.visible_rows))
+        rows = self.model.get_rows(self.offset, self.visible_rows)
+        for index in range(self.visible_rows):
+            if index < len(rows):
+                key, row_revision, values = rows[index]
+                shown = (key, row_revision)
+            else:
+                shown, values = None, ()
+            if self.displayed[index] != shown:
+                self.displayed[index] = shown
+                self.tree.item(str(index), values=values)
+        
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible_rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        
+        counts = self.model.counts()
+        summary = " | ".join(
+            f"{text} {counts[status]}" for status, text in STATUS_TEXT.items() if counts.get(status))
+        summary_text = f"共 {total} 个视频" + (f"  （{summary}）" if summary else "")
+        if self.summary_label.cget("text") != summary_text:
+            self.summary_label.configure(text=summary_text)
+    
+    def refresh(self):
+        """定时刷新（窗口关闭后停止）"""
+        if not self.window.winfo_exists():
+            return
+        self.render()
+        self.window.after(self.REFRESH_INTERVAL, self.refresh)
+
+
 class BiliDownloaderGUI:
     """Bilibili批量下载器GUI类"""
     
+    # 获取列表时同时请求的分页数（过高容易触发B站风控）
+    PAGE_FETCH_CONCURRENCY = 4
+    # 预取元数据时比下载线程多解析的条目数，以及预取线程数
+    PREFETCH_AHEAD = 2
+    PREFETCH_WORKERS = 2
+    # 增量同步时连续遇到多少个已下载的视频即停止遍历（跳过置顶等零散的旧视频）
+    INCREMENTAL_STOP_RUN = 10
+    # 长任务每领取多少个视频检查一次是否需要让出（有其他来源的任务排队时）
+    JOB_SLICE_SIZE = 20
+    # 小文件优先时额外预取的条目数（可选择的范围）
+    SMALLEST_FIRST_WINDOW = 8
+    # 进度显示刷新间隔（毫秒），约 12 帧/秒
+    PROGRESS_RENDER_INTERVAL = 80
+    # 日志框保留的最大行数，以及每次刷新最多写入的日志条数
+    LOG_MAX_LINES = 2000
+    LOG_BATCH_SIZE = 500
+    # 日志文件轮转：单个文件大小上限和保留的旧文件数
+    LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+    LOG_FILE_BACKUPS = 5
+    # 按限速时段重新计算速度上限的间隔（毫秒）
+    BANDWIDTH_CHECK_INTERVAL = 30 * 1000
+    # 单个视频遇到临时错误时在下载线程中重试的次数，以及列表处理完后重试失败视频的轮数
+    ENTRY_RETRIES = 3
+    RETRY_ROUNDS = 2
+    
     def __init__(self, license_info=""):
         # 设置主题
         ctk.set_appearance_mode("dark")
@@ -302,9 +930,15 @@ class BiliDownloaderGUI:
         
         # 下载状态
         self.is_downloading = False
-        self.is_paused = False
+        # 当前下载任务的控制令牌（暂停/继续/取消），每次开始下载时新建
+        self.job_control = JobControl()
+        self.switching_to_url = None  # 切换链接时等待原下载线程退出，之后使用的新链接
         self.download_thread = None
+        # 日志：任意线程写入队列，界面线程批量显示；完整日志写入轮转的日志文件
         self.log_queue = queue.Queue()
+        self.log_min_level = logging.INFO
+        self.log_line_count = 0
+        self.file_logger = self.create_file_logger(os.path.join(os.getcwd(), 'logs', 'bili_gui.log'))
         self.current_download_url = None  # 保存当前下载链接
         self.all_videos_completed = False  # 所有视频完成标志
         self.ydl_instance = None  # 保存yt-dlp实例，用于取消下载
@@ -312,12 +946,55 @@ class BiliDownloaderGUI:
         self.playlist_count = None
         self.current_playlist_index = None
         self.completed_count = 0  # 实际下载完成的视频数量
+        self.skipped_count = 0  # 因已在下载记录中而跳过的视频数量
+        self.enumeration_done = True  # 列表条目是否已全部获取
+        self.enumeration_start_time = None
+        # 并行下载进度（下载线程ID -> {流文件名: (已下载字节, 总字节)}），由progress_lock保护
+        self.progress_lock = threading.Lock()
+        self.active_progress = {}
+        # 进度快照有更新、等待界面线程渲染（见render_progress）
+        self.progress_dirty = False
+        # 下载线程请求的进度控件更新（暂停提示、完成文字等），由progress_lock保护，见post_progress_display
+        self.pending_display = {}
+        # 按字节估计总进度、下载速度和剩余时间
+        self.progress_estimator = ProgressEstimator()
+        # 全局限速器（所有任务的下载连接共用），默认速度和限速时段由界面设置
+        self.bandwidth_limiter = BandwidthLimiter()
+        self.bandwidth_default_rate = None
+        self.bandwidth_schedule = []
+        # 风控熔断器（所有任务共用）：B站接口短时间内多次风控时暂停全部请求
+        self.risk_breaker = CircuitBreaker(on_open=self.on_circuit_open)
+        # 浏览器Cookie缓存（所有任务共用），只在浏览器数据库修改或提示需要登录时重新读取
+        self.cookie_cache = BrowserCookieCache(os.path.join(os.getcwd(), 'cookie_cache.bin'))
+        # 下载任务记录（待下载队列、运行中的任务及其中每个视频的状态），程序重启后继续
+        self.job_store = JobStore(os.path.join(os.getcwd(), 'jobs.db'))
+        self.current_job_id = None
+        self.job_yielded = False  # 当前任务是否已让出下载队列
+        # 下载线程ID -> (任务ID, 视频标识)，用于记录各视频的临时文件
+        self.active_tasks = {}
+        self.recorded_parts = set()
+        # 当前任务中每个视频的状态（任务列表窗口显示）
+        self.status_model = StatusModel()
+        self.subscription_window = None
+        self.batch_window = None
+        self.status_window = None
         
         # 创建界面
         self.create_widgets()
         
-        # 启动日志处理
+        # 启动日志处理和进度渲染
         self.process_log_queue()
+        self.render_progress()
+        self.check_bandwidth_schedule()
+        
+        # 启动订阅检查和下载队列处理
+        self.subscription_store = SubscriptionStore(os.path.join(os.getcwd(), 'subscriptions.json'))
+        self.subscription_scheduler = SubscriptionScheduler(self.subscription_store, self.poll_subscription)
+        self.subscription_scheduler.start()
+        interrupted = self.job_store.requeue_interrupted()
+        if interrupted:
+            self.log(f"发现 {interrupted} 个上次未完成的下载任务，将自动继续", "info")
+        self.process_pending_jobs()
     
     def create_widgets(self):
         """创建界面组件"""
@@ -430,7 +1107,7 @@ class BiliDownloaderGUI:
         
         # --- 下载模式和网络代理设置（同一行） ---
         mode_proxy_row = ctk.CTkFrame(settings_container, fg_color="transparent")
-        mode_proxy_row.pack(pady=(8, 15), padx=15, fill="x")
+        mode_proxy_row.pack(pady=8, padx=15, fill="x")
         
         download_mode_label = ctk.CTkLabel(
             mode_proxy_row,
@@ -477,6 +1154,136 @@ class BiliDownloaderGUI:
             state="disabled"
         )
         self.proxy_entry.pack(side="left")
+        self.proxy_entry.bind("<KeyRelease>", self.snapshot_network_settings)
+        self.proxy_entry.bind("<FocusOut>", self.snapshot_network_settings)
+        # 订阅检查在调度线程中运行，不能读取界面控件：代理和Cookie设置变化时在界面线程保存快照
+        self.cookie_source_var.trace_add("write", self.snapshot_network_settings)
+        self.proxy_enabled_var.trace_add("write", self.snapshot_network_settings)
+        self.snapshot_network_settings()
+        
+        # --- 下载性能设置 ---
+        performance_row = ctk.CTkFrame(settings_container, fg_color="transparent")
+        performance_row.pack(pady=8, padx=15, fill="x")
+        
+        concurrency_label = ctk.CTkLabel(
+            performance_row,
+            text="并发下载数：",
+            font=ctk.CTkFont(size=13, weight="bold"),
+            width=120,
+            anchor="w"
+        )
+        concurrency_label.pack(side="left")
+        
+        self.concurrency_var = ctk.StringVar(value="3")
+        self.concurrency_combo = ctk.CTkComboBox(
+            performance_row,
+            values=["1", "2", "3", "4", "6", "8"],
+            width=80,
+            variable=self.concurrency_var,
+            state="readonly"
+        )
+        self.concurrency_combo.pack(side="left", padx=(0, 10))
+        
+        concurrency_tip = ctk.CTkLabel(
+            performance_row,
+            text="(收藏夹/UP主空间同时下载的视频数)",
+            text_color="gray",
+            font=ctk.CTkFont(size=11)
+        )
+        concurrency_tip.pack(side="left", padx=(0, 20))
+        
+        segment_label = ctk.CTkLabel(
+            performance_row,
+            text="单文件分段：",
+            font=ctk.CTkFont(size=13, weight="bold"),
+            width=100,
+            anchor="w"
+        )
+        segment_label.pack(side="left")
+        
+        self.segment_var = ctk.StringVar(value="关闭")
+        self.segment_combo = ctk.CTkComboBox(
+            performance_row,
+            values=["关闭", "2 连接", "4 连接", "8 连接"],
+            width=100,
+            variable=self.segment_var,
+            state="readonly"
+        )
+        self.segment_combo.pack(side="left", padx=(0, 20))
+        
+        self.mirror_selection_var = ctk.BooleanVar(value=False)
+        self.mirror_checkbox = ctk.CTkCheckBox(
+            performance_row,
+            text="CDN优选",
+            variable=self.mirror_selection_var
+        )
+        self.mirror_checkbox.pack(side="left", padx=(0, 20))
+        
+        # 增量同步：列表从新到旧遍历，遇到连续多个已下载的视频即停止获取后续分页
+        self.incremental_sync_var = ctk.BooleanVar(value=False)
+        self.incremental_checkbox = ctk.CTkCheckBox(
+            performance_row,
+            text="增量同步",
+            variable=self.incremental_sync_var
+        )
+        self.incremental_checkbox.pack(side="left", padx=(0, 20))
+        
+        # 小文件优先：从已预取的视频中优先下载预估最小的
+        self.smallest_first_var = ctk.BooleanVar(value=False)
+        self.smallest_first_checkbox = ctk.CTkCheckBox(
+            performance_row,
+            text="小文件优先",
+            variable=self.smallest_first_var
+        )
+        self.smallest_first_checkbox.pack(side="left")
+        
+        # --- 下载限速设置（回车或离开输入框时生效，下载中也可调整） ---
+        limit_row = ctk.CTkFrame(settings_container, fg_color="transparent")
+        limit_row.pack(pady=(8, 15), padx=15, fill="x")
+        
+        limit_label = ctk.CTkLabel(
+            limit_row,
+            text="下载限速：",
+            font=ctk.CTkFont(size=13, weight="bold"),
+            width=120,
+            anchor="w"
+        )
+        limit_label.pack(side="left")
+        
+        self.rate_limit_entry = ctk.CTkEntry(limit_row, placeholder_text="不限", width=80)
+        self.rate_limit_entry.pack(side="left", padx=(0, 5))
+        self.rate_limit_entry.bind("<Return>", self.apply_bandwidth_settings)
+        self.rate_limit_entry.bind("<FocusOut>", self.apply_bandwidth_settings)
+        
+        rate_unit_label = ctk.CTkLabel(limit_row, text="MB/s", font=ctk.CTkFont(size=12))
+        rate_unit_label.pack(side="left", padx=(0, 20))
+        
+        schedule_label = ctk.CTkLabel(
+            limit_row,
+            text="限速时段：",
+            font=ctk.CTkFont(size=13, weight="bold"),
+            width=100,
+            anchor="w"
+        )
+        schedule_label.pack(side="left")
+        
+        self.rate_schedule_entry = ctk.CTkEntry(
+            limit_row,
+            placeholder_text="09:00-18:00 2; 18:00-09:00 不限",
+            width=260
+        )
+        self.rate_schedule_entry.pack(side="left", padx=(0, 10))
+        self.rate_schedule_entry.bind("<Return>", self.apply_bandwidth_settings)
+        self.rate_schedule_entry.bind("<FocusOut>", self.apply_bandwidth_settings)
+        
+        # 当前生效的速度上限，或格式错误提示
+        self.rate_limit_status = ctk.CTkLabel(
+            limit_row,
+            text="当前: 不限速",
+            text_color="gray",
+            font=ctk.CTkFont(size=11)
+        )
+        self.rate_limit_status.pack(side="left")
         # ---------------------
         
         # 链接和路径输入区域（同一行）
@@ -575,6 +1382,42 @@ class BiliDownloaderGUI:
         )
         self.btn_pause.pack(side="right")
         
+        # 订阅管理按钮
+        self.btn_subscriptions = ctk.CTkButton(
+            button_row,
+            text="📡 订阅",
+            command=self.open_subscription_window,
+            height=48,
+            font=ctk.CTkFont(size=14, weight="bold"),
+            corner_radius=10,
+            width=110
+        )
+        self.btn_subscriptions.pack(side="right", padx=(0, 10))
+        
+        # 批量链接按钮
+        self.btn_batch = ctk.CTkButton(
+            button_row,
+            text="📋 批量",
+            command=self.open_batch_window,
+            height=48,
+            font=ctk.CTkFont(size=14, weight="bold"),
+            corner_radius=10,
+            width=110
+        )
+        self.btn_batch.pack(side="right", padx=(0, 10))
+        
+        # 任务列表按钮
+        self.btn_status = ctk.CTkButton(
+            button_row,
+            text="📊 列表",
+            command=self.open_status_window,
+            height=48,
+            font=ctk.CTkFont(size=14, weight="bold"),
+            corner_radius=10,
+            width=110
+        )
+        self.btn_status.pack(side="right", padx=(0, 10))
+        
         # 进度条区域
         progress_container = ctk.CTkFrame(control_frame, fg_color="transparent")
         progress_container.pack(pady=(0, 12), padx=20, fill="x")
@@ -597,12 +1440,30 @@ class BiliDownloaderGUI:
         log_frame = ctk.CTkFrame(self.root)
         log_frame.pack(pady=(8, 10), padx=20, fill="both", expand=True)
         
+        log_header = ctk.CTkFrame(log_frame, fg_color="transparent")
+        log_header.pack(fill="x", padx=15, pady=(12, 8))
+        
         log_title = ctk.CTkLabel(
-            log_frame,
+            log_header,
             text="📋 下载日志",
             font=ctk.CTkFont(size=15, weight="bold")
         )
-        log_title.pack(anchor="w", padx=15, pady=(12, 8))
+        log_title.pack(side="left")
+        
+        # 日志显示级别（低于该级别的日志不显示也不写入日志文件）
+        self.log_level_var = ctk.StringVar(value="信息")
+        log_level_combo = ctk.CTkComboBox(
+            log_header,
+            values=list(LOG_LEVEL_OPTIONS),
+            width=80,
+            variable=self.log_level_var,
+            command=self.change_log_level,
+            state="readonly"
+        )
+        log_level_combo.pack(side="right")
+        
+        log_level_label = ctk.CTkLabel(log_header, text="日志级别：", font=ctk.CTkFont(size=12))
+        log_level_label.pack(side="right")
         
         # 日志文本框（增加高度以确保有足够空间）
         self.log_text = ctk.CTkTextbox(
@@ -614,6 +1475,39 @@ class BiliDownloaderGUI:
         )
         self.log_text.pack(pady=(0, 12), padx=15, fill="both", expand=True)
     
+    def apply_bandwidth_settings(self, event=None):
+        """读取限速设置并立即生效（格式错误时保留原设置并提示）"""
+        try:
+            default_rate = parse_rate(self.rate_limit_entry.get())
+            schedule = parse_schedule(self.rate_schedule_entry.get())
+        except ValueError as e:
+            self.rate_limit_status.configure(text=f"格式错误: {e}", text_color="#d32f2f")
+            return
+        self.bandwidth_default_rate = default_rate
+        self.bandwidth_schedule = schedule
+        self.refresh_bandwidth_limit()
+    
+    def refresh_bandwidth_limit(self):
+        """按当前时间和限速时段更新全局速度上限"""
+        rate, rule = get_scheduled_rate(self.bandwidth_schedule, self.bandwidth_default_rate)
+        if rate is None:
+            status = "不限速"
+        elif rate == 0:
+            status = "暂停传输"
+        else:
+            status = f"{format_bytes(rate)}/s"
+        if rule:
+            status += f"（时段 {rule}）"
+        if rate != self.bandwidth_limiter.rate:
+            self.bandwidth_limiter.set_rate(rate)
+            self.log(f"🚦 下载限速: {status}", "info")
+        self.rate_limit_status.configure(text=f"当前: {status}", text_color="gray")
+    
+    def check_bandwidth_schedule(self):
+        """定时按限速时段调整速度上限（界面线程，每 BANDWIDTH_CHECK_INTERVAL 毫秒）"""
+        self.refresh_bandwidth_limit()
+        self.root.after(self.BANDWIDTH_CHECK_INTERVAL, self.check_bandwidth_schedule)
+    
     def toggle_proxy_input(self):
         """切换代理输入框的启用/禁用状态"""
         if self.proxy_enabled_var.get():
@@ -628,113 +1522,135 @@ class BiliDownloaderGUI:
             self.path_entry.delete(0, "end")
             self.path_entry.insert(0, folder)
     
+    @classmethod
+    def create_file_logger(cls, path):
+        """
+        创建写入日志文件的 logger（按大小轮转）
+        
+        Args:
+            path: 日志文件路径
+        
+        Returns:
+            logging.Logger: 日志目录无法创建时返回不输出任何内容的 logger
+        """
+        logger = logging.getLogger('bili_gui')
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+        if not logger.handlers:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                handler = RotatingFileHandler(
+                    path, maxBytes=cls.LOG_FILE_MAX_BYTES, backupCount=cls.LOG_FILE_BACKUPS, encoding='utf-8')
+            except OSError:
+                handler = logging.NullHandler()
+            handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
+            logger.addHandler(handler)
+        return logger
+    
+    def is_log_enabled(self, level):
+        """日志级别是否不低于当前显示级别"""
+        return LOG_LEVELS.get(level, logging.INFO) >= self.log_min_level
+    
+    def change_log_level(self, selection):
+        """切换日志显示级别（之后产生的日志生效）"""
+        self.log_min_level = LOG_LEVEL_OPTIONS[selection]
+    
     def log(self, message, level="info"):
-        """添加日志到文本框"""
-        self.log_text.insert("end", f"[{level.upper()}] {message}\n")
-        self.log_text.see("end")
+        """
+        记录日志（任意线程均可调用）
+        
+        低于显示级别的日志直接丢弃；其余写入日志文件，并排队由界面线程批量显示（见process_log_queue）。
+        """
+        if not self.is_log_enabled(level):
+            return
+        self.file_logger.log(LOG_LEVELS.get(level, logging.INFO), message)
+        self.log_queue.put((level, message))
+    
+    def clear_log(self):
+        """清空日志框（日志文件保留）"""
+        self.log_text.delete("1.0", "end")
+        self.log_line_count = 0
     
     def process_log_queue(self):
-        """处理日志队列"""
+        """
+        处理日志队列（界面线程，每100ms一次）
+        
+        本轮的所有新日志合并为一次插入，日志框超过 LOG_MAX_LINES 行时删除最早的行，
+        日志框的刷新开销与下载时长无关。
+        """
+        lines = []
         try:
-            while True:
+            while len(lines) < self.LOG_BATCH_SIZE:
                 level, msg = self.log_queue.get_nowait()
-                self.log(msg, level)
+                lines.append(f"[{level.upper()}] {msg}\n")
         except queue.Empty:
             pass
         
-        # 每100ms检查一次
-        self.root.after(100, self.process_log_queue)
+        if lines:
+            self.log_text.insert("end", "".join(lines))
+            self.log_line_count += sum(line.count("\n") for line in lines)
+            excess = self.log_line_count - self.LOG_MAX_LINES
+            if excess > 0:
+                self.log_text.delete("1.0", f"{excess + 1}.0")
+                self.log_line_count -= excess
+            self.log_text.see("end")
+        
+        # 每100ms检查一次；积压的日志超过一批时尽快继续处理
+        self.root.after(1 if len(lines) >= self.LOG_BATCH_SIZE else 100, self.process_log_queue)
+    
+    @property
+    def is_paused(self):
+        """当前下载任务是否已暂停"""
+        return self.job_control.paused
     
     def progress_hook(self, d):
-        """下载进度回调 - 优化后的平滑全局总进度显示"""
-        # 第一道拦截（针对下载阶段）
-        # 在函数第一行加入循环检查：while self.is_paused: time.sleep(0.1)
-        while self.is_paused:
-            time.sleep(0.1)
-            # 暂停时进度条显示灰色
-            self.progress_bar.configure(progress_color="#757575")
+        """
+        下载进度回调（下载线程调用，每读取一块数据调用一次）
         
-        # 暂停状态已解除，进度条恢复正常颜色
-        self.progress_bar.configure(progress_color="#1f538d")
+        只更新进度快照，不操作界面控件，界面由 render_progress 在界面线程中定时刷新。
+        """
+        # 暂停时阻塞在事件上，下载线程不再读取数据（不占用CPU）；任务取消时抛出 JobCancelled 结束下载
+        # （进度条颜色由 toggle_pause 切换）
+        (get_job_control() or self.job_control).checkpoint()
         
         try:
-            # 获取关键数据：从d提取playlist_index和playlist_count
-            playlist_index = d.get('playlist_index')
-            playlist_count = d.get('playlist_count')
-            
-            # 更新播放列表信息（优先使用d中的信息，这是yt-dlp在实际下载时提供的准确数量）
-            # 优先使用progress_hook中的playlist_count，因为它考虑了download_archive等过滤条件
-            if playlist_count is not None and playlist_count > 0:
-                # 如果数量发生变化，说明实际要下载的数量与初始数量不同（可能因为download_archive）
-                if self.playlist_count is not None and self.playlist_count != playlist_count:
-                    self.log(f"实际要下载的视频数量: {playlist_count}（初始: {self.playlist_count}，已跳过 {self.playlist_count - playlist_count} 个已下载的视频）", "info")
-                # 使用yt-dlp在实际下载时提供的准确数量
-                self.playlist_count = playlist_count
-            elif self.playlist_count is None:
-                # 如果d中没有，尝试从self中获取（fallback）
-                playlist_count = self.playlist_count
-            
-            if playlist_index is not None:
-                self.current_playlist_index = playlist_index
-            elif self.current_playlist_index is None:
-                # 如果d中没有，初始化为1
-                self.current_playlist_index = 1
-            
-            # 使用self中保存的playlist_count（更可靠）
-            if self.playlist_count is not None:
-                playlist_count = self.playlist_count
-            
             if d.get('status') == 'downloading':
                 # 如果所有视频已完成，不再处理下载状态
                 if self.all_videos_completed:
                     return
                 
-                # 提取当前视频的进度百分比，转化为0.0-1.0的浮点数
-                current_video_percent = 0.0
+                # 提取当前流的已下载字节数和总字节数
                 try:
                     if 'total_bytes' in d and d['total_bytes'] and d['total_bytes'] > 0:
-                        current_video_percent = d.get('downloaded_bytes', 0) / d['total_bytes']
+                        total_bytes = d['total_bytes']
                     elif 'total_bytes_estimate' in d and d['total_bytes_estimate'] and d['total_bytes_estimate'] > 0:
-                        current_video_percent = d.get('downloaded_bytes', 0) / d['total_bytes_estimate']
+                        total_bytes = d['total_bytes_estimate']
                     else:
                         # 容错：没有进度信息，直接返回
                         return
-                    
-                    # 确保进度在0-1范围内
-                    current_video_percent = max(0.0, min(1.0, current_video_percent))
-                except (ZeroDivisionError, KeyError, TypeError, ValueError) as e:
-                    # 容错：解析百分比时（如"Unknown%"）不会导致程序崩溃
+                    downloaded_bytes = max(0, min(int(d.get('downloaded_bytes') or 0), int(total_bytes)))
+                except (KeyError, TypeError, ValueError) as e:
+                    # 容错：解析进度时（如"Unknown%"）不会导致程序崩溃
                     return
                 
-                # 计算核心公式：全局总进度
-                if playlist_count is not None and playlist_count > 1:
-                    # 列表下载模式
-                    # 使用已完成数量和当前视频进度来计算总进度
-                    # 公式：global_progress = (completed_count + current_video_percent) / playlist_count
-                    global_progress = (self.completed_count + current_video_percent) / playlist_count
-                    # 确保进度在0-1范围内
-                    global_progress = max(0.0, min(1.0, global_progress))
-                    current_idx = self.completed_count + 1  # 当前正在下载的是第 completed_count + 1 个
-                else:
-                    # 单视频下载模式
-                    global_progress = current_video_percent
-                    current_idx = None
-                    playlist_count = None
+                # 每个下载线程同一时间只处理一个视频；音视频流并行下载时按流分别记录，
+                # 当前视频进度 = 各路流已下载字节之和 / 各路流总字节之和
+                stream_key = d.get('tmpfilename') or d.get('filename')
+                with self.progress_lock:
+                    streams = self.active_progress.setdefault(get_download_owner(), {})
+                    streams[stream_key] = (downloaded_bytes, total_bytes)
                 
-                # UI更新逻辑：下载状态
-                # 制定进度条self.progress_bar.set(global_progress)
-                self.progress_bar.set(global_progress)
-                global_percent = int(global_progress * 100)
+                # 记录视频的临时文件，程序中断后可继续下载
+                task = self.active_tasks.get(get_download_owner())
+                self.progress_estimator.update_stream(
+                    task[1] if task else get_download_owner(), stream_key, downloaded_bytes, total_bytes)
+                if task:
+                    self.status_model.update_stream(task[1], stream_key, downloaded_bytes, total_bytes, d.get('speed'))
+                    if stream_key not in self.recorded_parts:
+                        self.recorded_parts.add(stream_key)
+                        self.job_store.add_task_part(task[0], task[1], stream_key)
                 
-                # 更新按钮文字显示详情
-                if playlist_count is not None and playlist_count > 1:
-                    # 列表下载：显示 "正在下载 (3/50) - 15%"
-                    self.download_btn.configure(text=f"正在下载 ({current_idx}/{playlist_count}) - {global_percent}%")
-                    self.progress_label.configure(text=f"总进度: {global_percent}% | 已完成: {self.completed_count}/{playlist_count} | 当前视频: {int(current_video_percent * 100)}%")
-                else:
-                    # 单视频下载
-                    self.download_btn.configure(text=f"正在下载 - {global_percent}%")
-                    self.progress_label.configure(text=f"下载进度: {global_percent}%")
+                self.progress_dirty = True
             
             elif d.get('status') == 'finished':
                 # 完成状态处理
@@ -742,68 +1658,8 @@ class BiliDownloaderGUI:
                 if self.all_videos_completed:
                     return
                 
-                # 使用self中保存的信息（优先使用从progress_hook中获取的实际数量）
-                playlist_count = self.playlist_count
-                
-                # 如果playlist_count还没有设置，说明还没有开始实际下载，暂时不处理
-                if playlist_count is None:
-                    return
-                
-                # 增加完成计数器（防止重复计数）
-                if playlist_count is not None and playlist_count > 1:
-                    # 列表下载模式：只有当完成数量小于总数时才增加
-                    if self.completed_count < playlist_count:
-                        self.completed_count += 1
-                else:
-                    # 单视频下载模式
-                    if self.completed_count == 0:
-                        self.completed_count = 1
-                
-                # 关键判断：只有当所有视频都下载完成时才显示100%
-                if playlist_count is not None and playlist_count > 1:
-                    # 列表下载模式
-                    # 按照实际下载完成的视频数量显示对应的百分比
-                    global_progress = self.completed_count / playlist_count
-                    global_progress = max(0.0, min(1.0, global_progress))
-                    global_percent = int(global_progress * 100)
-                    
-                    # 只有当完成数量真正等于总数时才认为全部完成
-                    if self.completed_count >= playlist_count:
-                        # 所有视频都下载完成，显示100%
-                        self.all_videos_completed = True  # 设置完成标志
-                        self.progress_bar.set(1.0)
-                        self.download_btn.configure(text="全部完成！")
-                        self.progress_label.configure(text="全部完成: 100%")
-                        self.log(f"所有 {playlist_count} 个视频下载完成！（已完成: {self.completed_count}）", "info")
-                        # 取消下载，防止重复下载
-                        if self.ydl_instance is not None:
-                            try:
-                                self.ydl_instance.cancel_download()
-                            except:
-                                pass
-                    else:
-                        # 如果只是列表中途的一个视频完成，不要重置进度条，只打印日志
-                        # 保持当前进度，不重置
-                        self.progress_bar.set(global_progress)
-                        self.download_btn.configure(text=f"正在下载 ({self.completed_count}/{playlist_count}) - {global_percent}%")
-                        self.progress_label.configure(text=f"总进度: {global_percent}% | 已完成: {self.completed_count}/{playlist_count}")
-                        # 只打印日志
-                        self.log(f"视频 {self.completed_count}/{playlist_count} 下载完成", "info")
-                else:
-                    # 单视频下载模式，全部完成
-                    # 将进度条强制设为1.0(100%)并显示"下载完成"
-                    self.all_videos_completed = True  # 设置完成标志
-                    self.progress_bar.set(1.0)
-                    self.download_btn.configure(text="下载完成！")
-                    self.progress_label.configure(text="下载完成: 100%")
-                    # 取消下载，防止重复下载
-                    if self.ydl_instance is not None:
-                        try:
-                            self.ydl_instance.cancel_download()
-                        except:
-                            pass
-                
-                # 记录文件信息
+                # 完成计数由下载线程在整个视频（含音视频合并）处理结束后统计
+                # （见on_entry_finished），这里只记录文件信息
                 if 'filename' in d:
                     try:
                         filename = os.path.basename(d['filename'])
@@ -815,113 +1671,711 @@ class BiliDownloaderGUI:
             # 容错：确保在解析错误时不会导致程序崩溃
             pass
     
+    def on_circuit_open(self, host, cooldown, reason):
+        """熔断器触发（任意下载线程调用）"""
+        self.log(f"⛔ {host} 多次触发风控（{reason}），暂停所有请求 {cooldown:.0f} 秒", "warning")
+    
+    def record_entry_error(self, message):
+        """记录当前下载线程正在处理的视频的错误信息（MyLogger 在下载线程中调用）"""
+        task = self.active_tasks.get(get_download_owner())
+        if task:
+            self.status_model.set_error(task[1], message)
+    
+    @staticmethod
+    def get_video_percent(streams):
+        """合并同一视频各路流的进度，返回0.0-1.0"""
+        downloaded = sum(done for done, _ in streams.values())
+        total = sum(size for _, size in streams.values())
+        if total <= 0:
+            return 0.0
+        return max(0.0, min(1.0, downloaded / total))
+    
+    def render_progress(self):
+        """
+        界面线程定时渲染下载进度（每 PROGRESS_RENDER_INTERVAL 毫秒）
+        
+        下载线程每读取一块数据都会更新进度快照，这里合并为固定帧率的一次刷新；
+        没有新进度、下载已结束或全部完成时不刷新。
+        """
+        if self.is_downloading and not self.all_videos_completed:
+            self.progress_estimator.sample()
+            if self.progress_dirty:
+                self.progress_dirty = False
+                self.update_global_progress()
+        # 下载线程请求的更新在进度之后应用（暂停提示、完成文字不会被同一帧的进度覆盖）
+        with self.progress_lock:
+            display, self.pending_display = self.pending_display, {}
+        if display:
+            self.apply_progress_display(display)
+        self.root.after(self.PROGRESS_RENDER_INTERVAL, self.render_progress)
+    
+    def post_progress_display(self, progress=None, **widgets):
+        """
+        请求更新进度控件（下载线程调用；Tk 控件只能在界面线程操作，由 render_progress 应用）
+        
+        同一控件的多次请求合并，渲染前的后一次请求覆盖前一次的同名属性。
+        
+        Args:
+            progress: 进度条位置（None 表示不变）
+            **widgets: 控件属性名 -> configure 参数，如 progress_label={'text': "下载完成！"}
+        """
+        with self.progress_lock:
+            if progress is not None:
+                self.pending_display['progress'] = progress
+            for name, options in widgets.items():
+                self.pending_display.setdefault(name, {}).update(options)
+    
+    def apply_progress_display(self, display):
+        """应用 post_progress_display 请求的控件更新（界面线程调用）"""
+        for name, options in display.items():
+            if name == 'progress':
+                self.progress_bar.set(options)
+            else:
+                getattr(self, name).configure(**options)
+    
+    def set_progress_display(self, progress, button_text, label_text):
+        """更新进度控件，内容未变化的控件不重复刷新"""
+        if self.progress_bar.get() != progress:
+            self.progress_bar.set(progress)
+        if self.download_btn.cget("text") != button_text:
+            self.download_btn.configure(text=button_text)
+        if self.progress_label.cget("text") != label_text:
+            self.progress_label.configure(text=label_text)
+    
+    @staticmethod
+    def format_transfer(estimate):
+        """生成 "已下载/总大小 | 速度 | 剩余时间" 显示文本"""
+        text = f"{format_bytes(estimate['done'])} / {format_bytes(estimate['total'])}"
+        if estimate['rate'] is not None:
+            text += f" | {format_bytes(estimate['rate'])}/s"
+        if estimate['eta'] is not None:
+            text += f" | 剩余 {format_eta(estimate['eta'])}"
+        return text
+    
+    def update_global_progress(self):
+        """根据已完成数量和各下载线程的当前进度刷新全局进度显示（界面线程调用）"""
+        with self.progress_lock:
+            completed = self.completed_count
+            active = [self.get_video_percent(streams) for streams in self.active_progress.values()]
+        playlist_count = self.playlist_count
+        # 按字节估计的总进度（还没有任何视频的大小时为None，按个数计算）
+        estimate = self.progress_estimator.snapshot(playlist_count or 1)
+        
+        # 计算核心公式：全局总进度
+        if playlist_count is not None and playlist_count > 1:
+            # 列表下载模式：每个视频按大小计入
+            # 公式：global_progress = 已下载字节 / 预估总字节
+            # 没有大小信息时：global_progress = (completed_count + sum(current_video_percent)) / playlist_count
+            if estimate is not None:
+                global_progress = estimate['progress']
+            else:
+                global_progress = (completed + sum(active)) / playlist_count
+            # 确保进度在0-1范围内
+            global_progress = max(0.0, min(1.0, global_progress))
+            global_percent = int(global_progress * 100)
+            
+            # 列表下载：显示 "正在下载 (3/50) - 15%"（列表仍在获取中时显示 "3/50+"）
+            count_text = self.format_playlist_count()
+            button_text = f"正在下载 ({min(completed + 1, playlist_count)}/{count_text}) - {global_percent}%"
+            label_text = f"总进度: {global_percent}% | 已完成: {completed}/{count_text}"
+            if len(active) > 1:
+                label_text += f" | 同时下载: {len(active)} 个"
+            if estimate is not None:
+                label_text += f" | {self.format_transfer(estimate)}"
+        else:
+            # 单视频下载模式
+            global_progress = estimate['progress'] if estimate is not None else (active[0] if active else 0.0)
+            global_percent = int(global_progress * 100)
+            button_text = f"正在下载 - {global_percent}%"
+            label_text = f"下载进度: {global_percent}%"
+            if estimate is not None:
+                label_text += f" | {self.format_transfer(estimate)}"
+        self.set_progress_display(global_progress, button_text, label_text)
+    
+    def on_entry_finished(self, skipped=False, task_key=None):
+        """
+        列表中的一个视频处理结束（下载线程调用）
+        
+        Args:
+            skipped: 是否因已在下载记录中而跳过
+            task_key: 视频标识（用于按字节统计进度）
+        """
+        self.progress_estimator.finish(task_key)
+        with self.progress_lock:
+            self.active_progress.pop(get_download_owner(), None)
+            self.completed_count += 1
+            if skipped:
+                self.skipped_count += 1
+            completed = self.completed_count
+        
+        # 如果只是列表中途的一个视频完成，不要重置进度条，只打印日志
+        # （全部完成由on_playlist_finished在列表遍历完且所有下载线程结束后处理）
+        self.progress_dirty = True
+        if not skipped:
+            self.log(f"视频 {completed}/{self.format_playlist_count()} 下载完成", "info")
+    
+    def on_playlist_finished(self):
+        """列表中的所有视频都已处理完毕"""
+        self.all_videos_completed = True  # 设置完成标志
+        self.post_progress_display(1.0, download_btn={'text': "全部完成！"}, progress_label={'text': "全部完成: 100%"})
+        self.log(f"所有 {self.playlist_count} 个视频处理完成！（已完成: {self.completed_count}，其中跳过已下载: {self.skipped_count}）", "info")
+    
+    def format_playlist_count(self):
+        """总数显示文本，列表仍在获取中时加"+"表示可能还有更多"""
+        if self.enumeration_done:
+            return str(self.playlist_count)
+        return f"{self.playlist_count}+"
+    
     def check_ffmpeg(self):
         """检查ffmpeg是否可用"""
         return shutil.which('ffmpeg') is not None
     
     def wait_if_paused(self):
-        """等待暂停状态解除（用于准备阶段）"""
-        while self.is_paused:
-            time.sleep(0.1)
-            # 在等待期间，可以更新UI提示用户当前处于暂停状态
-            if self.is_downloading:
-                self.progress_label.configure(text="已暂停，等待继续...")
-                # 暂停时进度条显示灰色
-                self.progress_bar.configure(progress_color="#757575")
-        
-        # 暂停状态已解除，进度条恢复正常颜色和显示
-        if self.is_downloading:
-            self.progress_bar.configure(progress_color="#1f538d")
-            # 准备中时，由暂停状态恢复继续状态后，进度条显示改为准备中...显示
-            self.progress_label.configure(text="准备中...")
+        """等待暂停状态解除（用于准备阶段）；任务已取消时抛出 JobCancelled"""
+        control = get_job_control() or self.job_control
+        if control.paused and self.is_downloading:
+            # 在等待期间，提示用户当前处于暂停状态，进度条显示灰色
+            self.post_progress_display(
+                progress_label={'text': "已暂停，等待继续..."}, progress_bar={'progress_color': "#757575"})
+            control.checkpoint()
+            # 暂停状态已解除，进度条恢复正常颜色，显示改为准备中...
+            self.post_progress_display(
+                progress_label={'text': "准备中..."}, progress_bar={'progress_color': "#1f538d"})
+        control.checkpoint()
     
     def extract_info_with_pause_check(self, ydl, url):
-        """可中断的extract_info包装函数，在执行过程中检查暂停状态"""
-        result_queue = queue.Queue()
-        exception_queue = queue.Queue()
+        """
+        可中断的extract_info包装函数
         
-        def extract_worker():
-            """在单独线程中执行extract_info"""
-            try:
-                info = ydl.extract_info(url, download=False)
-                result_queue.put(info)
-            except Exception as e:
-                exception_queue.put(e)
+        只解析列表本身（process=False），不会逐个请求视频详情；分页列表只请求首页，
+        后续分页在遍历条目时才请求（见enumerate_entries）。
+        返回的info可直接交给 ydl.process_ie_result 下载，无需再次解析链接。
         
-        # 在单独线程中执行extract_info
-        extract_thread = threading.Thread(target=extract_worker, daemon=True)
-        extract_thread.start()
+        解析过程中的每个网络请求都经过任务控制令牌（见 BiliYoutubeDL.urlopen）：
+        暂停时阻塞在请求前，任务取消时抛出 JobCancelled，直接在当前线程中解析即可，
+        不会在取消后留下仍在运行的解析线程。
+        """
+        logger = ydl.params.get('logger')
+        if isinstance(logger, MyLogger):
+            logger.reset_stats()
+        self.enumeration_start_time = time.monotonic()
+        
+        info = ydl.extract_info(url, download=False, process=False)
+        # 获取列表后立即检查暂停状态
+        self.wait_if_paused()
+        return info
+    
+    def snapshot_download_settings(self):
+        """
+        读取下载设置（界面线程，开始下载时调用）
         
-        # 等待结果，期间检查暂停状态
-        while extract_thread.is_alive():
-            # 检查是否有结果
-            try:
-                info = result_queue.get_nowait()
-                # 获取列表后立即检查暂停状态
-                self.wait_if_paused()
-                return info
-            except queue.Empty:
-                pass
+        Returns:
+            dict: 设置快照，下载线程只读取其中的值
+        """
+        return {
+            'smallest_first': self.smallest_first_var.get(),
+            'incremental_sync': self.incremental_sync_var.get(),
+            'concurrency': self.get_concurrency(),
+            'segments': self.get_segment_count(),
+            'mirror_selection': self.mirror_selection_var.get(),
+        }
+    
+    def get_segment_count(self):
+        """读取单文件分段数设置（1表示不分段，界面线程调用）"""
+        selection = self.segment_var.get()
+        match = re.match(r'\d+', selection)
+        return int(match.group()) if match else 1
+    
+    def get_concurrency(self):
+        """读取并发下载数设置（界面线程调用）"""
+        try:
+            return max(1, int(self.concurrency_var.get()))
+        except (TypeError, ValueError):
+            return 1
+    
+    def enumerate_entries(self, info, logger=None, is_archived=None, job_id=None, ydl_factory=None):
+        """
+        惰性遍历列表条目，边获取分页边下载
+        
+        分页数已知时（如UP主空间）并发请求后续分页，条目仍按列表顺序返回。
+        每发现一个条目就更新总数；遍历结束后确定最终总数并输出列表解析统计。
+        
+        增量同步（传入 is_archived）：UP主空间按发布时间、收藏夹按收藏时间从新到旧排列，
+        连续 INCREMENTAL_STOP_RUN 个视频都已下载时，更早的视频视为已同步，停止请求后续分页。
+        此模式下逐页请求，避免并发请求停止点之后的分页。
+        
+        每个条目都会写入任务记录；遍历完毕后标记任务列表已获取完毕，中断后可直接从记录恢复。
+        
+        Args:
+            info: 列表的info字典（process=False 解析结果）
+            logger: 用于统计接口请求的MyLogger
+            is_archived: 判断条目是否已下载的函数（增量同步时传入）
+            job_id: 下载任务ID
+            ydl_factory: 创建YoutubeDL实例的函数（并发请求分页时每个请求线程使用自己的实例）
+        
+        Yields:
+            dict: 列表条目
+        """
+        page_concurrency = 1 if is_archived else self.PAGE_FETCH_CONCURRENCY
+        discovered = 0
+        archived_run = 0
+        stopped_early = False
+        entries = iter_playlist_entries(
+            info['entries'], page_concurrency, ydl_factory, info.get('webpage_url'), info.get('extractor_key'))
+        for entry in entries:
+            discovered += 1
+            if self.playlist_count is None or discovered > self.playlist_count:
+                self.playlist_count = discovered
+            self.job_store.add_task(job_id, discovered - 1, entry)
+            self.status_model.add(self.job_store.task_key(entry), entry.get('title'))
+            yield entry
             
-            # 检查是否有异常
+            if is_archived:
+                archived_run = archived_run + 1 if is_archived(entry) else 0
+                if archived_run >= self.INCREMENTAL_STOP_RUN:
+                    stopped_early = True
+                    break
+        
+        # 列表遍历完毕，确定实际数量（分页预估值可能偏大）
+        self.playlist_count = discovered
+        self.enumeration_done = True
+        self.job_store.mark_enumerated(job_id, discovered)
+        elapsed = time.monotonic() - self.enumeration_start_time
+        if stopped_early:
+            self.log(f"增量同步: 连续 {archived_run} 个视频已下载，停止获取更早的视频", "info")
+        if isinstance(logger, MyLogger):
+            self.log(f"列表解析完成: 共 {discovered} 个视频，请求 {logger.pages_fetched} 页（共 {logger.api_requests} 次接口调用），耗时 {elapsed:.1f} 秒", "info")
+        else:
+            self.log(f"列表解析完成: 共 {discovered} 个视频，耗时 {elapsed:.1f} 秒", "info")
+    
+    def download_entries_parallel(self, ydl_opts, entries, concurrency, job_id=None, smallest_first=False):
+        """
+        使用线程池并行下载列表中的视频
+        
+        YoutubeDL实例不是线程安全的，每个下载线程各自创建一个实例，
+        从共享的条目迭代器中依次领取视频，直到列表下载完毕。
+        条目迭代器可以是惰性的，领取条目时才请求后续分页。
+        后续若干个视频的元数据由预取线程提前解析，上一个视频下载完即可开始下一个。
+        因临时错误或风控失败的视频放入重试队列，整个列表处理完后再重试（最多 RETRY_ROUNDS 轮）。
+        
+        Args:
+            ydl_opts: yt-dlp 配置（所有线程共用）
+            entries: 列表条目迭代器（url类型的info字典）
+            concurrency: 同时下载的视频数
+            job_id: 下载任务ID（用于记录每个视频的状态）
+            smallest_first: 是否小文件优先
+        """
+        worker_count = max(1, concurrency)
+        if worker_count > 1:
+            self.log(f"启用并行下载: 同时下载 {worker_count} 个视频", "info")
+        
+        # 下载线程属于调用线程所在的任务
+        control = get_job_control() or self.job_control
+        # 同时下载的视频数按 AIMD 自动调整（触发风控时减半），任务取消时唤醒等待名额的线程
+        limiter = AdaptiveConcurrency(worker_count)
+        control.add_cancel_callback(limiter.wake)
+        
+        retry_entries, enumeration_error = self.run_download_pass(
+            ydl_opts, self.slice_entries(entries, job_id), worker_count, job_id, control, limiter, smallest_first)
+        # 让出时未完成的视频保持待下载状态，任务重新开始时再下载
+        for round_number in range(1, self.RETRY_ROUNDS + 1):
+            if not retry_entries or self.job_yielded or control.cancelled:
+                break
+            self.log(f"🔁 {len(retry_entries)} 个视频下载失败，第 {round_number} 轮重试", "info")
+            control.sleep(backoff_delay(round_number))
+            retry_entries, _ = self.run_download_pass(
+                ydl_opts, [entry for entry, _ in retry_entries], worker_count, job_id, control, limiter,
+                smallest_first)
+        
+        if control.cancelled:
+            raise JobCancelled()
+        if not self.job_yielded:
+            # 重试后仍然失败的视频记录为失败（恢复任务时会再次尝试）
+            for entry, error in retry_entries:
+                task_key = self.job_store.task_key(entry)
+                self.job_store.set_task_status(job_id, entry, TASK_FAILED)
+                self.status_model.set_status(task_key, TASK_FAILED, error)
+                self.on_entry_finished(task_key=task_key)
+            if retry_entries:
+                self.log(f"❌ {len(retry_entries)} 个视频重试 {self.RETRY_ROUNDS} 轮后仍然失败", "error")
+        if self.skipped_count:
+            self.log(f"已跳过 {self.skipped_count} 个已下载的视频", "info")
+        if enumeration_error is not None:
+            # 列表未获取完整：任务不标记为完成（记为失败），重新开始时重新获取列表
+            raise enumeration_error
+        if self.job_yielded:
+            self.log(f"⏭ 队列中有其他来源的任务，本任务已下载 {self.completed_count} 个视频，剩余视频稍后继续", "info")
+            return
+        self.on_playlist_finished()
+    
+    def run_download_pass(self, ydl_opts, entries, worker_count, job_id, control, limiter, smallest_first=False):
+        """
+        启动下载线程处理一遍条目（首次下载或一轮重试）
+        
+        Args:
+            ydl_opts: yt-dlp 配置
+            entries: 条目迭代器
+            worker_count: 下载线程数
+            job_id: 下载任务ID
+            control: 任务控制令牌
+            limiter: 自适应并发数（AdaptiveConcurrency）
+            smallest_first: 是否小文件优先
+        
+        Returns:
+            tuple: (需要重试的 [(条目, 错误信息)], 获取列表失败的异常（没有时为None）)
+        """
+        entries_lock = threading.Lock()
+        retry_entries = []
+        
+        # 预取窗口覆盖所有下载线程正在等待的条目，再额外提前解析几个；
+        # 小文件优先时扩大窗口，在更多已预取的视频中选择
+        read_ahead = worker_count + self.PREFETCH_AHEAD + (self.SMALLEST_FIRST_WINDOW if smallest_first else 0)
+        prefetcher = MetadataPrefetcher(
+            entries, lambda: BiliYoutubeDL(ydl_opts),
+            read_ahead=read_ahead, workers=self.PREFETCH_WORKERS, smallest_first=smallest_first,
+            on_enumeration_error=self.on_enumeration_error)
+        
+        def next_entry():
+            with entries_lock:
+                return next(prefetcher, None)
+        
+        def playlist_worker():
+            bind_job_control(control)
             try:
-                exception = exception_queue.get_nowait()
-                raise exception
-            except queue.Empty:
+                with BiliYoutubeDL(ydl_opts) as worker_ydl:
+                    while True:
+                        # 领取新视频前检查暂停状态（任务已取消时抛出 JobCancelled）
+                        self.wait_if_paused()
+                        prefetched = next_entry()
+                        if prefetched is None:
+                            break
+                        entry = prefetched.entry
+                        task_key = self.job_store.task_key(entry)
+                        
+                        # 已在下载记录中的视频（多P视频需全部分P已下载）直接跳过，无需再请求视频详情
+                        if worker_ydl.is_entry_archived(entry):
+                            self.job_store.set_task_status(job_id, entry, TASK_SKIPPED)
+                            self.status_model.set_status(task_key, TASK_SKIPPED)
+                            self.on_entry_finished(skipped=True, task_key=task_key)
+                            continue
+                        
+                        self.active_tasks[threading.get_ident()] = (job_id, task_key)
+                        self.status_model.set_status(task_key, ROW_ACTIVE)
+                        try:
+                            # 预取结果有效时直接下载，否则（未预取/失败/已过期）重新解析
+                            info = prefetched.get_info()
+                            if info is not None:
+                                self.progress_estimator.set_estimate(task_key, estimate_info_size(info))
+                            error_type, error = self.download_entry(worker_ydl, entry, info, control, limiter)
+                        except JobCancelled:
+                            # 任务取消导致的失败不记录为失败，未下载完的视频保持待下载状态
+                            self.status_model.set_status(task_key, TASK_PENDING)
+                            raise
+                        finally:
+                            self.active_tasks.pop(threading.get_ident(), None)
+                        
+                        if error_type is None:
+                            self.job_store.set_task_status(job_id, entry, TASK_DONE)
+                            self.status_model.set_status(task_key, TASK_DONE)
+                            self.on_entry_finished(task_key=task_key)
+                        elif error_type == ERROR_PERMANENT:
+                            # 永久错误（视频不存在、需要大会员等）重试也不会成功
+                            self.log(f"视频下载失败 ({entry.get('url') or entry.get('id')}): {error}", "error")
+                            self.job_store.set_task_status(job_id, entry, TASK_FAILED)
+                            self.status_model.set_status(task_key, TASK_FAILED, error)
+                            self.on_entry_finished(task_key=task_key)
+                        else:
+                            # 临时错误和风控：放入重试队列，任务记录中保持待下载状态
+                            self.log(f"视频下载失败，稍后重试 ({entry.get('url') or entry.get('id')}): {error}", "warning")
+                            self.status_model.set_status(task_key, TASK_PENDING, error)
+                            with entries_lock:
+                                retry_entries.append((entry, error))
+            except JobCancelled:
+                # 任务已取消：未下载完的视频保持待下载状态，恢复任务时继续
                 pass
+        
+        workers = [threading.Thread(target=playlist_worker, daemon=True) for _ in range(worker_count)]
+        try:
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        finally:
+            prefetcher.close()
+        return retry_entries, prefetcher.enumeration_error
+    
+    def on_enumeration_error(self, error):
+        """
+        获取列表后续分页失败（下载线程领取条目时调用）
+        
+        已获取的视频继续下载；接口风控错误码计入熔断器，提示需要登录时重新读取浏览器Cookie。
+        """
+        error_type = classify_error(error)
+        message = str(error)
+        self.log(f"❌ 获取列表失败，已获取的视频继续下载，剩余视频在重新开始任务时获取: {message}", "error")
+        if error_type == ERROR_RATE_LIMITED and not has_http_rate_limit(error):
+            # HTTP 412/429 已在请求时计入熔断器
+            self.risk_breaker.record_rate_limited(API_HOST, message)
+        elif error_type == ERROR_PERMANENT and (LOGIN_REQUIRED_RE.search(message) or is_unauthorized(error)):
+            self.cookie_cache.invalidate()
+    
+    def download_entry(self, ydl, entry, info, control, limiter):
+        """
+        下载列表中的一个视频，临时错误按指数退避重试（最多 ENTRY_RETRIES 次）
+        
+        每次尝试前等待B站接口的熔断结束，并按自适应并发数领取名额。
+        触发风控时不在当前线程重试（风控期间立即重试只会延长限制），交给调用方放入重试队列。
+        
+        Args:
+            ydl: 当前下载线程的 BiliYoutubeDL 实例
+            entry: 列表条目
+            info: 预取的视频信息（None 表示需要重新解析）
+            control: 任务控制令牌
+            limiter: 自适应并发数（AdaptiveConcurrency）
+        
+        Returns:
+            tuple: (错误类型, 错误信息)，下载成功时为 (None, None)
+        
+        Raises:
+            JobCancelled: 任务被取消
+        """
+        for attempt in range(self.ENTRY_RETRIES + 1):
+            self.risk_breaker.wait(API_HOST, control)
+            limiter.acquire(control)
+            error_type = ERROR_TRANSIENT
+            try:
+                ydl.pop_last_error()
+                ydl.pop_archived_ids()
+                error = None
+                try:
+                    # 预取结果只用于第一次尝试，重试时重新解析（播放地址可能已过期）
+                    ydl.process_ie_result(info if info is not None and attempt == 0 else dict(entry), download=True)
+                except JobCancelled:
+                    raise
+                except Exception as e:
+                    error = e
+                # 任务取消导致的失败在这里统一结束
+                if control.cancelled:
+                    raise JobCancelled()
+                # ignoreerrors 模式下失败不会抛出异常：没有错误且写入（或命中）了下载记录才算成功，
+                # 多P视频的各分P分别记录，任一分P失败都会留下错误
+                archived_ids = ydl.pop_archived_ids()
+                error = error or ydl.pop_last_error()
+                if error is None and archived_ids:
+                    error_type = None
+                    # 全部分P完成后为条目本身写入记录，之后无需解析即可跳过
+                    ydl.record_entry_archive(entry, archived_ids)
+                else:
+                    error = error or '下载失败'
+                    error_type = classify_error(error)
+            finally:
+                limit = limiter.release(error_type)
+                if limit is not None:
+                    self.log(f"{'📈' if error_type is None else '📉'} 同时下载的视频数调整为 {limit}", "info")
+            
+            if error_type is None:
+                self.risk_breaker.record_success(API_HOST)
+                return None, None
+            message = str(error)
+            if error_type == ERROR_PERMANENT and (LOGIN_REQUIRED_RE.search(message) or is_unauthorized(error)):
+                # 提示需要登录（或 401）：缓存的浏览器Cookie可能已失效，之后创建的实例重新读取
+                self.cookie_cache.invalidate()
+            if error_type == ERROR_RATE_LIMITED:
+                # 接口返回的风控错误码（HTTP 状态正常）不会在请求时计入熔断器，在这里补记
+                if not has_http_rate_limit(error):
+                    self.risk_breaker.record_rate_limited(API_HOST, message)
+                return error_type, message
+            if error_type == ERROR_PERMANENT or attempt == self.ENTRY_RETRIES:
+                return error_type, message
+            delay = backoff_delay(attempt)
+            self.log(f"⚠️ 下载失败，{delay:.0f} 秒后重试（{attempt + 1}/{self.ENTRY_RETRIES}）: {message}", "warning")
+            control.sleep(delay)
+    
+    def slice_entries(self, entries, job_id):
+        """
+        按批交出条目；每交出 JOB_SLICE_SIZE 个检查一次是否有其他来源的任务排队，有则让出
+        
+        让出前先取完剩余的列表（只请求分页、写入任务记录，不下载），
+        任务重新排队后直接从任务记录继续，不会重复获取列表。
+        
+        Args:
+            entries: 条目迭代器
+            job_id: 下载任务ID
+        
+        Yields:
+            dict: 条目
+        """
+        self.job_yielded = False
+        entries = iter(entries)
+        for handed_out, entry in enumerate(entries, 1):
+            yield entry
+            if job_id is not None and handed_out % self.JOB_SLICE_SIZE == 0 and self.job_store.has_other_queued(job_id):
+                self.job_yielded = True
+                for _ in entries:
+                    pass
+                return
+    
+    def run_download(self, ydl_opts, url, settings, degraded=False, job_id=None):
+        """
+        使用给定配置解析并下载链接
+        
+        列表只解析一次：解析结果直接交给 process_ie_result 下载，
+        不再调用 ydl.download([url]) 重复请求整个收藏夹/UP主空间。
+        任务记录中列表已获取完毕时（中断后恢复），直接下载记录中未完成的视频。
+        
+        Args:
+            ydl_opts: yt-dlp 配置
+            url: 视频/收藏夹/UP主空间链接
+            settings: 开始下载时的界面设置快照（见 snapshot_download_settings）
+            degraded: 是否为降级（不登录）模式，仅影响日志提示
+            job_id: 下载任务ID
+        
+        Returns:
+            bool: 任务是否中途让出（剩余视频需要重新排队）
+        """
+        done_message = "批量下载完成！（已降级为不登录模式，可能画质较低）" if degraded else "批量下载完成！"
+        
+        with BiliYoutubeDL(ydl_opts) as ydl:
+            # 保存ydl实例，用于取消下载
+            self.ydl_instance = ydl
             
-            # 检查暂停状态
-            if self.is_paused:
-                # 如果暂停了，等待继续（但extract_info会继续执行）
-                time.sleep(0.1)
-                if self.is_downloading:
-                    self.progress_label.configure(text="已暂停，等待继续...（正在获取列表）")
-                    # 暂停时进度条显示灰色
-                    self.progress_bar.configure(progress_color="#757575")
+            # 检查暂停状态（准备阶段）
+            self.wait_if_paused()
+            
+            self.status_model.clear()
+            resume = self.job_store.get_resumable_tasks(job_id) if job_id is not None else None
+            if resume is not None:
+                self.log(f"使用任务记录中的视频列表: 共 {resume['total']} 个视频，已完成 {resume['finished']} 个，剩余 {len(resume['entries'])} 个（无需重新获取列表）", "info")
+                if resume['part_files']:
+                    self.log(f"发现 {resume['part_files']} 个未完成的临时文件，将继续下载", "info")
+                self.playlist_count = resume['total']
+                self.enumeration_done = True
+                self.current_playlist_index = 1
+                self.completed_count = resume['finished']
+                self.skipped_count = 0
+                self.active_progress = {}
+                # 上次已完成的视频大小未知，按平均大小计入总进度
+                self.progress_estimator.reset(resume['finished'])
+                self.all_videos_completed = False
+                # 批量任务包含多个来源的视频，按来源轮流下载
+                for entry in resume['entries']:
+                    self.status_model.add(self.job_store.task_key(entry), entry.get('title'))
+                entries = interleave_by_source(resume['entries'])
+                self.download_entries_parallel(
+                    ydl_opts, entries, settings['concurrency'], job_id, settings['smallest_first'])
+                if self.job_yielded:
+                    return True
+                self.log(done_message, "info")
+                self.post_progress_display(progress_label={'text': "下载完成！"})
+                return False
+            
+            # 提取信息查看有多少个视频（使用可中断的包装函数）
+            self.log("正在获取视频列表...", "info")
+            info = self.extract_info_with_pause_check(ydl, url)
+            if info is None:
+                raise Exception("无法解析该链接，请检查链接是否正确")
+            
+            if 'entries' in info:
+                # 列表条目按页惰性获取，这里只使用预估总数，遍历过程中会逐步更新
+                total = estimate_entry_count(info)
+                self.playlist_count = total
+                self.enumeration_done = False
+                self.current_playlist_index = 1  # 初始化当前索引为1
+                self.completed_count = 0  # 重置完成计数器
+                self.skipped_count = 0
+                self.active_progress = {}
+                self.progress_estimator.reset()
+                self.all_videos_completed = False  # 重置完成标志
+                mode_hint = "，已降级为不登录模式" if degraded else ""
+                if total:
+                    self.log(f"列表约有 {total} 个视频，边获取列表边下载{mode_hint}...", "info")
+                else:
+                    self.log(f"开始获取列表，边获取列表边下载{mode_hint}...", "info")
             else:
-                time.sleep(0.1)  # 短暂等待，避免CPU占用过高
-                # 非暂停状态，进度条恢复正常颜色
-                if self.is_downloading:
-                    self.progress_bar.configure(progress_color="#1f538d")
-                    # 准备中时，由暂停状态恢复继续状态后，进度条显示改为准备中...显示
-                    if self.progress_label.cget("text") in ["已暂停，等待继续...（正在获取列表）", "已暂停，等待继续..."]:
-                        self.progress_label.configure(text="正在获取视频列表...")
-        
-        # 线程已结束，获取结果
-        try:
-            info = result_queue.get(timeout=0.1)
-            # 获取列表后立即检查暂停状态
+                # 单视频
+                self.playlist_count = None
+                self.current_playlist_index = None
+                self.completed_count = 0
+                self.progress_estimator.reset()
+                self.all_videos_completed = False  # 重置完成标志
+            
+            # 检查暂停状态（开始下载前）
             self.wait_if_paused()
-            return info
-        except queue.Empty:
-            # 检查是否有异常
+            
+            # 开始下载：直接处理已解析的info（暂停逻辑在progress_hook中处理）
             try:
-                exception = exception_queue.get(timeout=0.1)
-                raise exception
-            except queue.Empty:
-                # 如果都没有，可能是超时，尝试再次获取
-                if not result_queue.empty():
-                    info = result_queue.get()
-                    self.wait_if_paused()
-                    return info
-                raise Exception("获取视频列表超时")
-    
-    def download_worker(self):
-        """下载工作线程"""
+                if 'entries' in info:
+                    # 列表：由下载线程池并行下载各个视频
+                    is_archived = ydl.is_entry_archived if settings['incremental_sync'] else None
+                    entries = self.enumerate_entries(
+                        info, ydl.params.get('logger'), is_archived, job_id, lambda: BiliYoutubeDL(ydl_opts))
+                    self.download_entries_parallel(
+                        ydl_opts, entries, settings['concurrency'], job_id, settings['smallest_first'])
+                    if self.job_yielded:
+                        return True
+                else:
+                    # 单视频
+                    self.status_model.add(url, info.get('title'), ROW_ACTIVE)
+                    self.active_tasks[threading.get_ident()] = (job_id, url)
+                    ydl.pop_last_error()
+                    ydl.pop_archived_ids()
+                    try:
+                        ydl.process_ie_result(info, download=True)
+                    finally:
+                        self.active_tasks.pop(threading.get_ident(), None)
+                    archived_ids = ydl.pop_archived_ids()
+                    error = ydl.pop_last_error()
+                    self.status_model.set_status(
+                        url, TASK_DONE if archived_ids and error is None else TASK_FAILED,
+                        None if error is None else str(error))
+                    self.completed_count = 1
+                    self.all_videos_completed = True  # 设置完成标志
+                    self.post_progress_display(1.0, download_btn={'text': "下载完成！"})
+            except Exception:
+                # 如果是因为取消下载导致的异常，这是正常的
+                if self.all_videos_completed:
+                    self.log(done_message, "info")
+                    self.post_progress_display(progress_label={'text': "下载完成！"})
+                    return
+                # 其他异常，重新抛出
+                raise
+            
+            # 下载完成后，检查是否真的全部完成
+            if self.all_videos_completed or degraded:
+                self.log(done_message, "info")
+                self.post_progress_display(progress_label={'text': "下载完成！"})
+            return False
+    
+    def download_worker(self, settings):
+        """
+        下载工作线程
+        
+        Args:
+            settings: 开始下载时在界面线程读取的设置快照（见 snapshot_download_settings）
+        """
         ydl_opts = None  # 初始化ydl_opts变量
         format_str = None  # 初始化format_str变量
         save_path = None  # 初始化save_path变量
         url = None  # 初始化url变量
         cookie_selection = None  # 初始化cookie_selection变量
         cookie_type = None  # 初始化cookie_type变量
+        degraded = False  # 是否已降级为不登录模式
+        archive = None  # 初始化下载记录（SQLite）
+        job_id = self.current_job_id  # 当前下载任务ID
+        job_status = JOB_FAILED  # 任务结束时写入的状态
+        metadata_cache = None  # 初始化接口元数据缓存（SQLite）
+        network_start = network_stats.snapshot()  # 本任务开始时的连接统计
+        # 当前线程及其启动的下载线程、子进程都属于本任务
+        control = self.job_control
+        bind_job_control(control)
         
         try:
             # 优先使用保存的链接，如果没有则使用输入框的值
             url = self.current_download_url if self.current_download_url else self.link_entry.get().strip()
             if not url:
                 self.log("错误: 请输入视频链接", "error")
+                self.post_progress_display(download_btn={'text': "开始批量下载", 'state': "normal"})
                 self.is_downloading = False
-                self.download_btn.configure(text="开始批量下载", state="normal")
                 return
             
             save_path = self.path_entry.get().strip()
@@ -934,6 +2388,7 @@ class BiliDownloaderGUI:
             
             self.log(f"开始下载: {url}", "info")
             self.log(f"保存路径: {save_path}", "info")
+            self.job_store.update_job(job_id, save_path=save_path)
             
             # 检查暂停状态（准备阶段）
             self.wait_if_paused()
@@ -1020,16 +2475,43 @@ class BiliDownloaderGUI:
                 cookie_type = 'cookiesfrombrowser'
                 self.log(f"使用 {cookie_selection} 的 Cookie", "info")
             
+            # 打开下载记录（首次使用时自动导入旧版 archive.txt）
+            archive = DownloadArchive(
+                os.path.join(save_path, 'archive.db'),
+                legacy_path=os.path.join(save_path, 'archive.txt'))
+            # 接口元数据缓存（与保存路径无关，放在程序目录下）
+            metadata_cache = MetadataCache(os.path.join(os.getcwd(), 'metadata_cache.db'))
+            
             # 配置下载选项
             ydl_opts = {
                 'format': format_str,
                 'outtmpl': os.path.join(save_path, '%(uploader)s/%(title)s.%(ext)s'),
-                'download_archive': os.path.join(save_path, 'archive.txt'),
+                'download_archive': archive,
+                'metadata_cache': metadata_cache,
                 'ignoreerrors': True,
                 'writethumbnail': True,
                 'progress_hooks': [self.progress_hook],
-                'logger': MyLogger(self.log_text, self.log_queue, app=self),
+                'logger': MyLogger(self.log, self.is_log_enabled, self.record_entry_error),
+                # 任务控制令牌：每个网络请求前检查暂停/取消
+                'job_control': control,
+                # 全局限速器：所有下载连接共用速度上限
+                'bandwidth_limiter': self.bandwidth_limiter,
+                # 风控熔断器：熔断期间所有请求等待
+                'circuit_breaker': self.risk_breaker,
+                # 浏览器Cookie缓存：各下载线程不再重复读取浏览器数据库
+                'cookie_cache': self.cookie_cache,
+                # 分段多连接下载（1表示关闭）及分段线程的暂停/取消检查
+                'segmented_connections': settings['segments'],
+                'pause_check': control.checkpoint,
+                # CDN镜像优选（下载前测速选择最快的镜像，速度过低时自动切换）
+                'cdn_mirror_selection': settings['mirror_selection'],
             }
+            if ydl_opts['segmented_connections'] > 1:
+                self.log(f"⚡ 已启用分段下载: 每个文件使用 {ydl_opts['segmented_connections']} 个连接", "info")
+            if ydl_opts['cdn_mirror_selection']:
+                self.log("🛰️ 已启用CDN优选: 每个文件下载前测速选择最快的镜像", "info")
+            if settings['incremental_sync']:
+                self.log(f"🔁 已启用增量同步: 连续 {self.INCREMENTAL_STOP_RUN} 个视频已下载时停止获取列表", "info")
             # 添加后处理器（仅音频模式）
             if postprocessors:
                 ydl_opts['postprocessors'] = postprocessors
@@ -1039,90 +2521,19 @@ class BiliDownloaderGUI:
             # 合并Cookie配置
             if cookie_config:
                 ydl_opts.update(cookie_config)
+                # 获取列表前先检查登录状态，Cookie无效时直接以不登录模式获取，不会获取两遍列表
+                if not self.probe_login_state(ydl_opts, cookie_type, cookie_selection):
+                    ydl_opts = self.strip_cookie_options(ydl_opts)
+                    cookie_type = None
+                    degraded = True
             
-            # 开始下载 - 包装在try-except中捕获初始化错误
-            try:
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    # 保存ydl实例，用于取消下载
-                    self.ydl_instance = ydl
-                    
-                    # 检查暂停状态（准备阶段）
-                    self.wait_if_paused()
-                    
-                    # 提取信息查看有多少个视频（使用可中断的包装函数）
-                    self.log("正在获取视频列表...", "info")
-                    info = self.extract_info_with_pause_check(ydl, url)
-                    
-                    if 'entries' in info:
-                        # 解析正确的视频数量（过滤掉None）
-                        entries = [e for e in info['entries'] if e is not None]
-                        total = len(entries)
-                        # 初始视频数量（所有视频，包括已下载的）
-                        initial_count = total
-                        # 注意：实际要下载的数量可能少于这个数量（因为download_archive会跳过已下载的）
-                        # 实际数量会在progress_hook中从yt-dlp获取
-                        self.playlist_count = total  # 初始值，会在progress_hook中更新为实际值
-                        self.current_playlist_index = 1  # 初始化当前索引为1
-                        self.completed_count = 0  # 重置完成计数器
-                        self.all_videos_completed = False  # 重置完成标志
-                        self.log(f"找到 {initial_count} 个视频（实际下载数量将在下载过程中确定）...", "info")
-                    else:
-                        # 单视频
-                        self.playlist_count = None
-                        self.current_playlist_index = None
-                        self.completed_count = 0
-                        self.all_videos_completed = False  # 重置完成标志
-                    
-                    # 检查暂停状态（开始下载前）
-                    self.wait_if_paused()
-                    
-                    # 检查是否已完成（防止重复下载）
-                    if self.all_videos_completed:
-                        self.log("所有视频已完成，停止下载", "info")
-                        return
-                    
-                    # 开始下载（暂停逻辑在progress_hook中处理）
-                    try:
-                        ydl.download([url])
-                    except Exception as download_error:
-                        # 如果是因为取消下载导致的异常，这是正常的
-                        if self.all_videos_completed:
-                            # 所有视频已完成，取消下载是正常的
-                            self.log("批量下载完成！", "info")
-                            self.progress_label.configure(text="下载完成！")
-                            return
-                        else:
-                            # 其他异常，重新抛出
-                            raise
-                    
-                    # 下载完成后，检查是否真的全部完成
-                    if self.all_videos_completed:
-                        self.log("批量下载完成！", "info")
-                        self.progress_label.configure(text="下载完成！")
-                        return
-            except Exception as init_error:
-                # 捕获YoutubeDL初始化时的错误（包括Cookie相关错误）
-                error_msg = str(init_error)
-                error_type = type(init_error).__name__
-                
-                # 检查是否是Cookie相关错误
-                is_cookie_error = (
-                    cookie_type and (
-                        'cookie' in error_msg.lower() or 
-                        'browser' in error_msg.lower() or
-                        'CookieLoadError' in error_type or
-                        'database' in error_msg.lower() or
-                        'locked' in error_msg.lower()
-                    )
-                )
-                
-                if is_cookie_error:
-                    # Cookie初始化失败，重新抛出以便外层处理
-                    raise init_error
-                else:
-                    # 其他初始化错误，直接抛出
-                    raise init_error
+            # 开始下载（Cookie初始化错误会直接抛到外层，由降级逻辑处理）
+            yielded = self.run_download(ydl_opts, url, settings, degraded=degraded, job_id=job_id)
+            job_status = JOB_QUEUED if yielded else JOB_DONE
             
+        except JobCancelled:
+            job_status = JOB_CANCELLED
+            self.log("⏹ 当前任务已取消", "info")
         except Exception as e:
             error_msg = str(e)
             error_type = type(e).__name__
@@ -1142,107 +2553,19 @@ class BiliDownloaderGUI:
             
             if is_cookie_error and ydl_opts:
                 # 提供详细的错误信息和解决方案
-                if cookie_type == 'cookiesfrombrowser':
-                    browser_display_name = cookie_selection.split(" ")[0]
-                    self.log(f"⚠️ {browser_display_name} Cookie读取失败", "warning")
-                    self.log(f"   错误详情: {error_msg}", "warning")
-                    
-                    # Edge浏览器特殊提示
-                    if 'edge' in str(cookie_selection).lower():
-                        self.log("🛑【Edge 特别注意】：Edge 的 Cookie 数据库通常被后台进程锁定。", "warning")
-                        self.log("👉 请尝试：1. 关闭所有 Edge 窗口。", "warning")
-                        self.log("👉 2. 打开任务管理器，强制结束所有 'Microsoft Edge' 进程。", "warning")
-                        self.log("👉 3. 或者使用 '本地 cookies.txt' 模式。", "warning")
-                    else:
-                        self.log("   可能的原因：", "warning")
-                        self.log("   1. 浏览器正在运行，请先关闭浏览器后重试", "warning")
-                        self.log("   2. 浏览器Cookie数据库被锁定", "warning")
-                        self.log("   3. 权限不足，请以管理员身份运行", "warning")
-                        self.log("   4. 浏览器Cookie数据库不存在或已损坏", "warning")
-                elif cookie_type == 'cookiefile':
-                    self.log(f"⚠️ cookies.txt 文件读取失败", "warning")
-                    self.log(f"   错误详情: {error_msg}", "warning")
-                    self.log("   可能的原因：", "warning")
-                    self.log("   1. cookies.txt 文件格式不正确", "warning")
-                    self.log("   2. cookies.txt 文件已损坏或为空", "warning")
-                    self.log("   3. 文件权限不足，无法读取", "warning")
+                self.log_cookie_error(cookie_type, cookie_selection, error_msg)
                 
                 self.log("🔄 正在尝试以降级模式（不使用登录）重试...", "info")
                 
-                # 重新构建ydl_opts，移除Cookie配置（但保留代理配置和下载模式配置）
-                ydl_opts_no_cookie = {
-                    'format': format_str,
-                    'outtmpl': os.path.join(save_path, '%(uploader)s/%(title)s.%(ext)s'),
-                    'download_archive': os.path.join(save_path, 'archive.txt'),
-                    'ignoreerrors': True,
-                    'writethumbnail': True,
-                    'progress_hooks': [self.progress_hook],
-                    'logger': MyLogger(self.log_text, self.log_queue, app=self),
-                }
-                # 保留后处理器配置（仅音频模式）
-                if postprocessors:
-                    ydl_opts_no_cookie['postprocessors'] = postprocessors
-                # 保留代理配置
-                if proxy_url:
-                    ydl_opts_no_cookie['proxy'] = proxy_url
+                # 重新构建ydl_opts，移除Cookie配置（保留代理、下载模式等其他配置）
+                ydl_opts_no_cookie = self.strip_cookie_options(ydl_opts)
                 
                 try:
-                    with yt_dlp.YoutubeDL(ydl_opts_no_cookie) as ydl:
-                        # 保存ydl实例，用于取消下载
-                        self.ydl_instance = ydl
-                        
-                        # 检查暂停状态（准备阶段）
-                        self.wait_if_paused()
-                        
-                        # 提取信息查看有多少个视频（使用可中断的包装函数）
-                        self.log("正在获取视频列表...", "info")
-                        info = self.extract_info_with_pause_check(ydl, url)
-                        
-                        if 'entries' in info:
-                            # 解析正确的视频数量（过滤掉None）
-                            entries = [e for e in info['entries'] if e is not None]
-                            total = len(entries)
-                            # 初始视频数量（所有视频，包括已下载的）
-                            initial_count = total
-                            # 注意：实际要下载的数量可能少于这个数量（因为download_archive会跳过已下载的）
-                            # 实际数量会在progress_hook中从yt-dlp获取
-                            self.playlist_count = total  # 初始值，会在progress_hook中更新为实际值
-                            self.current_playlist_index = 1  # 初始化当前索引为1
-                            self.completed_count = 0  # 重置完成计数器
-                            self.all_videos_completed = False  # 重置完成标志
-                            self.log(f"找到 {initial_count} 个视频（实际下载数量将在下载过程中确定，已降级为不登录模式）...", "info")
-                        else:
-                            self.playlist_count = None
-                            self.current_playlist_index = None
-                            self.completed_count = 0
-                            self.all_videos_completed = False  # 重置完成标志
-                        
-                        # 检查暂停状态（开始下载前）
-                        self.wait_if_paused()
-                        
-                        # 检查是否已完成（防止重复下载）
-                        if self.all_videos_completed:
-                            self.log("所有视频已完成，停止下载", "info")
-                            return
-                        
-                        # 开始下载（暂停逻辑在progress_hook中处理）
-                        try:
-                            ydl.download([url])
-                        except Exception as download_error:
-                            # 如果是因为取消下载导致的异常，这是正常的
-                            if self.all_videos_completed:
-                                # 所有视频已完成，取消下载是正常的
-                                self.log("批量下载完成！（已降级为不登录模式，可能画质较低）", "info")
-                                return
-                            else:
-                                # 其他异常，重新抛出
-                                raise
-                        
-                        # 下载完成后，检查是否真的全部完成
-                        if self.all_videos_completed:
-                            self.log("批量下载完成！（已降级为不登录模式，可能画质较低）", "info")
-                            return
-                    self.log("批量下载完成！（已降级为不登录模式，可能画质较低）", "info")
+                    yielded = self.run_download(ydl_opts_no_cookie, url, settings, degraded=True, job_id=job_id)
+                    job_status = JOB_QUEUED if yielded else JOB_DONE
+                except JobCancelled:
+                    job_status = JOB_CANCELLED
+                    self.log("⏹ 当前任务已取消", "info")
                 except Exception as e2:
                     self.log(f"下载失败: {str(e2)}", "error")
             else:
@@ -1251,14 +2574,125 @@ class BiliDownloaderGUI:
         finally:
             # 结束处理：重置所有状态
             # 联动逻辑：当下载线程彻底结束（或者成功失败），重置暂停按钮不可用
-            self.is_downloading = False
-            self.is_paused = False  # 确保self.is_paused恢复为False（防止下次开始直接卡死）
             self.all_videos_completed = False  # 重置完成标志
             self.ydl_instance = None  # 清除ydl实例
-            self.download_btn.configure(text="开始批量下载", state="normal")
-            self.btn_pause.configure(state="disabled", text="⏸ 暂停任务", fg_color="#d32f2f", hover_color="#b71c1c")
-            self.progress_bar.set(0)
-            self.progress_bar.configure(progress_color="#1f538d")  # 进度条恢复正常颜色
+            self.job_store.update_job(job_id, status=job_status)
+            if archive is not None:
+                archive.close()
+            if metadata_cache is not None:
+                if metadata_cache.hits or metadata_cache.revalidated:
+                    self.log(f"元数据缓存: 命中 {metadata_cache.hits} 次，验证后续用 {metadata_cache.revalidated} 次，实际请求 {metadata_cache.misses} 次", "info")
+                metadata_cache.close()
+            self.log_network_stats(network_start)
+            # 控件由界面线程重置（见 post_progress_display），完成文字保留在进度标签中
+            self.post_progress_display(
+                0,
+                download_btn={'text': "开始批量下载", 'state': "normal"},
+                btn_pause={'state': "disabled", 'text': "⏸ 暂停任务", 'fg_color': "#d32f2f", 'hover_color': "#b71c1c"},
+                progress_bar={'progress_color': "#1f538d"},  # 进度条恢复正常颜色
+            )
+            # 最后才标记下载结束：界面线程随即可能开始下一个排队任务（start_download 会丢弃
+            # 尚未应用的控件更新），之前请求的重置不会在新任务开始后才应用
+            self.is_downloading = False
+    
+    @staticmethod
+    def strip_cookie_options(ydl_opts):
+        """移除 yt-dlp 配置中的Cookie设置（保留代理、下载模式等其他配置）"""
+        return {
+            key: value for key, value in ydl_opts.items()
+            if key not in ('cookiefile', 'cookiesfrombrowser')
+        }
+    
+    def log_cookie_error(self, cookie_type, cookie_selection, error_msg):
+        """
+        输出Cookie读取失败的原因和解决办法
+        
+        Args:
+            cookie_type: 'cookiesfrombrowser' 或 'cookiefile'
+            cookie_selection: 界面上选择的登录凭证来源
+            error_msg: 错误信息
+        """
+        if cookie_type == 'cookiesfrombrowser':
+            browser_display_name = cookie_selection.split(" ")[0]
+            self.log(f"⚠️ {browser_display_name} Cookie读取失败", "warning")
+            self.log(f"   错误详情: {error_msg}", "warning")
+            
+            # Edge浏览器特殊提示
+            if 'edge' in str(cookie_selection).lower():
+                self.log("🛑【Edge 特别注意】：Edge 的 Cookie 数据库通常被后台进程锁定。", "warning")
+                self.log("👉 请尝试：1. 关闭所有 Edge 窗口。", "warning")
+                self.log("👉 2. 打开任务管理器，强制结束所有 'Microsoft Edge' 进程。", "warning")
+                self.log("👉 3. 或者使用 '本地 cookies.txt' 模式。", "warning")
+            else:
+                self.log("   可能的原因：", "warning")
+                self.log("   1. 浏览器正在运行，请先关闭浏览器后重试", "warning")
+                self.log("   2. 浏览器Cookie数据库被锁定", "warning")
+                self.log("   3. 权限不足，请以管理员身份运行", "warning")
+                self.log("   4. 浏览器Cookie数据库不存在或已损坏", "warning")
+        elif cookie_type == 'cookiefile':
+            self.log(f"⚠️ cookies.txt 文件读取失败", "warning")
+            self.log(f"   错误详情: {error_msg}", "warning")
+            self.log("   可能的原因：", "warning")
+            self.log("   1. cookies.txt 文件格式不正确", "warning")
+            self.log("   2. cookies.txt 文件已损坏或为空", "warning")
+            self.log("   3. 文件权限不足，无法读取", "warning")
+    
+    def probe_login_state(self, ydl_opts, cookie_type, cookie_selection):
+        """
+        获取列表前检查Cookie的登录状态（请求一次导航接口）
+        
+        Cookie读取失败或未登录时返回False，调用方直接改用不登录模式；
+        不会等到获取完列表、甚至下载中途才发现Cookie无效，再不登录重新获取一遍列表。
+        网络错误等无法判断时按已登录处理，保留原有的降级逻辑。
+        
+        Args:
+            ydl_opts: yt-dlp 配置（含Cookie设置）
+            cookie_type: 'cookiesfrombrowser' 或 'cookiefile'
+            cookie_selection: 界面上选择的登录凭证来源
+        
+        Returns:
+            bool: 是否使用Cookie下载
+        """
+        try:
+            with BiliYoutubeDL(ydl_opts) as ydl:
+                state = probe_login(ydl)
+        except JobCancelled:
+            raise
+        except CookieLoadError as e:
+            self.log_cookie_error(cookie_type, cookie_selection, str(e.__cause__ or e.__context__ or e))
+            self.log("🔄 已切换为不登录模式（可能画质较低）", "info")
+            return False
+        except Exception as e:
+            self.log(f"⚠️ 登录状态检查失败，继续使用 Cookie: {str(e)}", "warning")
+            return True
+        
+        if not state['logged_in']:
+            # Cookie已失效：浏览器中重新登录后，下次下载时重新读取
+            self.cookie_cache.invalidate()
+            self.log("⚠️ Cookie 未登录或已过期，本次以不登录模式下载（可能画质较低）", "warning")
+            return False
+        if state['vip']:
+            self.log(f"✅ 已登录: {state['name']}（{state['vip_label']}）", "info")
+        else:
+            self.log(f"✅ 已登录: {state['name']}（非大会员，部分视频和画质不可用）", "info")
+        return True
+    
+    def log_network_stats(self, start):
+        """
+        输出本任务的连接复用统计（调试日志）
+        
+        Args:
+            start: 任务开始时的 network_stats.snapshot()
+        """
+        current = network_stats.snapshot()
+        requests = current['requests'] - start['requests']
+        connections = current['connections'] - start['connections']
+        if not requests:
+            return
+        reused = max(0, requests - connections)
+        self.log(
+            f"🔌 连接复用: 请求 {requests} 次，新建连接 {connections} 个，复用 {reused} 次（{reused / requests:.0%}），"
+            f"DNS缓存命中 {current['dns_hits'] - start['dns_hits']} 次", "debug")
     
     def toggle_pause(self):
         """暂停/继续下载 - 全盘暂停功能"""
@@ -1272,30 +2706,19 @@ class BiliDownloaderGUI:
             if new_url and new_url != self.current_download_url:
                 # 暂停任务后，若有下载链接修改，需要切到新的下载链接进行视频下载
                 self.log(f"检测到链接已更改，切换到新链接: {new_url}", "info")
-                # 停止当前下载线程
-                self.is_paused = False
-                self.is_downloading = False
-                # 重置状态
-                self.playlist_count = None
-                self.current_playlist_index = None
-                self.completed_count = 0
-                self.all_videos_completed = False  # 重置完成标志
-                # 使用新链接重新开始下载
-                self.current_download_url = new_url
-                self.log_text.delete("1.0", "end")
-                self.download_btn.configure(text="准备中...", state="disabled")
-                self.btn_pause.configure(state="normal", text="⏸ 暂停任务", fg_color="#d32f2f", hover_color="#b71c1c")
-                self.progress_bar.set(0)
+                # 取消当前任务（解析、下载、ffmpeg 子进程都会结束），原下载线程退出后再开始新链接，
+                # 不会出现两个下载线程同时运行
+                self.switching_to_url = new_url
+                self.job_control.cancel()
+                self.download_btn.configure(text="正在停止...", state="disabled")
+                self.btn_pause.configure(state="disabled", text="⏸ 暂停任务", fg_color="#d32f2f", hover_color="#b71c1c")
                 self.progress_bar.configure(progress_color="#1f538d")
-                self.progress_label.configure(text="准备中...")
-                # 在新线程中运行下载
-                self.is_downloading = True
-                self.download_thread = threading.Thread(target=self.download_worker, daemon=True)
-                self.download_thread.start()
+                self.progress_label.configure(text="正在停止当前任务...")
+                self.root.after(100, self.finish_url_switch)
                 return
             
             # 链接未改变，继续当前下载
-            self.is_paused = False
+            self.job_control.resume()
             self.btn_pause.configure(text="⏸ 暂停任务", fg_color="#d32f2f", hover_color="#b71c1c")
             self.log("▶️ 任务继续...", "info")
             # 进度条恢复正常显示
@@ -1306,14 +2729,124 @@ class BiliDownloaderGUI:
                 self.progress_label.configure(text="准备中...")
         else:
             # 暂停任务 - 显示红色
-            self.is_paused = True
+            self.job_control.pause()
             self.btn_pause.configure(text="▶ 继续任务", fg_color="#388e3c", hover_color="#2e7d32")
             self.log("⏸️ 任务已暂停...", "warning")
             # 进度条显示暂停状态（灰色）
             self.progress_bar.configure(progress_color="#757575")
     
-    def start_download(self):
-        """开始下载"""
+    def finish_url_switch(self):
+        """等待被取消的下载线程退出后，使用新链接开始下载（界面线程定时检查）"""
+        if self.download_thread is not None and self.download_thread.is_alive():
+            self.root.after(100, self.finish_url_switch)
+            return
+        new_url = self.switching_to_url
+        self.switching_to_url = None
+        self.link_entry.delete(0, "end")
+        self.link_entry.insert(0, new_url)
+        self.start_download()
+    
+    def open_subscription_window(self):
+        """打开订阅管理窗口（已打开时置于前台）"""
+        if self.subscription_window and self.subscription_window.window.winfo_exists():
+            self.subscription_window.window.focus()
+            return
+        self.subscription_window = SubscriptionWindow(self)
+    
+    def open_status_window(self):
+        """打开任务列表窗口（已打开时置于前台）"""
+        if self.status_window and self.status_window.window.winfo_exists():
+            self.status_window.window.focus()
+            return
+        self.status_window = StatusWindow(self)
+    
+    def open_batch_window(self):
+        """打开批量链接输入窗口（已打开时置于前台）"""
+        if self.batch_window and self.batch_window.window.winfo_exists():
+            self.batch_window.window.focus()
+            return
+        self.batch_window = BatchInputWindow(self)
+    
+    def snapshot_network_settings(self, *args):
+        """保存代理和Cookie设置的快照（界面线程，设置变化时调用），供后台线程生成配置"""
+        proxy = self.proxy_entry.get().strip() if self.proxy_enabled_var.get() else ''
+        # 整体替换元组，其他线程读取时不会看到一半更新的设置
+        self.network_settings = (proxy, self.cookie_source_var.get())
+    
+    def build_poll_opts(self):
+        """
+        生成订阅检查使用的 yt-dlp 配置（代理和Cookie与下载设置一致）
+        
+        只读取 snapshot_network_settings 保存的快照，可以在调度线程等后台线程中调用。
+        
+        Returns:
+            dict: yt-dlp 配置
+        """
+        proxy, cookie_selection = self.network_settings
+        # 与下载共用风控熔断器：下载触发风控时订阅检查也暂停请求
+        opts = {'circuit_breaker': self.risk_breaker, 'cookie_cache': self.cookie_cache}
+        if proxy:
+            opts['proxy'] = proxy
+        if "本地 cookies.txt" in cookie_selection:
+            local_cookie_path = os.path.join(os.getcwd(), 'cookies.txt')
+            if os.path.exists(local_cookie_path):
+                opts['cookiefile'] = local_cookie_path
+        elif "不使用登录" not in cookie_selection:
+            browser_name = cookie_selection.split(" ")[0].lower()
+            opts['cookiesfrombrowser'] = ('edge' if 'edge' in browser_name else browser_name,)
+        return opts
+    
+    def poll_subscription(self, subscription):
+        """
+        检查订阅源并将新视频加入下载队列（在调度线程中运行）
+        
+        首次检查的订阅源整体加入队列（已下载的视频由下载记录跳过），之后只加入新视频。
+        
+        Args:
+            subscription: 订阅信息字典
+        
+        Returns:
+            dict: 需要更新到订阅信息中的字段
+        """
+        result = poll_source(self.build_poll_opts(), subscription)
+        name = result['title'] or subscription['url']
+        priority = subscription.get('priority', PRIORITY_NORMAL)
+        if result['initial']:
+            self.job_store.add_job(subscription['url'], priority=priority, source=subscription['url'])
+            self.log(f"📡 订阅 [{name}] 首次检查，已加入完整同步任务（接口请求 {result['api_requests']} 次）", "info")
+        elif result['new_entries']:
+            for entry in result['new_entries']:
+                self.job_store.add_job(entry['url'], priority=priority, source=subscription['url'])
+            self.log(f"📡 订阅 [{name}] 发现 {len(result['new_entries'])} 个新视频，已加入下载队列（接口请求 {result['api_requests']} 次）", "info")
+        
+        return {
+            'title': result['title'],
+            'seen_ids': result['seen_ids'],
+            'last_new': len(result['new_entries']),
+            'last_api_requests': result['api_requests'],
+            'total_api_requests': subscription.get('total_api_requests', 0) + result['api_requests'],
+        }
+    
+    def process_pending_jobs(self):
+        """空闲时开始下载队列中的下一个任务（每秒检查一次）"""
+        job = None if self.is_downloading or self.switching_to_url else self.job_store.next_queued()
+        if job:
+            self.link_entry.delete(0, "end")
+            self.link_entry.insert(0, job['url'])
+            if job['save_path']:
+                self.path_entry.delete(0, "end")
+                self.path_entry.insert(0, job['save_path'])
+            self.start_download(job['job_id'])
+        
+        self.root.after(1000, self.process_pending_jobs)
+    
+    def start_download(self, job_id=None):
+        """
+        开始下载
+        
+        Args:
+            job_id: 下载队列中的任务ID（手动点击开始时为None，新建任务）
+        """
         if self.is_downloading and not self.is_paused:
             return
         
@@ -1329,17 +2862,32 @@ class BiliDownloaderGUI:
             return
         
         # 清空日志
-        self.log_text.delete("1.0", "end")
+        self.clear_log()
         
         # 保存当前下载链接
         self.current_download_url = url
         
+        # 记录下载任务
+        if job_id is None:
+            job_id = self.job_store.add_job(url, status=JOB_RUNNING)
+        self.job_store.update_job(job_id, status=JOB_RUNNING, started_at=time.time())
+        self.current_job_id = job_id
+        self.job_yielded = False
+        self.recorded_parts = set()
+        
         # 重置播放列表信息和暂停状态
         self.playlist_count = None
         self.current_playlist_index = None
         self.completed_count = 0  # 重置完成计数器
+        self.skipped_count = 0
         self.all_videos_completed = False  # 重置完成标志
-        self.is_paused = False
+        # 新任务使用新的控制令牌（未暂停、未取消）；取消时唤醒等待限速的连接
+        self.job_control = JobControl()
+        self.job_control.add_cancel_callback(self.bandwidth_limiter.wake)
+        self.progress_dirty = False
+        # 丢弃上一个任务尚未应用的控件更新（如结束时的按钮重置），以下直接设置新任务的状态
+        with self.progress_lock:
+            self.pending_display = {}
         
         # 更新状态
         self.is_downloading = True
@@ -1350,8 +2898,9 @@ class BiliDownloaderGUI:
         self.progress_bar.configure(progress_color="#1f538d")  # 进度条正常颜色（蓝色）
         self.progress_label.configure(text="准备中...")
         
-        # 在新线程中运行下载
-        self.download_thread = threading.Thread(target=self.download_worker, daemon=True)
+        # 在新线程中运行下载（下载线程不读取界面控件，只使用这里的设置快照）
+        settings = self.snapshot_download_settings()
+        self.download_thread = threading.Thread(target=self.download_worker, args=(settings,), daemon=True)
         self.download_thread.start()
     
     def run(self):
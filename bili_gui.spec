@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=['customtkinter', 'license_client', 'yt_dlp', 'PIL', 'requests'],
+    hiddenimports=['customtkinter', 'license_client', 'stream_downloader', 'playlist_pipeline', 'download_archive', 'metadata_cache', 'subscriptions', 'job_store', 'batch_input', 'job_control', 'status_table', 'progress_estimator', 'bandwidth_limiter', 'retry_policy', 'connection_pool', 'cookie_cache', 'yt_dlp', 'PIL', 'requests'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
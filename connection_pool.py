@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享网络连接
+同一进程内所有 YoutubeDL 实例共用的请求分发器（连接池）和DNS缓存
+
+版本历史：
+==========
+
+v1.0 (2026-10-17)
+--------------
+- 初始版本
+  * 网络配置（代理、请求头、证书校验、超时等）相同的 YoutubeDL 实例共用一个请求分发器，
+    各任务、下载线程、预取线程和降级重试之间复用已建立的 HTTPS 连接，不再重复握手
+  * 每个请求使用所属实例的 Cookie，不同任务、登录与不登录的实例互不影响
+  * YoutubeDL.close() 不会关闭共享的连接池
+  * DNS解析结果缓存 DNS_CACHE_TTL 秒
+  * 统计请求数和新建连接数，用于调试日志中的连接复用率
+"""
+import socket
+import threading
+import time
+
+import yt_dlp
+from yt_dlp.networking.common import _REQUEST_HANDLERS, _RH_PREFERENCES
+
+try:
+    import urllib3
+    from requests.structures import CaseInsensitiveDict
+    from yt_dlp.networking._requests import RequestsRH, RequestsHTTPAdapter, RequestsSession
+except ImportError:
+    # 未安装 requests 时 yt-dlp 使用 urllib（不支持连接复用），仍然共用请求分发器
+    RequestsRH = None
+
+
+# DNS解析结果的缓存时间（秒）
+DNS_CACHE_TTL = 300
+# 连接池：最多保留连接的域名数，以及每个域名保留的空闲连接数
+# （多个视频并行、分段下载时同一CDN域名的连接数较多，requests 默认的 10 个不够用）
+POOL_HOSTS = 32
+POOL_MAXSIZE = 32
+
+# 影响连接建立方式的 yt-dlp 配置，这些配置相同的实例共用一个请求分发器
+NETWORK_PARAMS = (
+    'http_headers', 'proxy', 'nocheckcertificate', 'source_address', 'socket_timeout',
+    'legacyserverconnect', 'enable_file_urls', 'impersonate', 'compat_opts', 'debug_printtraffic',
+    'client_certificate', 'client_certificate_key', 'client_certificate_password',
+)
+
+
+class NetworkStats:
+    """请求数、DNS缓存命中/未命中次数（每新建一个连接解析一次域名）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.dns_hits = 0
+        self.dns_misses = 0
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: {'requests': 请求数, 'connections': 新建连接数, 'dns_hits': DNS缓存命中次数}
+        """
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'connections': self.dns_hits + self.dns_misses,
+                'dns_hits': self.dns_hits,
+            }
+
+
+network_stats = NetworkStats()
+
+
+# --- DNS缓存 ---
+# yt-dlp 和 urllib3 建立连接时通过 socket.getaddrinfo 解析域名，这里替换为带缓存的版本
+
+_getaddrinfo = socket.getaddrinfo
+_dns_cache = {}
+_dns_lock = threading.Lock()
+
+
+def _cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    key = (host, port, family, type, proto, flags)
+    now = time.monotonic()
+    with _dns_lock:
+        cached = _dns_cache.get(key)
+    if cached is not None and cached[0] > now:
+        network_stats.count('dns_hits')
+        return list(cached[1])
+    network_stats.count('dns_misses')
+    # 解析失败时直接抛出，不缓存
+    result = _getaddrinfo(host, port, family, type, proto, flags)
+    with _dns_lock:
+        _dns_cache[key] = (now + DNS_CACHE_TTL, tuple(result))
+    return result
+
+
+socket.getaddrinfo = _cached_getaddrinfo
+
+
+if RequestsRH is not None:
+    class SharedRequestsRH(RequestsRH):
+        """
+        连接池在所有 Cookie 之间共用的 requests 请求处理器
+
+        yt-dlp 按 Cookie 缓存 requests 会话，每个会话有独立的连接池；
+        共用时每个任务的 Cookie 不同，连接无法复用，缓存的会话也会一直增长。
+        这里每个请求临时创建会话（只绑定 Cookie），挂载同一个连接池。
+        """
+
+        # 沿用 requests 处理器的名称（yt-dlp 按名称查找处理器）
+        RH_KEY = RequestsRH.RH_KEY
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._adapters = {}
+            self._adapters_lock = threading.Lock()
+
+        def _get_adapter(self, legacy_ssl_support):
+            with self._adapters_lock:
+                adapter = self._adapters.get(legacy_ssl_support)
+                if adapter is None:
+                    adapter = self._adapters[legacy_ssl_support] = RequestsHTTPAdapter(
+                        ssl_context=self._make_sslcontext(legacy_ssl_support=legacy_ssl_support),
+                        source_address=self.source_address,
+                        max_retries=urllib3.util.retry.Retry(False),
+                        pool_connections=POOL_HOSTS,
+                        pool_maxsize=POOL_MAXSIZE,
+                    )
+                return adapter
+
+        def _get_instance(self, cookiejar, legacy_ssl_support=None):
+            adapter = self._get_adapter(legacy_ssl_support)
+            session = RequestsSession()
+            session.adapters.clear()
+            session.headers = CaseInsensitiveDict()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.cookies = cookiejar
+            session.trust_env = False  # 代理已由 yt-dlp 从环境变量读取
+            return session
+
+        def close(self):
+            with self._adapters_lock:
+                for adapter in self._adapters.values():
+                    adapter.close()
+                self._adapters.clear()
+            super().close()
+
+
+class SharedDirectorView:
+    """
+    共享请求分发器在单个 YoutubeDL 实例中的视图
+
+    发送请求时带上实例自己的 Cookie；close() 不关闭共享的分发器。
+    """
+
+    def __init__(self, director, cookiejar):
+        self._director = director
+        self._cookiejar = cookiejar
+
+    @property
+    def handlers(self):
+        return self._director.handlers
+
+    @property
+    def preferences(self):
+        return self._director.preferences
+
+    def send(self, request):
+        request.extensions.setdefault('cookiejar', self._cookiejar)
+        network_stats.count('requests')
+        return self._director.send(request)
+
+    def close(self):
+        pass
+
+
+_directors = {}
+_directors_lock = threading.Lock()
+
+
+def _network_key(params):
+    """网络配置的比较键"""
+    values = []
+    for name in NETWORK_PARAMS:
+        value = params.get(name)
+        if isinstance(value, dict):
+            value = sorted(value.items())
+        elif isinstance(value, (set, frozenset)):
+            value = sorted(value)
+        values.append((name, repr(value)))
+    return tuple(values)
+
+
+def _build_director(params):
+    # 由只带网络配置的静默实例创建，分发器不持有任何任务的实例、日志记录器和 Cookie
+    network_params = {name: params[name] for name in NETWORK_PARAMS if params.get(name) is not None}
+    template = yt_dlp.YoutubeDL({**network_params, 'quiet': True, 'no_warnings': True}, auto_init=False)
+    handlers = [
+        SharedRequestsRH if RequestsRH is not None and handler is RequestsRH else handler
+        for handler in _REQUEST_HANDLERS.values()]
+    return template.build_request_director(handlers, _RH_PREFERENCES)
+
+
+def get_request_director(ydl):
+    """
+    获取实例使用的请求分发器（同样网络配置的实例共用）
+
+    Args:
+        ydl: YoutubeDL 实例
+
+    Returns:
+        SharedDirectorView: 可替代 YoutubeDL._request_director 使用
+    """
+    key = _network_key(ydl.params)
+    with _directors_lock:
+        director = _directors.get(key)
+        if director is None:
+            director = _directors[key] = _build_director(ydl.params)
+    return SharedDirectorView(director, ydl.cookiejar)
+
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+浏览器Cookie缓存
+从浏览器读取的B站Cookie缓存在内存中，并在本地保存加密的快照
+
+版本历史：
+==========
+
+v1.0 (2026-10-17)
+--------------
+- 初始版本
+  * 浏览器Cookie数据库只在修改时间变化、或下载提示需要登录时重新读取，
+    各任务、下载线程和预取线程不再每次都打开、解密数据库（避免 "database is locked"）
+  * 重新读取失败（数据库被浏览器锁定等）时继续使用缓存的Cookie
+  * 只缓存B站相关域名的Cookie；Windows 下快照用 DPAPI 加密（只有当前用户能解密），
+    启动时数据库未修改则直接使用快照；其他系统只缓存在内存中
+  * 登录状态检查：请求一次B站导航接口，获取是否已登录、用户名和大会员状态
+"""
+import http.cookiejar
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from yt_dlp.cookies import (
+    CHROMIUM_BASED_BROWSERS, YDLLogger, YoutubeDLCookieJar, extract_cookies_from_browser,
+    _find_files, _firefox_browser_dirs, _firefox_cookie_dbs, _get_chromium_based_browser_settings,
+    _is_path, _newest, _parse_browser_specification,
+)
+from yt_dlp.networking import Request
+
+from metadata_cache import REFRESH_EXTENSION
+
+
+# B站导航接口：返回当前Cookie的登录状态和会员信息（不需要 WBI 签名）
+NAV_URL = 'https://api.bilibili.com/x/web-interface/nav'
+# 缓存的Cookie域名（B站主站、短链接、图片和视频CDN）
+BILIBILI_DOMAINS = ('bilibili.com', 'b23.tv', 'hdslb.com', 'bilivideo.com', 'bilivideo.cn', 'biligame.com')
+# 下载错误中表示需要登录的信息（提示Cookie可能已失效）
+LOGIN_REQUIRED_RE = re.compile(r'log\s*in|cookies|登录|未登录', re.IGNORECASE)
+# 快照格式版本
+SNAPSHOT_VERSION = 1
+# 快照加密的附加熵（与其他程序的 DPAPI 数据区分）
+DPAPI_ENTROPY = b'bili_gui cookie cache'
+
+# http.cookiejar.Cookie 的构造参数
+COOKIE_FIELDS = (
+    'version', 'name', 'value', 'port', 'port_specified', 'domain', 'domain_specified',
+    'domain_initial_dot', 'path', 'path_specified', 'secure', 'expires', 'discard',
+    'comment', 'comment_url', 'rfc2109',
+)
+
+
+def is_bilibili_domain(domain):
+    """Cookie域名是否属于B站"""
+    domain = domain.lstrip('.').lower()
+    return any(domain == suffix or domain.endswith('.' + suffix) for suffix in BILIBILI_DOMAINS)
+
+
+def cookie_to_dict(cookie):
+    """Cookie 转换为可保存为JSON的字典"""
+    data = {field: getattr(cookie, field) for field in COOKIE_FIELDS}
+    data['rest'] = dict(cookie._rest)
+    return data
+
+
+def cookie_from_dict(data):
+    """由 cookie_to_dict 的结果还原 Cookie"""
+    return http.cookiejar.Cookie(**{field: data[field] for field in COOKIE_FIELDS}, rest=data['rest'])
+
+
+def find_cookie_database(browser_name, profile, logger):
+    """
+    查找浏览器的Cookie数据库（与 yt-dlp 读取时选择的文件相同：多个配置文件时取最近使用的）
+
+    Returns:
+        str | None: 数据库路径；不支持的浏览器或未找到时返回None
+    """
+    if browser_name in CHROMIUM_BASED_BROWSERS:
+        config = _get_chromium_based_browser_settings(browser_name)
+        if profile is None:
+            search_root = config['browser_dir']
+        elif _is_path(profile):
+            search_root = profile
+        elif config['supports_profiles']:
+            search_root = os.path.join(config['browser_dir'], profile)
+        else:
+            search_root = config['browser_dir']
+        return _newest(_find_files(search_root, 'Cookies', logger))
+    if browser_name == 'firefox':
+        if profile is None:
+            search_roots = list(_firefox_browser_dirs())
+        elif _is_path(profile):
+            search_roots = [profile]
+        else:
+            search_roots = [os.path.join(path, profile) for path in _firefox_browser_dirs()]
+        return _newest(_firefox_cookie_dbs(search_roots))
+    return None
+
+
+def get_mtime(path):
+    """文件修改时间，文件不存在时返回None"""
+    if path is None:
+        return None
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def probe_login(ydl):
+    """
+    检查实例的Cookie是否已登录（请求一次导航接口）
+
+    Args:
+        ydl: 使用待检查Cookie的 YoutubeDL 实例
+
+    Returns:
+        dict: {'logged_in': 是否已登录, 'name': 用户名, 'vip': 是否为有效大会员, 'vip_label': 会员类型文本}
+
+    Raises:
+        CookieLoadError: Cookie读取失败
+        Exception: 网络错误或接口返回异常（无法判断登录状态）
+    """
+    # 登录状态必须实时获取，不使用元数据缓存中的导航接口响应
+    request = Request(NAV_URL, headers={'Referer': 'https://www.bilibili.com/'}, extensions={REFRESH_EXTENSION: True})
+    with ydl.urlopen(request) as response:
+        data = json.loads(response.read().decode('utf-8'))
+    # 未登录时返回 -101，data.isLogin 为 false
+    if data.get('code') not in (0, -101):
+        raise ValueError(f"导航接口返回错误: {data.get('code')} {data.get('message')}")
+    info = data.get('data') or {}
+    logged_in = bool(info.get('isLogin'))
+    vip = logged_in and info.get('vipStatus') == 1
+    return {
+        'logged_in': logged_in,
+        'name': info.get('uname'),
+        'vip': vip,
+        'vip_label': (info.get('vip_label') or {}).get('text') or ('大会员' if vip else ''),
+    }
+
+
+def dpapi_available():
+    return sys.platform in ('win32', 'cygwin')
+
+
+def _dpapi(data, protect):
+    """
+    调用 Windows DPAPI 加密/解密（数据与当前用户绑定）
+
+    Raises:
+        OSError: 加密或解密失败
+    """
+    import ctypes
+
+    class DATA_BLOB(ctypes.Structure):
+        _fields_ = [('cbData', ctypes.c_uint32), ('pbData', ctypes.POINTER(ctypes.c_char))]
+
+    def make_blob(value):
+        buffer = ctypes.create_string_buffer(value, len(value))
+        return DATA_BLOB(len(value), ctypes.cast(buffer, ctypes.POINTER(ctypes.c_char))), buffer
+
+    blob_in, _in_buffer = make_blob(data)
+    entropy, _entropy_buffer = make_blob(DPAPI_ENTROPY)
+    blob_out = DATA_BLOB()
+    function = ctypes.windll.crypt32.CryptProtectData if protect else ctypes.windll.crypt32.CryptUnprotectData
+    # CRYPTPROTECT_UI_FORBIDDEN：不弹出任何提示
+    if not function(ctypes.byref(blob_in), None, ctypes.byref(entropy), None, None, 0x1, ctypes.byref(blob_out)):
+        raise OSError('DPAPI 加密/解密失败')
+    try:
+        return ctypes.string_at(blob_out.pbData, blob_out.cbData)
+    finally:
+        ctypes.windll.kernel32.LocalFree(blob_out.pbData)
+
+
+class BrowserCookieCache:
+    """
+    浏览器Cookie缓存（线程安全）
+
+    YoutubeDL 实例需要Cookie时调用 get_jar()：数据库修改时间未变化时直接由缓存生成Cookie，
+    变化后（最多每 MIN_RELOAD_INTERVAL 秒一次）重新读取。下载提示需要登录时调用 invalidate()，
+    下次获取时立即重新读取（不受读取间隔限制）。
+    """
+
+    # 两次重新读取浏览器数据库的最小间隔（秒）：浏览器运行时数据库频繁修改，避免反复读取
+    MIN_RELOAD_INTERVAL = 60
+
+    def __init__(self, snapshot_path):
+        """
+        Args:
+            snapshot_path: 加密快照文件路径（仅 Windows 使用）
+        """
+        self.snapshot_path = snapshot_path
+        self._lock = threading.Lock()
+        # 浏览器设置 -> {'cookies': [...], 'db_path', 'db_mtime', 'loaded_at', 'stale'}
+        self._entries = None
+        # 浏览器设置 -> Cookie数据库路径（查找需要遍历浏览器目录，只查找一次）
+        self._db_paths = {}
+
+    def invalidate(self):
+        """标记缓存的Cookie可能已失效，下次获取时重新读取浏览器数据库"""
+        with self._lock:
+            for entry in (self._entries or {}).values():
+                entry['stale'] = True
+
+    def get_jar(self, browser_spec, ydl):
+        """
+        获取浏览器的B站Cookie
+
+        Args:
+            browser_spec: yt-dlp 的 cookiesfrombrowser 配置，如 ('edge',)
+            ydl: 请求Cookie的 YoutubeDL 实例（用于输出日志）
+
+        Returns:
+            YoutubeDLCookieJar: 新的Cookie容器（每个实例一个，互不影响）
+
+        Raises:
+            Exception: 读取失败且没有缓存时，抛出读取浏览器数据库的异常
+        """
+        browser_name, profile, keyring, container = _parse_browser_specification(*browser_spec)
+        key = repr((browser_name, profile, keyring, container))
+        logger = YDLLogger(ydl)
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load_snapshot(ydl)
+            entry = self._entries.get(key)
+
+            db_path = self._db_paths.get(key)
+            if db_path is None or not os.path.exists(db_path):
+                db_path = self._db_paths[key] = find_cookie_database(browser_name, profile, logger)
+            db_mtime = get_mtime(db_path)
+
+            if entry is not None and not self._needs_reload(entry, db_mtime):
+                return self._make_jar(entry['cookies'])
+
+            try:
+                jar = extract_cookies_from_browser(browser_name, profile, logger, keyring=keyring, container=container)
+            except Exception as e:
+                if entry is None:
+                    raise
+                # 数据库被锁定等：继续使用缓存，MIN_RELOAD_INTERVAL 秒后再尝试
+                # （清除失效标记，避免每次获取都重新读取）
+                entry['loaded_at'] = time.monotonic()
+                entry['stale'] = False
+                ydl.report_warning(f'读取浏览器Cookie失败，继续使用缓存的Cookie: {e}')
+                return self._make_jar(entry['cookies'])
+
+            cookies = [cookie_to_dict(cookie) for cookie in jar if is_bilibili_domain(cookie.domain)]
+            self._entries[key] = {
+                'cookies': cookies, 'db_path': db_path, 'db_mtime': db_mtime,
+                'loaded_at': time.monotonic(), 'stale': False,
+            }
+            self._save_snapshot(ydl)
+            ydl.write_debug(f'已缓存 {len(cookies)} 个B站Cookie')
+            return self._make_jar(cookies)
+
+    def _needs_reload(self, entry, db_mtime):
+        # 调用方已持有锁
+        # 明确标记失效时立即重新读取，读取间隔只限制数据库修改触发的重新读取
+        if entry['stale']:
+            return True
+        if entry['loaded_at'] is not None and time.monotonic() - entry['loaded_at'] < self.MIN_RELOAD_INTERVAL:
+            return False
+        return db_mtime != entry['db_mtime']
+
+    @staticmethod
+    def _make_jar(cookies):
+        jar = YoutubeDLCookieJar()
+        for data in cookies:
+            jar.set_cookie(cookie_from_dict(data))
+        return jar
+
+    def _load_snapshot(self, ydl):
+        """读取加密快照（快照中的Cookie在数据库修改时间相同时直接使用）"""
+        if not dpapi_available() or not os.path.exists(self.snapshot_path):
+            return {}
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                data = json.loads(_dpapi(f.read(), protect=False).decode('utf-8'))
+            if data.get('version') != SNAPSHOT_VERSION:
+                return {}
+            entries = data['entries']
+        except (OSError, ValueError, KeyError) as e:
+            ydl.report_warning(f'Cookie快照无法读取，将重新读取浏览器Cookie: {e}')
+            return {}
+        for entry in entries.values():
+            # 快照中的Cookie未在本次运行中读取过，数据库修改时间变化时立即重新读取
+            entry['loaded_at'] = None
+            entry['stale'] = False
+        return entries
+
+    def _save_snapshot(self, ydl):
+        # 调用方已持有锁
+        if not dpapi_available():
+            return
+        entries = {
+            key: {'cookies': entry['cookies'], 'db_path': entry['db_path'], 'db_mtime': entry['db_mtime']}
+            for key, entry in self._entries.items()}
+        data = json.dumps({'version': SNAPSHOT_VERSION, 'entries': entries}, ensure_ascii=False).encode('utf-8')
+        temp_path = self.snapshot_path + '.tmp'
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(_dpapi(data, protect=True))
+            os.replace(temp_path, self.snapshot_path)
+        except OSError as e:
+            ydl.report_warning(f'Cookie快照保存失败: {e}')
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载记录存储
+使用 SQLite 索引保存已下载视频，替代 yt-dlp 的纯文本 archive.txt
+
+版本历史：
+==========
+
+v1.0 (2026-10-17)
+--------------
+- 初始版本
+  * 按ID索引查询是否已下载，无需在启动时把全部记录读入内存
+  * 记录每个视频的标题、UP主、画质、文件大小、保存路径和下载时间
+  * 首次打开时一次性导入已有的 archive.txt
+  * 多个下载线程共享同一实例时线程安全
+"""
+import os
+import sqlite3
+import threading
+import time
+
+
+class DownloadArchive:
+    """
+    基于 SQLite 的下载记录
+
+    实现 yt-dlp download_archive 参数所需的集合接口（in / add），
+    可直接作为 ydl_opts['download_archive'] 传入；BiliYoutubeDL 写入记录时会附带视频元数据。
+    """
+
+    # 导入旧记录时每批写入的条数
+    IMPORT_BATCH_SIZE = 5000
+
+    def __init__(self, db_path, legacy_path=None):
+        """
+        Args:
+            db_path: 数据库文件路径
+            legacy_path: 旧版 archive.txt 路径（首次打开时导入，原文件保留不动）
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # 连接在多个下载线程间共享，由 self._lock 串行化访问
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            # WAL 模式下读写互不阻塞，多个程序实例同时下载也能正常写入
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS archive (
+                    archive_id TEXT PRIMARY KEY,
+                    title TEXT,
+                    uploader TEXT,
+                    quality TEXT,
+                    filesize INTEGER,
+                    filepath TEXT,
+                    downloaded_at REAL
+                )
+            ''')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        if legacy_path:
+            self.import_legacy(legacy_path)
+
+    def import_legacy(self, legacy_path):
+        """
+        导入旧版 archive.txt（每行一个 "extractor id"）
+
+        导入完成后在 meta 表中记录，同一文件只导入一次。
+
+        Args:
+            legacy_path: archive.txt 路径
+
+        Returns:
+            int: 本次导入的记录数（已导入过或文件不存在时为0）
+        """
+        if not os.path.exists(legacy_path):
+            return 0
+        meta_key = f'imported:{os.path.abspath(legacy_path)}'
+        with self._lock:
+            if self._conn.execute('SELECT 1 FROM meta WHERE key = ?', (meta_key,)).fetchone():
+                return 0
+            imported = 0
+            with self._conn, open(legacy_path, 'r', encoding='utf-8') as archive_file:
+                batch = []
+                for line in archive_file:
+                    archive_id = line.strip()
+                    if not archive_id:
+                        continue
+                    batch.append((archive_id,))
+                    if len(batch) >= self.IMPORT_BATCH_SIZE:
+                        imported += self._insert_ids(batch)
+                        batch = []
+                imported += self._insert_ids(batch)
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (meta_key, str(time.time())))
+            return imported
+
+    def _insert_ids(self, batch):
+        # 旧记录只有ID，已存在的记录（可能带有元数据）不覆盖
+        before = self._conn.total_changes
+        self._conn.executemany('INSERT OR IGNORE INTO archive (archive_id) VALUES (?)', batch)
+        return self._conn.total_changes - before
+
+    def __contains__(self, archive_id):
+        with self._lock:
+            return self._conn.execute(
+                'SELECT 1 FROM archive WHERE archive_id = ?', (archive_id,)).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM archive').fetchone()[0]
+
+    def __bool__(self):
+        # yt-dlp 在 archive 为空时跳过检查；这里始终返回True，避免每次检查都统计总数
+        return True
+
+    def add(self, archive_id, info_dict=None):
+        """
+        添加下载记录
+
+        Args:
+            archive_id: yt-dlp 的下载记录ID（"extractor id"）
+            info_dict: 视频info字典（可选），用于记录元数据
+        """
+        info_dict = info_dict or {}
+        filepath = info_dict.get('filepath') or info_dict.get('_filename')
+        filesize = None
+        if filepath and os.path.exists(filepath):
+            filesize = os.path.getsize(filepath)
+        else:
+            filesize = info_dict.get('filesize') or info_dict.get('filesize_approx')
+        quality = info_dict.get('format_note') or info_dict.get('resolution')
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO archive '
+                '(archive_id, title, uploader, quality, filesize, filepath, downloaded_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (archive_id, info_dict.get('title'), info_dict.get('uploader'), quality,
+                 filesize, filepath, time.time()))
+
+    def get(self, archive_id):
+        """
+        查询下载记录
+
+        Returns:
+            dict | None: 记录的元数据，未下载时返回None
+        """
+        with self._lock:
+            cursor = self._conn.execute('SELECT * FROM archive WHERE archive_id = ?', (archive_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return dict(zip((column[0] for column in cursor.description), row))
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
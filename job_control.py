@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载任务控制
+基于 threading.Event 的暂停/继续与取消令牌，每个下载任务一个
+
+版本历史：
+==========
+
+v1.0 (2026-10-17)
+--------------
+- 初始版本
+  * 暂停时下载、解析线程阻塞在事件上等待，不占用CPU，也不再读取网络数据
+  * 取消时唤醒所有等待中的线程并抛出 JobCancelled，关闭未完成的网络响应，结束 ffmpeg 等子进程
+  * 线程绑定所属任务的控制令牌，yt-dlp 在该线程中启动的子进程自动登记到任务
+  * 取消时执行登记的回调（如唤醒等待限速的连接）
+"""
+import threading
+import weakref
+
+from yt_dlp.utils import DownloadCancelled, Popen
+
+
+class JobCancelled(DownloadCancelled):
+    """
+    下载任务已取消
+
+    继承 DownloadCancelled：yt-dlp 在 ignoreerrors 模式下也不会把它当作普通错误忽略，
+    而是一直抛到调用方，解析和下载都会立即停止。
+    """
+    msg = '下载任务已取消'
+
+
+class JobControl:
+    """
+    下载任务控制令牌
+
+    下载线程在读取数据、发起请求、领取新视频前调用 checkpoint()：
+    暂停时阻塞直到继续，已取消时抛出 JobCancelled。
+    """
+
+    def __init__(self):
+        # 置位表示运行中，清除表示暂停
+        self._running = threading.Event()
+        self._running.set()
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        # 任务启动的子进程和打开的网络响应（弱引用，结束后自动移除）
+        self._processes = weakref.WeakSet()
+        self._responses = weakref.WeakSet()
+        # 取消时执行的回调（唤醒阻塞在其他同步对象上的线程）
+        self._cancel_callbacks = []
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def pause(self):
+        if not self.cancelled:
+            self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        """取消任务：唤醒暂停中的线程，结束子进程并关闭未完成的网络响应"""
+        self._cancelled.set()
+        # 暂停中的线程被唤醒后在 checkpoint() 中抛出 JobCancelled
+        self._running.set()
+        with self._lock:
+            processes = list(self._processes)
+            responses = list(self._responses)
+            callbacks = list(self._cancel_callbacks)
+        for callback in callbacks:
+            callback()
+        for process in processes:
+            self._kill(process)
+        for response in responses:
+            self._close(response)
+
+    def checkpoint(self):
+        """暂停时阻塞直到继续；任务已取消时抛出 JobCancelled"""
+        self._running.wait()
+        if self._cancelled.is_set():
+            raise JobCancelled()
+
+    def sleep(self, seconds):
+        """可被取消打断的等待（用于重试间隔等），任务已取消时抛出 JobCancelled"""
+        if self._cancelled.wait(seconds):
+            raise JobCancelled()
+
+    def add_cancel_callback(self, callback):
+        """登记取消时执行的回调（已取消时立即执行）"""
+        with self._lock:
+            self._cancel_callbacks.append(callback)
+        if self.cancelled:
+            callback()
+
+    def register_process(self, process):
+        """登记任务启动的子进程，取消时结束"""
+        with self._lock:
+            self._processes.add(process)
+        # 登记与取消同时发生时，保证子进程不会遗留
+        if self.cancelled:
+            self._kill(process)
+
+    def register_response(self, response):
+        """登记打开的网络响应，取消时关闭（正在读取的线程随即出错退出）"""
+        with self._lock:
+            self._responses.add(response)
+        if self.cancelled:
+            self._close(response)
+
+    @staticmethod
+    def _kill(process):
+        if process.poll() is None:
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+    @staticmethod
+    def _close(response):
+        try:
+            response.close()
+        except Exception:
+            pass
+
+
+# 当前线程所属任务的控制令牌
+_context = threading.local()
+
+
+def bind_job_control(control):
+    """将当前线程绑定到任务（下载线程启动时调用）"""
+    _context.control = control
+
+
+def get_job_control():
+    """
+    获取当前线程所属任务的控制令牌
+
+    Returns:
+        JobControl | None: 未绑定时返回None
+    """
+    return getattr(_context, 'control', None)
+
+
+# yt-dlp 通过 utils.Popen 启动 ffmpeg（合并、转码、m3u8 下载等），
+# 这里在创建子进程时登记到当前线程所属的任务，取消任务时一并结束
+_popen_init = Popen.__init__
+
+
+def _tracked_popen_init(self, *args, **kwargs):
+    _popen_init(self, *args, **kwargs)
+    control = get_job_control()
+    if control is not None:
+        control.register_process(self)
+
+
+Popen.__init__ = _tracked_popen_init
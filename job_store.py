@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载任务存储
+使用 SQLite 持久化下载任务及其中每个视频的状态，程序关闭或崩溃后可以继续
+
+版本历史：
+==========
+
+v1.0 (2026-10-17)
+--------------
+- 初始版本
+  * 记录每个下载任务（链接、保存路径、状态、列表是否已获取完毕）
+  * 记录任务中每个视频的状态和未完成的临时文件（.part）路径
+  * 分段下载的 .segN 分段文件由记录的临时文件路径推导，同样计入未完成的临时文件
+  * 启动时将中断的任务重新排队；列表已获取完毕的任务直接从记录恢复，无需重新获取列表
+  * 待下载队列（如订阅发现的新视频）同样持久化
+  * 批量任务：已解析好的视频列表直接作为一个任务排队
+  * 排队任务按优先级选择，同一优先级内按来源轮流（上次开始时间最早的来源优先）
+"""
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+
+# 视频状态
+TASK_PENDING = 'pending'
+TASK_DONE = 'done'
+TASK_SKIPPED = 'skipped'
+TASK_FAILED = 'failed'
+
+# 保存到任务记录中的列表条目字段（足以重新交给 process_ie_result 下载）
+ENTRY_FIELDS = ('_type', 'ie_key', 'id', 'url', 'title', '__source')
+
+# 任务优先级
+PRIORITY_HIGH = 1
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -1
+
+
+def find_part_files(part_path):
+    """
+    查找临时文件路径对应的、仍存在的文件
+
+    分段下载时各分段写入 <临时文件>.segN，拼接完成前临时文件本身并不存在。
+
+    Returns:
+        list: 仍存在的临时文件及分段文件路径
+    """
+    paths = [part_path] if os.path.exists(part_path) else []
+    paths.extend(sorted(glob.glob(glob.escape(part_path) + '.seg[0-9]*')))
+    return paths
+
+
+class JobStore:
+    """
+    基于 SQLite 的下载任务存储
+
+    jobs 表记录下载任务，tasks 表记录任务中的每个视频（以条目URL区分）。
+    下载线程、订阅检查线程和界面线程共享同一实例，所有操作线程安全。
+    """
+
+    def __init__(self, db_path):
+        """
+        Args:
+            db_path: 数据库文件路径
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    save_path TEXT,
+                    status TEXT NOT NULL,
+                    enumeration_done INTEGER NOT NULL DEFAULT 0,
+                    total INTEGER,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    source TEXT,
+                    started_at REAL,
+                    created_at REAL,
+                    updated_at REAL
+                )
+            ''')
+            # 兼容旧版数据库：补充后来增加的字段
+            columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+            for column, definition in (
+                    ('priority', 'INTEGER NOT NULL DEFAULT 0'), ('source', 'TEXT'), ('started_at', 'REAL')):
+                if column not in columns:
+                    self._conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {definition}')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS tasks (
+                    job_id INTEGER NOT NULL,
+                    entry_url TEXT NOT NULL,
+                    position INTEGER,
+                    entry TEXT,
+                    status TEXT NOT NULL,
+                    part_paths TEXT,
+                    updated_at REAL,
+                    PRIMARY KEY (job_id, entry_url)
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, job_id)')
+
+    # ---------- 任务 ----------
+
+    def add_job(self, url, save_path=None, status=JOB_QUEUED, priority=PRIORITY_NORMAL, source=None):
+        """
+        添加下载任务
+
+        Args:
+            url: 下载链接
+            save_path: 保存路径（为空时使用开始下载时界面上的路径）
+            status: 初始状态
+            priority: 优先级（数值越大越优先）
+            source: 来源（如订阅链接），同一优先级内按来源轮流；为空时以链接本身作为来源
+
+        Returns:
+            int: 任务ID
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'INSERT INTO jobs (url, save_path, status, priority, source, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, save_path, status, priority, source or url, now, now))
+            return cursor.lastrowid
+
+    def add_batch_job(self, label, entries, save_path=None, priority=PRIORITY_NORMAL):
+        """
+        添加批量任务：视频列表已确定，直接记录全部视频并标记列表已获取完毕
+
+        Args:
+            label: 任务显示名称
+            entries: 下载条目列表
+            save_path: 保存路径
+            priority: 优先级
+
+        Returns:
+            int: 任务ID
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'INSERT INTO jobs (url, save_path, status, enumeration_done, total, priority, source, created_at, updated_at) '
+                'VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?)',
+                (label, save_path, JOB_QUEUED, len(entries), priority, f'batch:{now}', now, now))
+            job_id = cursor.lastrowid
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO tasks (job_id, entry_url, position, entry, status, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(job_id, self.task_key(entry), position,
+                  self.serialize_entry(entry), TASK_PENDING, now)
+                 for position, entry in enumerate(entries)])
+            return job_id
+
+    def get_job(self, job_id):
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def update_job(self, job_id, **fields):
+        """更新任务字段（如 status、save_path）"""
+        if job_id is None or not fields:
+            return
+        fields['updated_at'] = time.time()
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f'UPDATE jobs SET {assignments} WHERE job_id = ?', (*fields.values(), job_id))
+
+    def next_queued(self):
+        """
+        选择下一个要开始的排队任务
+
+        优先级高的先开始；同一优先级内，上次开始任务时间最早（或从未开始过）的来源优先，
+        某个来源排了大量任务时也不会让其他来源一直等待；同一来源内按排队顺序。
+
+        Returns:
+            dict | None: 任务信息，没有排队任务时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT jobs.* FROM jobs '
+                'LEFT JOIN (SELECT source, MAX(started_at) AS last_start FROM jobs GROUP BY source) AS sources '
+                'ON sources.source = jobs.source '
+                'WHERE jobs.status = ? '
+                'ORDER BY jobs.priority DESC, COALESCE(sources.last_start, 0), jobs.job_id LIMIT 1',
+                (JOB_QUEUED,)).fetchone()
+        return dict(row) if row else None
+
+    def has_other_queued(self, job_id):
+        """是否有其他来源、优先级不低于该任务的排队任务（用于长任务让出下载队列）"""
+        job = self.get_job(job_id)
+        if not job:
+            return False
+        with self._lock:
+            return self._conn.execute(
+                'SELECT 1 FROM jobs WHERE status = ? AND priority >= ? AND COALESCE(source, url) != ? LIMIT 1',
+                (JOB_QUEUED, job['priority'], job['source'] or job['url'])).fetchone() is not None
+
+    def count_queued(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (JOB_QUEUED,)).fetchone()[0]
+
+    def requeue_interrupted(self):
+        """
+        将上次运行中断（状态仍为 running）的任务重新排队
+
+        Returns:
+            int: 重新排队的任务数
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'UPDATE jobs SET status = ?, updated_at = ? WHERE status = ?',
+                (JOB_QUEUED, time.time(), JOB_RUNNING))
+            return cursor.rowcount
+
+    def mark_enumerated(self, job_id, total):
+        """列表已全部获取，之后恢复任务时直接使用记录的视频"""
+        self.update_job(job_id, enumeration_done=1, total=total)
+
+    # ---------- 视频 ----------
+
+    def add_task(self, job_id, position, entry):
+        """记录列表中的一个视频（已存在时保留原状态）"""
+        if job_id is None:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO tasks (job_id, entry_url, position, entry, status, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, self.task_key(entry), position, self.serialize_entry(entry), TASK_PENDING, time.time()))
+
+    @staticmethod
+    def serialize_entry(entry):
+        """只保存重新下载所需的条目字段"""
+        return json.dumps({key: entry[key] for key in ENTRY_FIELDS if entry.get(key) is not None}, ensure_ascii=False)
+
+    @staticmethod
+    def task_key(entry):
+        """视频在任务中的唯一标识（条目URL，没有时使用ID）"""
+        return entry.get('url') or entry.get('webpage_url') or str(entry.get('id'))
+
+    def set_task_status(self, job_id, entry, status):
+        if job_id is None:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE tasks SET status = ?, updated_at = ? WHERE job_id = ? AND entry_url = ?',
+                (status, time.time(), job_id, self.task_key(entry)))
+
+    def add_task_part(self, job_id, entry_key, part_path):
+        """记录视频正在下载的临时文件路径（视频流和音频流各一个，分段文件由 find_part_files 推导）"""
+        if job_id is None:
+            return
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT part_paths FROM tasks WHERE job_id = ? AND entry_url = ?', (job_id, entry_key)).fetchone()
+            if row is None:
+                return
+            part_paths = json.loads(row['part_paths'] or '[]')
+            if part_path not in part_paths:
+                part_paths.append(part_path)
+                self._conn.execute(
+                    'UPDATE tasks SET part_paths = ?, updated_at = ? WHERE job_id = ? AND entry_url = ?',
+                    (json.dumps(part_paths, ensure_ascii=False), time.time(), job_id, entry_key))
+
+    def get_resumable_tasks(self, job_id):
+        """
+        获取可直接恢复的视频（列表已获取完毕的任务）
+
+        Returns:
+            dict | None: {'entries': 未完成的条目列表（按列表顺序）, 'finished': 已完成数, 'total': 总数,
+                          'part_files': 仍存在的临时文件数}；列表未获取完毕时返回None
+        """
+        job = self.get_job(job_id)
+        if not job or not job['enumeration_done']:
+            return None
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT entry, status, part_paths FROM tasks WHERE job_id = ? ORDER BY position',
+                (job_id,)).fetchall()
+        entries = []
+        part_files = 0
+        for row in rows:
+            if row['status'] in (TASK_DONE, TASK_SKIPPED):
+                continue
+            entries.append(json.loads(row['entry']))
+            part_files += sum(len(find_part_files(path)) for path in json.loads(row['part_paths'] or '[]'))
+        return {
+            'entries': entries,
+            'finished': len(rows) - len(entries),
+            'total': len(rows),
+            'part_files': part_files,
+        }
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+元数据缓存
+将B站接口（列表分页、视频详情、播放地址等）的响应缓存到本地 SQLite，
+重复下载、Cookie降级重试、切换链接后重新解析时无需再次请求
+
+版本历史：
+==========
+
+v1.0 (2026-10-17)
+--------------
+- 初始版本
+  * 按 URL（去掉 wbi 签名参数）+ 登录状态缓存 GET 响应
+  * 按接口类型设置有效期（播放地址有效期短于CDN签名地址的过期时间）
+  * 响应中包含带 deadline 的签名CDN地址（播放地址接口、视频页面中的 window.__playinfo__）时，
+    有效期不超过最早的签名过期时间减去 DEADLINE_MARGIN，签名已过期的条目不再续期
+  * 过期条目带有 ETag/Last-Modified 时发送条件请求，304 时直接续期
+  * 超过容量上限时按最近访问时间（LRU）淘汰
+  * 接口返回错误码（如风控 -352）或页面不完整时不缓存
+  * 请求带有 REFRESH_EXTENSION 扩展时不使用缓存的内容（如登录状态检查），新的响应仍写入缓存
+"""
+import hashlib
+import io
+import json
+import re
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+from yt_dlp.networking import Request, Response
+from yt_dlp.networking.exceptions import HTTPError
+
+
+# 缓存规则：(域名, 路径前缀, 类型, 有效期秒数)，按顺序匹配
+CACHE_RULES = (
+    # 播放地址包含带 deadline 的签名CDN地址，有效期必须明显短于签名过期时间
+    ('api.bilibili.com', '/x/player/wbi/playurl', 'playurl', 15 * 60),
+    ('api.bilibili.com', '/pgc/player/web/v2/playurl', 'playurl', 15 * 60),
+    ('api.bilibili.com', '/pugv/player/web/playurl', 'playurl', 15 * 60),
+    # 列表分页：UP主空间、收藏夹、合集、系列
+    ('api.bilibili.com', '/x/space/wbi/arc/search', 'playlist', 10 * 60),
+    ('api.bilibili.com', '/x/v3/fav/resource/', 'playlist', 10 * 60),
+    ('api.bilibili.com', '/x/polymer/web-space/seasons_archives_list', 'playlist', 10 * 60),
+    ('api.bilibili.com', '/x/series/', 'playlist', 10 * 60),
+    # 视频详情：标题、分P、字幕、章节等很少变化
+    # （视频页面中的 window.__playinfo__ 包含签名CDN地址，有效期另按 deadline 截断）
+    ('www.bilibili.com', '/video/', 'video', 6 * 3600),
+    ('api.bilibili.com', '/x/web-interface/wbi/view/detail', 'video', 6 * 3600),
+    ('api.bilibili.com', '/x/player/pagelist', 'video', 6 * 3600),
+    ('api.bilibili.com', '/x/player/wbi/v2', 'video', 6 * 3600),
+    # 登录信息和 wbi 签名密钥
+    ('api.bilibili.com', '/x/web-interface/nav', 'nav', 3600),
+)
+
+# 签名CDN地址的过期时间参数（Unix 时间戳，JSON 中的 & 可能转义为 \u0026）
+DEADLINE_RE = re.compile(rb'(?:[?&;]|\\u0026)deadline=(\d{9,11})(?!\d)')
+# 缓存有效期距离签名过期时间的最小余量（秒），留出解析后开始下载的时间
+DEADLINE_MARGIN = 10 * 60
+
+# 请求扩展：设置为True时忽略已缓存的响应，直接请求并更新缓存
+# （yt-dlp 不认识的扩展会导致请求被拒绝，BiliYoutubeDL.urlopen 在发送前移除）
+REFRESH_EXTENSION = 'metadata_cache_refresh'
+
+# 每次请求都会变化的签名参数，不参与缓存键
+VOLATILE_QUERY_PARAMS = ('wts', 'w_rid')
+
+# 不随缓存保存的响应头（缓存的是已解压的正文）
+DROPPED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'set-cookie')
+
+
+def match_cache_rule(url):
+    """
+    查找URL对应的缓存规则
+
+    Returns:
+        tuple | None: (类型, 有效期)，不缓存时返回None
+    """
+    parsed = urllib.parse.urlparse(url)
+    for host, path_prefix, kind, ttl in CACHE_RULES:
+        if parsed.hostname == host and parsed.path.startswith(path_prefix):
+            return kind, ttl
+    return None
+
+
+def normalize_url(url):
+    """去掉 wbi 签名参数并排序查询参数，使同一请求得到相同的缓存键"""
+    parsed = urllib.parse.urlparse(url)
+    query = sorted(
+        (key, value) for key, value in urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+        if key not in VOLATILE_QUERY_PARAMS)
+    return parsed._replace(query=urllib.parse.urlencode(query), fragment='').geturl()
+
+
+def get_auth_state(cookiejar):
+    """
+    计算登录状态摘要（SESSDATA 的哈希），登录与未登录、不同账号的响应分开缓存
+
+    Args:
+        cookiejar: YoutubeDL.cookiejar
+
+    Returns:
+        str: 登录状态摘要，未登录时为 'anonymous'
+    """
+    for cookie in cookiejar:
+        if cookie.name == 'SESSDATA' and cookie.domain.endswith('bilibili.com') and cookie.value:
+            return hashlib.sha256(cookie.value.encode('utf-8')).hexdigest()[:16]
+    return 'anonymous'
+
+
+def is_cacheable_body(kind, body):
+    """
+    检查响应内容是否可以缓存
+
+    接口的HTTP状态码通常为200，错误（如风控 -352、未登录 -101）写在JSON的 code 字段中；
+    视频页面被风控时不包含初始数据。这些响应都不缓存。
+    """
+    if kind == 'video' and body.lstrip()[:1] == b'<':
+        return b'window.__INITIAL_STATE__' in body
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return False
+    if kind == 'nav':
+        # 未登录时 nav 返回 -101，但其中的 wbi 签名密钥仍然有效
+        return isinstance(data, dict) and data.get('code') in (0, -101)
+    return isinstance(data, dict) and data.get('code') == 0
+
+
+def get_expires_at(body, ttl):
+    """
+    计算缓存条目的过期时间
+
+    响应中包含带 deadline 的签名CDN地址时，过期时间不晚于最早的 deadline 减去 DEADLINE_MARGIN，
+    避免缓存命中后得到已失效的下载地址。
+
+    Args:
+        body: 响应正文
+        ttl: 缓存规则的有效期（秒）
+
+    Returns:
+        float: 过期时间（Unix 时间戳），不早于当前时间时才可缓存
+    """
+    expires_at = time.time() + ttl
+    deadlines = [int(value) for value in DEADLINE_RE.findall(body)]
+    if deadlines:
+        expires_at = min(expires_at, min(deadlines) - DEADLINE_MARGIN)
+    return expires_at
+
+
+class MetadataCache:
+    """
+    基于 SQLite 的接口响应缓存
+
+    通过 urlopen() 包装 YoutubeDL.urlopen，只处理匹配 CACHE_RULES 的 GET 请求，其他请求直接透传。
+    多个下载线程共享同一实例时线程安全。
+    """
+
+    # 缓存容量上限（字节），超出后淘汰最久未访问的条目
+    MAX_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, db_path, max_size=None):
+        """
+        Args:
+            db_path: 数据库文件路径
+            max_size: 缓存容量上限（字节），默认 MAX_SIZE
+        """
+        self.db_path = db_path
+        self.max_size = max_size or self.MAX_SIZE
+        # 统计：命中、条件请求续期、实际请求
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    cache_key TEXT PRIMARY KEY,
+                    kind TEXT,
+                    url TEXT,
+                    headers TEXT,
+                    body BLOB,
+                    size INTEGER,
+                    etag TEXT,
+                    last_modified TEXT,
+                    expires_at REAL,
+                    last_access REAL
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_access ON responses (last_access)')
+
+    def urlopen(self, req, opener, cookiejar):
+        """
+        带缓存的请求
+
+        Args:
+            req: yt-dlp Request 或 URL 字符串
+            opener: 实际发送请求的函数（YoutubeDL.urlopen）
+            cookiejar: 用于区分登录状态的 cookiejar
+
+        Returns:
+            Response: 缓存命中时返回由缓存内容构造的响应
+        """
+        if isinstance(req, str):
+            req = Request(req)
+        refresh = isinstance(req, Request) and req.extensions.pop(REFRESH_EXTENSION, False)
+        rule = isinstance(req, Request) and req.method == 'GET' and req.data is None and match_cache_rule(req.url)
+        if not rule:
+            return opener(req)
+        kind, ttl = rule
+        cache_key = f'{get_auth_state(cookiejar)} {normalize_url(req.url)}'
+
+        cached = None if refresh else self._get(cache_key)
+        if cached and cached['expires_at'] > time.time():
+            self.hits += 1
+            return self._make_response(cached)
+
+        # 过期条目带有校验信息时发送条件请求，未修改时服务器只返回 304
+        # （签名地址已过期的条目即使未修改也不能续期，重新请求）
+        if (cached and (cached['etag'] or cached['last_modified'])
+                and get_expires_at(cached['body'], ttl) > time.time()):
+            conditional = req.copy()
+            if cached['etag']:
+                conditional.headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                conditional.headers['If-Modified-Since'] = cached['last_modified']
+            try:
+                response = opener(conditional)
+            except HTTPError as e:
+                if e.status != 304:
+                    raise
+                e.response.close()
+                self.revalidated += 1
+                self._touch(cache_key, get_expires_at(cached['body'], ttl))
+                return self._make_response(cached)
+        else:
+            response = opener(req)
+
+        self.misses += 1
+        body = response.read()
+        response.close()
+        headers = {
+            name: value for name, value in response.headers.items()
+            if name.lower() not in DROPPED_HEADERS}
+        entry = {
+            'url': response.url,
+            'headers': headers,
+            'body': body,
+            'status': response.status,
+        }
+        expires_at = get_expires_at(body, ttl)
+        if response.status == 200 and expires_at > time.time() and is_cacheable_body(kind, body):
+            self._put(cache_key, kind, entry, response.headers.get('ETag'),
+                      response.headers.get('Last-Modified'), expires_at)
+        return self._make_response(entry)
+
+    @staticmethod
+    def _make_response(entry):
+        return Response(
+            io.BytesIO(entry['body']), url=entry['url'], headers=entry['headers'], status=entry.get('status', 200))
+
+    def _get(self, cache_key):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT url, headers, body, etag, last_modified, expires_at FROM responses WHERE cache_key = ?',
+                (cache_key,)).fetchone()
+            if row is None:
+                return None
+            with self._conn:
+                self._conn.execute(
+                    'UPDATE responses SET last_access = ? WHERE cache_key = ?', (time.time(), cache_key))
+        url, headers, body, etag, last_modified, expires_at = row
+        return {
+            'url': url,
+            'headers': json.loads(headers),
+            'body': body,
+            'etag': etag,
+            'last_modified': last_modified,
+            'expires_at': expires_at,
+        }
+
+    def _touch(self, cache_key, expires_at):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE responses SET expires_at = ?, last_access = ? WHERE cache_key = ?',
+                (expires_at, time.time(), cache_key))
+
+    def _put(self, cache_key, kind, entry, etag, last_modified, expires_at):
+        size = len(entry['body'])
+        if size > self.max_size:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses '
+                '(cache_key, kind, url, headers, body, size, etag, last_modified, expires_at, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (cache_key, kind, entry['url'], json.dumps(entry['headers']), entry['body'], size,
+                 etag, last_modified, expires_at, time.time()))
+            self._evict()
+
+    def _evict(self):
+        # 调用方已持有锁：超出容量时从最久未访问的条目开始删除，直到降到上限的 90%
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_size:
+            return
+        target = self.max_size * 0.9
+        rows = self._conn.execute('SELECT cache_key, size FROM responses ORDER BY last_access').fetchall()
+        for cache_key, size in rows:
+            if total <= target:
+                break
+            self._conn.execute('DELETE FROM responses WHERE cache_key = ?', (cache_key,))
+            total -= size
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
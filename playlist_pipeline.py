@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+播放列表处理流水线
+负责收藏夹、UP主空间等列表条目的惰性遍历
+
+版本历史：
+==========
+
+v1.0 (2026-10-17)
+--------------
+- 初始版本
+  * 按页惰性遍历列表条目，不缓存已遍历的分页，内存占用与列表长度无关
+  * 预估列表总数（分页数已知时无需遍历全部分页）
+  * 分页数已知时并发请求后续分页（并发数有上限），按页码顺序返回条目；
+    每个请求线程使用自己的YoutubeDL实例和提取器
+  * 预取下载位置之后若干视频的元数据，签名CDN地址过期前使用
+  * 可选小文件优先：从已预取的视频中优先下载预估最小的
+  * 多个来源的条目按来源轮流交出
+  * 预取时获取后续分页失败（风控、网络错误等）不会中断下载：已获取的条目照常交出，错误交给调用方处理
+"""
+import collections
+import itertools
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from yt_dlp.utils import DownloadCancelled, InAdvancePagedList, PagedList
+
+
+def get_page_info(entries):
+    """
+    读取 yt-dlp 分页列表的分页函数、分页数和每页数量（私有属性，不存在时返回None）
+
+    Returns:
+        tuple: (分页函数, 分页数, 每页数量)，entries 不是分页列表时都为None
+    """
+    if not isinstance(entries, PagedList):
+        return None, None, None
+    pagefunc = getattr(entries, '_pagefunc', None)
+    pagecount = getattr(entries, '_pagecount', None)
+    pagesize = getattr(entries, '_pagesize', None)
+    if not callable(pagefunc):
+        pagefunc = None
+    if not isinstance(pagecount, int):
+        pagecount = None
+    if not isinstance(pagesize, int) or pagesize <= 0:
+        pagesize = None
+    return pagefunc, pagecount, pagesize
+
+
+def iter_pages_concurrently(pagecount, page_concurrency, load_pagefunc):
+    """
+    并发请求分页数已知的列表的各个分页，按页码顺序返回条目
+
+    同时在途的分页数不超过 page_concurrency，消费方停止遍历时不再提交新的分页请求。
+    提取器和YoutubeDL实例不是线程安全的，每个请求线程调用一次 load_pagefunc，
+    使用自己的实例重新解析列表得到的分页函数。
+
+    Args:
+        pagecount: 分页数
+        page_concurrency: 最大并发请求数
+        load_pagefunc: 在请求线程中调用，返回该线程使用的分页函数
+
+    Yields:
+        dict: 列表条目
+    """
+    local = threading.local()
+
+    def fetch_page(page_num):
+        pagefunc = getattr(local, 'pagefunc', None)
+        if pagefunc is None:
+            pagefunc = local.pagefunc = load_pagefunc()
+        # 分页函数通常返回生成器，在工作线程中展开以完成网络请求
+        return list(pagefunc(page_num))
+
+    page_nums = iter(range(pagecount))
+    with ThreadPoolExecutor(max_workers=page_concurrency) as executor:
+        pending = collections.deque(
+            executor.submit(fetch_page, page_num) for page_num in itertools.islice(page_nums, page_concurrency))
+        while pending:
+            page = pending.popleft().result()
+            next_page_num = next(page_nums, None)
+            if next_page_num is not None:
+                pending.append(executor.submit(fetch_page, next_page_num))
+            yield from filter(None, page)
+
+
+def iter_playlist_entries(entries, page_concurrency=1, ydl_factory=None, url=None, ie_key=None):
+    """
+    惰性遍历列表条目（过滤掉None）
+
+    yt-dlp 的分页列表（PagedList）会缓存所有已请求的分页，这里直接按页调用分页函数，
+    每页的条目交出后即可释放，下载可以在第一页返回后立即开始。
+    分页列表的内部属性不可用时（yt-dlp 版本变化），退回为直接遍历列表。
+
+    Args:
+        entries: info['entries']，可能是列表、生成器或分页列表
+        page_concurrency: 分页数已知时同时请求的分页数（1表示逐页请求）
+        ydl_factory: 创建YoutubeDL实例的函数（并发请求时每个请求线程调用一次）
+        url: 列表链接（并发请求时各请求线程用自己的实例重新解析）
+        ie_key: 列表的提取器
+
+    Yields:
+        dict: 列表条目（通常是url类型的info字典）
+    """
+    pagefunc, pagecount, pagesize = get_page_info(entries)
+    if isinstance(entries, InAdvancePagedList) and pagefunc and pagecount is not None:
+        # 分页数已知：首页已由提取器获取，其余页码可以并发请求
+        if page_concurrency > 1 and pagecount > 1 and ydl_factory is not None and url:
+            instances = []
+            instances_lock = threading.Lock()
+
+            def load_pagefunc():
+                ydl = ydl_factory()
+                with instances_lock:
+                    instances.append(ydl)
+                # 首页请求通常由元数据缓存直接返回
+                info = ydl.extract_info(url, download=False, ie_key=ie_key, process=False)
+                thread_pagefunc = get_page_info((info or {}).get('entries'))[0]
+                if thread_pagefunc is None:
+                    raise ValueError(f'重新解析列表失败: {url}')
+                return thread_pagefunc
+
+            try:
+                yield from iter_pages_concurrently(pagecount, page_concurrency, load_pagefunc)
+            finally:
+                with instances_lock:
+                    for ydl in instances:
+                        ydl.close()
+            return
+        for page_num in range(pagecount):
+            yield from filter(None, pagefunc(page_num))
+    elif isinstance(entries, PagedList) and pagefunc and pagesize:
+        # 分页数未知：请求到不满一页时结束
+        for page_num in itertools.count():
+            page = list(pagefunc(page_num))
+            yield from filter(None, page)
+            if len(page) < pagesize:
+                break
+    else:
+        yield from filter(None, entries)
+
+
+def estimate_entry_count(info):
+    """
+    在不遍历列表的情况下预估条目总数
+
+    Args:
+        info: 列表的info字典
+
+    Returns:
+        int | None: 预估总数（分页列表为 分页数 x 每页数量 的上限），无法预估时返回None
+    """
+    if info.get('playlist_count'):
+        return info['playlist_count']
+    entries = info.get('entries')
+    if isinstance(entries, InAdvancePagedList):
+        _, pagecount, pagesize = get_page_info(entries)
+        return pagecount * pagesize if pagecount is not None and pagesize else None
+    if isinstance(entries, (list, tuple)):
+        return sum(1 for entry in entries if entry is not None)
+    return None
+
+
+def interleave_by_source(entries, window=200):
+    """
+    按来源轮流交出条目（条目的 '__source' 字段），避免某个来源的大量视频排在其他来源之前
+
+    最多缓冲 window 个条目；同一来源内保持原顺序。
+
+    Args:
+        entries: 条目迭代器
+        window: 缓冲的条目数
+
+    Yields:
+        dict: 条目
+    """
+    entries = iter(entries)
+    queues = collections.OrderedDict()
+    buffered = 0
+    exhausted = False
+    while True:
+        while not exhausted and buffered < window:
+            entry = next(entries, None)
+            if entry is None:
+                exhausted = True
+                break
+            queues.setdefault(entry.get('__source'), collections.deque()).append(entry)
+            buffered += 1
+        if not queues:
+            return
+        # 取队首来源的一个条目，然后把该来源移到末尾
+        source, queue = next(iter(queues.items()))
+        yield queue.popleft()
+        buffered -= 1
+        if queue:
+            queues.move_to_end(source)
+        else:
+            del queues[source]
+
+
+def estimate_info_size(info):
+    """
+    预估视频下载大小（字节）
+
+    取最大的视频格式与最大的纯音频格式大小之和；格式没有大小信息时按时长粗略估算（约1Mbps）。
+
+    Args:
+        info: extract_info 返回的info字典
+
+    Returns:
+        float: 预估大小
+    """
+    video_size = audio_size = 0
+    for fmt in info.get('formats') or ():
+        size = fmt.get('filesize') or fmt.get('filesize_approx') or 0
+        if fmt.get('vcodec') == 'none':
+            audio_size = max(audio_size, size)
+        else:
+            video_size = max(video_size, size)
+    if video_size or audio_size:
+        return video_size + audio_size
+    return (info.get('duration') or 0) * 128 * 1024
+
+
+def get_info_expiry(info, default_ttl, margin):
+    """
+    计算解析结果的过期时间
+
+    B站CDN地址带有 deadline 参数（Unix时间戳），过期后无法下载；
+    取所有格式中最早的 deadline 并预留余量，没有 deadline 时使用默认有效期。
+
+    Args:
+        info: extract_info 返回的info字典
+        default_ttl: 默认有效期（秒）
+        margin: 距离 deadline 预留的余量（秒）
+
+    Returns:
+        float: 过期时间（time.time() 时间戳）
+    """
+    expiry = time.time() + default_ttl
+    for fmt in info.get('formats') or ():
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(fmt.get('url') or '').query)
+        deadline = (query.get('deadline') or [None])[0]
+        if deadline and deadline.isdigit():
+            expiry = min(expiry, int(deadline) - margin)
+    return expiry
+
+
+class PrefetchedEntry:
+    """
+    预取中的列表条目
+
+    entry 为原始条目；get_info() 等待预取完成，返回仍在有效期内的解析结果，
+    预取失败、已跳过或结果过期时返回None，由下载线程重新解析。
+    """
+
+    def __init__(self, entry, future):
+        self.entry = entry
+        self._future = future
+        # 小文件优先时被后来的条目超过的次数
+        self.passed_over = 0
+
+    def done(self):
+        return self._future.done()
+
+    def estimated_size(self):
+        """预取完成后的预估大小；已跳过或预取失败的条目处理很快，视为0"""
+        try:
+            result = self._future.result()
+        except Exception:
+            return 0
+        return estimate_info_size(result[0]) if result else 0
+
+    def get_info(self):
+        try:
+            result = self._future.result()
+        except Exception:
+            return None
+        if result is None:
+            return None
+        info, expiry = result
+        if time.time() >= expiry:
+            return None
+        return info
+
+
+class MetadataPrefetcher:
+    """
+    列表条目元数据预取器
+
+    在下载线程领取条目之前，用小线程池提前解析后续若干个视频的元数据和格式
+    （即视频详情/playurl接口），下载线程领取条目时可以直接开始下载。
+    YoutubeDL实例不是线程安全的，每个预取线程各自创建一个实例。
+    """
+
+    # 没有 deadline 参数时解析结果的有效期（秒）
+    DEFAULT_TTL = 600
+    # 距离CDN地址 deadline 预留的余量（秒），留出下载本身的时间
+    EXPIRY_MARGIN = 300
+
+    def __init__(self, entries, ydl_factory, read_ahead=2, workers=2, smallest_first=False,
+                 on_enumeration_error=None):
+        """
+        Args:
+            entries: 列表条目迭代器（url类型的info字典）
+            ydl_factory: 创建YoutubeDL实例的函数（每个预取线程调用一次）
+            read_ahead: 最多提前解析的条目数
+            workers: 预取线程数
+            smallest_first: 是否从已预取完成的条目中优先交出预估最小的（完成数量增长更快）
+            on_enumeration_error: 获取后续条目失败时调用的函数（参数为异常），在领取条目的线程中调用
+        """
+        self._smallest_first = smallest_first
+        self._entries = iter(entries)
+        self._ydl_factory = ydl_factory
+        self._read_ahead = max(1, read_ahead)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        self._pending = collections.deque()
+        self._local = threading.local()
+        self._instances = []
+        self._instances_lock = threading.Lock()
+        self._exhausted = False
+        self._on_enumeration_error = on_enumeration_error
+        # 获取后续条目（请求下一页列表）失败时的异常，之后不再获取新条目
+        self.enumeration_error = None
+
+    def _get_ydl(self):
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            ydl = self._local.ydl = self._ydl_factory()
+            with self._instances_lock:
+                self._instances.append(ydl)
+        return ydl
+
+    def _resolve(self, entry):
+        # 只预取普通url条目；url_transparent 需要合并列表信息，交给下载线程处理
+        if entry.get('_type') != 'url':
+            return None
+        ydl = self._get_ydl()
+        # 已下载的视频（多P视频需全部分P已下载）无需请求详情
+        if ydl.is_entry_archived(entry):
+            return None
+        info = ydl.extract_info(entry['url'], download=False, ie_key=entry.get('ie_key'), process=False)
+        if info is None:
+            return None
+        return info, get_info_expiry(info, self.DEFAULT_TTL, self.EXPIRY_MARGIN)
+
+    def _fill(self):
+        while not self._exhausted and len(self._pending) < self._read_ahead:
+            try:
+                entry = next(self._entries, None)
+            except DownloadCancelled:
+                raise
+            except Exception as e:
+                # 分页请求失败：不再获取新条目，已获取的条目照常交出，下载线程不会因此退出
+                self._exhausted = True
+                self.enumeration_error = e
+                if self._on_enumeration_error is not None:
+                    self._on_enumeration_error(e)
+                break
+            if entry is None:
+                self._exhausted = True
+                break
+            self._pending.append(PrefetchedEntry(entry, self._executor.submit(self._resolve, entry)))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """领取下一个条目，同时补充预取窗口（调用方负责加锁）"""
+        self._fill()
+        if not self._pending:
+            raise StopIteration
+        prefetched = self._pending[0]
+        if self._smallest_first and prefetched.passed_over < self._read_ahead:
+            # 只在已预取完成的条目中选择，不等待未完成的预取；
+            # 队首条目被超过的次数达到窗口大小后必须交出，大文件不会一直被推后
+            ready = [candidate for candidate in self._pending if candidate.done()]
+            if ready:
+                prefetched = min(ready, key=lambda candidate: candidate.estimated_size())
+        index = self._pending.index(prefetched)
+        del self._pending[index]
+        for position in range(index):
+            self._pending[position].passed_over += 1
+        self._fill()
+        return prefetched
+
+    def close(self):
+        """取消尚未开始的预取并关闭预取线程创建的YoutubeDL实例"""
+        for prefetched in self._pending:
+            prefetched._future.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=True)
+        with self._instances_lock:
+            for ydl in self._instances:
+                ydl.close()
+            self._instances.clear()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载进度估计
+按字节计算批量下载的总进度，并用指数加权移动平均（EWMA）估计下载速度和剩余时间
+
+版本历史：
+==========
+
+v1.0 (2026-10-17)
+--------------
+- 初始版本
+  * 每个视频按大小计入总进度（已下载的实际大小、解析格式得到的预估大小），不再按个数平均
+  * 大小未知的视频（尚未解析、已跳过、上次运行已完成）按已知视频的平均大小估算
+  * 下载速度按时间加权平滑，暂停、单个分片卡顿时剩余时间不会剧烈跳动
+"""
+import math
+import threading
+import time
+
+
+class ProgressEstimator:
+    """
+    批量下载进度估计（线程安全）
+
+    下载线程通过 set_estimate / update_stream / finish 记录各视频的大小和进度，
+    界面线程定时调用 sample() 更新下载速度，并用 snapshot() 读取总进度。
+    """
+
+    # 下载速度平滑的时间常数（秒）：越大越平稳，越小越快反映速度变化
+    RATE_TIME_CONSTANT = 5.0
+    # 两次速度采样的最小间隔（秒）
+    MIN_SAMPLE_INTERVAL = 0.5
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, finished_entries=0):
+        """
+        开始新的下载（或恢复任务）时重置
+
+        Args:
+            finished_entries: 之前已完成的视频数（大小未知，按平均大小计入）
+        """
+        with self._lock:
+            # 视频标识 -> 大小（预估值，下载中按实际流大小修正，完成后为实际大小）
+            self._sizes = {}
+            self._size_sum = 0
+            # 下载中的视频：视频标识 -> {流文件名: (已下载字节, 总字节)}
+            self._streams = {}
+            # 已完成视频的实际字节数之和，以及按平均大小计入的视频数
+            self._finished_bytes = 0
+            self._counted_entries = finished_entries
+            # 累计收到的字节数（用于计算下载速度）
+            self._received = 0
+            self._last_sample = None
+            self.rate = None
+
+    def _set_size(self, key, size):
+        # 调用方已持有锁
+        self._size_sum += size - self._sizes.get(key, 0)
+        self._sizes[key] = size
+
+    def set_estimate(self, key, size):
+        """
+        记录视频的预估大小（由解析得到的格式计算，开始下载前调用）
+
+        Args:
+            key: 视频标识
+            size: 预估大小（字节），0 表示未知
+        """
+        if not size:
+            return
+        with self._lock:
+            if key not in self._streams:
+                self._set_size(key, size)
+
+    def update_stream(self, key, stream_key, downloaded, total):
+        """
+        记录视频中一路流的下载进度（进度回调调用）
+
+        Args:
+            key: 视频标识
+            stream_key: 流的临时文件名
+            downloaded: 已下载字节数
+            total: 总字节数
+        """
+        with self._lock:
+            streams = self._streams.setdefault(key, {})
+            previous = streams.get(stream_key, (0, 0))[0]
+            # 重新下载（如降级重试）时已下载字节数会变小，不计为新收到的数据
+            self._received += max(0, downloaded - previous)
+            streams[stream_key] = (downloaded, total)
+            # 视频流和音频流可能先后开始，预估大小只在实际流大小之和更大时修正
+            stream_total = sum(size for _, size in streams.values())
+            if stream_total > self._sizes.get(key, 0):
+                self._set_size(key, stream_total)
+
+    def finish(self, key):
+        """
+        视频处理结束（下载完成、跳过或失败）
+
+        有下载数据时以实际下载的字节数作为大小，否则按平均大小计入。
+        """
+        with self._lock:
+            streams = self._streams.pop(key, None)
+            downloaded = sum(done for done, _ in streams.values()) if streams else 0
+            if downloaded:
+                self._set_size(key, downloaded)
+                self._finished_bytes += downloaded
+            else:
+                if key in self._sizes:
+                    self._size_sum -= self._sizes.pop(key)
+                self._counted_entries += 1
+
+    def sample(self, now=None):
+        """
+        更新下载速度（界面线程定时调用）
+
+        速度 = 两次采样之间收到的字节数 / 间隔，按 RATE_TIME_CONSTANT 做时间加权平均：
+        采样间隔不固定时也保持相同的平滑程度。
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            received = self._received
+        if self._last_sample is None:
+            self._last_sample = (now, received)
+            return
+        last_time, last_received = self._last_sample
+        elapsed = now - last_time
+        if elapsed < self.MIN_SAMPLE_INTERVAL:
+            return
+        instant = (received - last_received) / elapsed
+        if self.rate is None:
+            self.rate = instant
+        else:
+            weight = 1 - math.exp(-elapsed / self.RATE_TIME_CONSTANT)
+            self.rate += weight * (instant - self.rate)
+        self._last_sample = (now, received)
+
+    def snapshot(self, entry_count):
+        """
+        计算当前总进度
+
+        Args:
+            entry_count: 视频总数（列表仍在获取中时为当前已知数量）
+
+        Returns:
+            dict | None: {'done': 已下载字节, 'total': 总字节, 'progress': 0.0-1.0, 'rate': 字节/秒,
+                          'eta': 剩余秒数（速度未知时为None）}；还没有任何视频的大小时返回None
+        """
+        with self._lock:
+            known = len(self._sizes)
+            if not known:
+                return None
+            average = self._size_sum / known
+            active = sum(done for streams in self._streams.values() for done, _ in streams.values())
+            # 尚未解析的视频和按平均大小计入的视频都用平均大小估算
+            unknown = max(0, (entry_count or 0) - known - self._counted_entries)
+            total = self._size_sum + (self._counted_entries + unknown) * average
+            done = self._finished_bytes + self._counted_entries * average + active
+        done = min(done, total)
+        rate = self.rate
+        eta = (total - done) / rate if rate and rate > 1 else None
+        return {
+            'done': done,
+            'total': total,
+            'progress': done / total if total > 0 else 0.0,
+            'rate': rate,
+            'eta': eta,
+        }
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+失败重试与风控应对
+错误分类、指数退避、按域名熔断和自适应并发（AIMD）
+
+版本历史：
+==========
+
+v1.0 (2026-10-17)
+--------------
+- 初始版本
+  * 错误分为临时错误（网络中断、超时、5xx）、风控（HTTP 412/429、接口 -352 等）和永久错误（视频不存在、未登录、需要大会员等）
+  * 临时错误按指数退避（带随机抖动）重试
+  * 同一域名短时间内多次触发风控时熔断：所有请求暂停一段时间，连续熔断时暂停时间加倍
+  * 同时下载的视频数按 AIMD 调整：成功时缓慢增加，触发风控时减半
+"""
+import random
+import re
+import threading
+import time
+import urllib.parse
+
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+from yt_dlp.utils import ContentTooShortError, GeoRestrictedError, ExtractorError
+
+from job_control import JobCancelled
+
+
+# 错误类型
+ERROR_TRANSIENT = 'transient'
+ERROR_RATE_LIMITED = 'rate_limited'
+ERROR_PERMANENT = 'permanent'
+
+# 表示风控的HTTP状态码
+RATE_LIMIT_STATUSES = (412, 429)
+# B站接口（视频信息、播放地址、列表）所在域名，接口返回风控错误码时按该域名熔断
+API_HOST = 'api.bilibili.com'
+
+# 风控：HTTP 412/429、接口返回 -352/-412/-509/-799（yt-dlp 的错误信息中可能不带负号）
+RATE_LIMIT_RE = re.compile(
+    r'\((?:412|352|429)\)|:\s*-?(?:352|412|509|799)\b|please wait and try later|请求过于频繁|风控', re.IGNORECASE)
+# 未登录或Cookie已失效：HTTP 401、接口返回 -401（按永久错误处理，并重新读取浏览器Cookie）
+UNAUTHORIZED_RE = re.compile(r'\(-?401\)|:\s*-?401\b|unauthorized', re.IGNORECASE)
+# 永久错误：视频不存在、已删除、需要登录或大会员、格式不可用等，重试不会成功
+PERMANENT_RE = re.compile(
+    r'not available|no longer available|does not exist|has been removed|private|premium|'
+    r'requested format is not available|unsupported url|not a valid url|'
+    r'啥都木有|不存在|已失效|已删除|大会员|付费|充电', re.IGNORECASE)
+
+
+def iter_error_chain(error):
+    """依次返回异常本身、DownloadError 包装的原始异常和各级 cause"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        exc_info = getattr(error, 'exc_info', None)
+        wrapped = exc_info[1] if isinstance(exc_info, tuple) and len(exc_info) > 1 else None
+        error = wrapped or getattr(error, 'cause', None) or error.__cause__ or error.__context__
+
+
+def classify_error(error):
+    """
+    判断错误类型
+
+    Args:
+        error: 异常对象或错误信息文本
+
+    Returns:
+        str: ERROR_TRANSIENT / ERROR_RATE_LIMITED / ERROR_PERMANENT
+    """
+    if isinstance(error, str):
+        if RATE_LIMIT_RE.search(error):
+            return ERROR_RATE_LIMITED
+        if UNAUTHORIZED_RE.search(error) or PERMANENT_RE.search(error):
+            return ERROR_PERMANENT
+        return ERROR_TRANSIENT
+
+    expected = False
+    for cause in iter_error_chain(error):
+        if isinstance(cause, HTTPError):
+            if cause.status in RATE_LIMIT_STATUSES:
+                return ERROR_RATE_LIMITED
+            # 403 通常是CDN签名地址过期，重新解析即可；401 表示未登录，重试也不会成功
+            if cause.status in (401, 404, 410):
+                return ERROR_PERMANENT
+            return ERROR_TRANSIENT
+        if isinstance(cause, GeoRestrictedError):
+            return ERROR_PERMANENT
+        if isinstance(cause, (TransportError, ContentTooShortError, TimeoutError, ConnectionError)):
+            return ERROR_TRANSIENT
+        if isinstance(cause, ExtractorError) and cause.expected:
+            expected = True
+
+    message = str(error)
+    if RATE_LIMIT_RE.search(message):
+        return ERROR_RATE_LIMITED
+    if expected or UNAUTHORIZED_RE.search(message) or PERMANENT_RE.search(message):
+        return ERROR_PERMANENT
+    return ERROR_TRANSIENT
+
+
+def is_unauthorized(error):
+    """错误是否表示未登录或Cookie已失效（HTTP 401、接口 -401）"""
+    if isinstance(error, BaseException):
+        if any(isinstance(cause, HTTPError) and cause.status == 401 for cause in iter_error_chain(error)):
+            return True
+    return bool(UNAUTHORIZED_RE.search(str(error)))
+
+
+def has_http_rate_limit(error):
+    """错误是否由HTTP 412/429 引起（这类错误已在请求时计入熔断器）"""
+    return any(
+        isinstance(cause, HTTPError) and cause.status in RATE_LIMIT_STATUSES
+        for cause in iter_error_chain(error)) if isinstance(error, BaseException) else False
+
+
+def backoff_delay(attempt, base=2.0, cap=60.0):
+    """
+    指数退避等待时间（带随机抖动）
+
+    取 min(cap, base * 2^attempt) 的一半加上 0 到另一半之间的随机值，
+    多个下载线程同时失败时不会在同一时刻重试。
+
+    Args:
+        attempt: 第几次重试（从0开始）
+        base: 初始等待时间（秒）
+        cap: 最长等待时间（秒）
+
+    Returns:
+        float: 等待秒数
+    """
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def get_host(req):
+    """获取请求（yt-dlp Request 或URL字符串）的域名"""
+    url = req if isinstance(req, str) else getattr(req, 'url', '')
+    return urllib.parse.urlsplit(url).hostname or ''
+
+
+class CircuitBreaker:
+    """
+    按域名的熔断器（线程安全）
+
+    FAILURE_WINDOW 秒内同一域名触发 FAILURE_THRESHOLD 次风控即熔断，
+    熔断期间所有对该域名的请求等待；熔断结束后仍然风控时，下次熔断时间加倍（最长 MAX_COOLDOWN）。
+    """
+
+    FAILURE_THRESHOLD = 3
+    FAILURE_WINDOW = 60
+    BASE_COOLDOWN = 60
+    MAX_COOLDOWN = 15 * 60
+
+    def __init__(self, on_open=None):
+        """
+        Args:
+            on_open: 熔断回调 on_open(域名, 暂停秒数, 原因)
+        """
+        self.on_open = on_open
+        self._lock = threading.Lock()
+        # 域名 -> 最近的风控时间列表 / 熔断结束时间 / 连续熔断次数
+        self._failures = {}
+        self._open_until = {}
+        self._trips = {}
+
+    def record_rate_limited(self, host, reason=''):
+        """记录一次风控，达到阈值时熔断"""
+        now = time.monotonic()
+        with self._lock:
+            if self._open_until.get(host, 0) > now:
+                return
+            failures = [t for t in self._failures.get(host, []) if now - t < self.FAILURE_WINDOW]
+            failures.append(now)
+            if len(failures) < self.FAILURE_THRESHOLD:
+                self._failures[host] = failures
+                return
+            trips = self._trips.get(host, 0)
+            cooldown = min(self.MAX_COOLDOWN, self.BASE_COOLDOWN * 2 ** trips)
+            self._trips[host] = trips + 1
+            self._open_until[host] = now + cooldown
+            self._failures[host] = []
+        if self.on_open:
+            self.on_open(host, cooldown, reason)
+
+    def record_success(self, host):
+        """请求成功：熔断结束后恢复正常，下次熔断时间重新计算"""
+        with self._lock:
+            if host in self._trips and self._open_until.get(host, 0) <= time.monotonic():
+                del self._trips[host]
+
+    def remaining(self, host):
+        """熔断剩余时间（秒），未熔断时为0"""
+        with self._lock:
+            return max(0.0, self._open_until.get(host, 0) - time.monotonic())
+
+    def wait(self, host, control=None):
+        """
+        熔断期间阻塞直到恢复
+
+        Args:
+            host: 域名
+            control: 任务控制令牌（JobControl），等待期间任务取消时抛出 JobCancelled
+        """
+        remaining = self.remaining(host)
+        while remaining > 0:
+            if control is not None:
+                control.sleep(remaining)
+            else:
+                time.sleep(remaining)
+            # 等待期间可能再次熔断
+            remaining = self.remaining(host)
+
+
+class AdaptiveConcurrency:
+    """
+    自适应并发数（AIMD，线程安全）
+
+    下载线程开始一个视频前调用 acquire()，结束后调用 release(错误类型)：
+    每成功一个视频并发上限增加 1/上限（约每轮增加1），触发风控时上限减半，范围为 [minimum, maximum]。
+    """
+
+    def __init__(self, maximum, minimum=1):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = float(maximum)
+        self._active = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, control=None):
+        """
+        等待空闲名额
+
+        Raises:
+            JobCancelled: 等待期间任务被取消
+        """
+        with self._condition:
+            while True:
+                if control is not None and control.cancelled:
+                    raise JobCancelled()
+                if self._active < int(self.limit):
+                    self._active += 1
+                    return
+                self._condition.wait()
+
+    def release(self, error_type=None):
+        """
+        释放名额并调整并发上限
+
+        Args:
+            error_type: None 表示成功；ERROR_RATE_LIMITED 时上限减半；其他错误不调整
+
+        Returns:
+            int | None: 并发上限（整数部分）有变化时返回新的上限
+        """
+        with self._condition:
+            self._active -= 1
+            previous = int(self.limit)
+            if error_type is None:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            elif error_type == ERROR_RATE_LIMITED:
+                self.limit = max(float(self.minimum), self.limit / 2)
+            self._condition.notify_all()
+            return int(self.limit) if int(self.limit) != previous else None
+
+    def wake(self):
+        """唤醒等待中的线程（任务取消时）"""
+        with self._condition:
+            self._condition.notify_all()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载状态表
+记录当前任务中每个视频的状态、速度、大小、剩余时间和错误信息，供任务列表窗口显示
+
+版本历史：
+==========
+
+v1.0 (2026-10-17)
+--------------
+- 初始版本
+  * 数据来自任务记录和下载进度（与 jobs.db 中的视频状态一致），不解析日志文本
+  * 每行带修订号，界面只刷新可见且有变化的行，上万个视频也不会卡顿
+  * 按状态统计视频数
+"""
+import threading
+from collections import Counter
+
+from yt_dlp.utils import format_bytes
+
+from job_store import TASK_PENDING, TASK_DONE, TASK_SKIPPED, TASK_FAILED
+
+
+# 正在解析或下载中的视频（任务记录中仍为待下载状态）
+ROW_ACTIVE = 'active'
+
+# 状态显示文本
+STATUS_TEXT = {
+    TASK_PENDING: '等待',
+    ROW_ACTIVE: '下载中',
+    TASK_DONE: '已完成',
+    TASK_SKIPPED: '已跳过',
+    TASK_FAILED: '失败',
+}
+
+
+def format_eta(seconds):
+    """格式化剩余时间，如 05:32、1:02:05"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+class StatusModel:
+    """
+    下载状态表数据（线程安全）
+
+    下载线程更新状态和进度，界面线程按行号范围读取可见的行。
+    每次修改都会递增修订号，界面根据修订号判断哪些行需要重新显示。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 按列表顺序排列的视频标识，以及 视频标识 -> 行数据
+        self._keys = []
+        self._rows = {}
+        self._counts = Counter()
+        # 最近一次修改的修订号（任意行变化都会递增）
+        self.revision = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _touch(self, row):
+        # 调用方已持有锁
+        self.revision += 1
+        row['revision'] = self.revision
+
+    def clear(self):
+        """清空状态表（开始新的下载任务时调用）"""
+        with self._lock:
+            self._keys = []
+            self._rows = {}
+            self._counts = Counter()
+            self.revision += 1
+
+    def add(self, key, title=None, status=TASK_PENDING):
+        """
+        添加视频（已存在时忽略）
+
+        Args:
+            key: 视频标识（与任务记录中的视频标识一致）
+            title: 标题（列表条目中没有标题时显示视频标识）
+            status: 初始状态
+        """
+        with self._lock:
+            if key in self._rows:
+                return
+            row = {'title': title or key, 'status': status, 'streams': {}, 'downloaded': 0, 'total': 0,
+                   'speed': None, 'error': None, 'revision': 0}
+            self._keys.append(key)
+            self._rows[key] = row
+            self._counts[status] += 1
+            self._touch(row)
+
+    def set_status(self, key, status, error=None):
+        """
+        更新视频状态（不在表中的视频忽略）
+
+        Args:
+            key: 视频标识
+            status: 新状态（任务记录中的视频状态或 ROW_ACTIVE）
+            error: 错误信息（失败时）
+        """
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                return
+            self._counts[row['status']] -= 1
+            self._counts[status] += 1
+            row['status'] = status
+            if status != ROW_ACTIVE:
+                row['speed'] = None
+            if error:
+                row['error'] = error
+            self._touch(row)
+
+    def set_error(self, key, error):
+        """记录视频的错误信息（视频状态不变，结束时由 set_status 确定）"""
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                return
+            row['error'] = error
+            self._touch(row)
+
+    def update_stream(self, key, stream_key, downloaded, total, speed):
+        """
+        更新视频中一路流（视频流/音频流）的下载进度
+
+        Args:
+            key: 视频标识
+            stream_key: 流的临时文件名
+            downloaded: 已下载字节数
+            total: 总字节数
+            speed: 下载速度（字节/秒，未知时为None）
+        """
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                return
+            row['streams'][stream_key] = (downloaded, total, speed)
+            row['downloaded'] = sum(stream[0] for stream in row['streams'].values())
+            row['total'] = sum(stream[1] for stream in row['streams'].values())
+            speeds = [stream[2] for stream in row['streams'].values() if stream[2]]
+            row['speed'] = sum(speeds) if speeds else None
+            self._touch(row)
+
+    def counts(self):
+        """
+        Returns:
+            dict: 状态 -> 视频数
+        """
+        with self._lock:
+            return dict(self._counts)
+
+    def get_rows(self, start, count):
+        """
+        读取一段连续的行（界面只读取可见部分）
+
+        Args:
+            start: 起始行号
+            count: 行数
+
+        Returns:
+            list: [(视频标识, 修订号, 显示内容元组)]
+        """
+        with self._lock:
+            return [
+                (key, self._rows[key]['revision'], self.format_row(self._rows[key]))
+                for key in self._keys[start:start + count]]
+
+    @staticmethod
+    def format_row(row):
+        """生成一行的显示内容：(标题, 状态, 速度, 大小, 剩余时间, 错误)"""
+        status = row['status']
+        downloaded, total, speed = row['downloaded'], row['total'], row['speed']
+        if status == ROW_ACTIVE and total:
+            size = f"{format_bytes(downloaded)} / {format_bytes(total)}"
+        elif total:
+            size = format_bytes(total)
+        else:
+            size = ''
+        speed_text = f"{format_bytes(speed)}/s" if status == ROW_ACTIVE and speed else ''
+        eta = format_eta((total - downloaded) / speed) if status == ROW_ACTIVE and speed and total else ''
+        return (row['title'], STATUS_TEXT.get(status, status), speed_text, size, eta, row['error'] or '')
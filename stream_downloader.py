@@ -0,0 +1,661 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载器扩展
+在 yt-dlp 的 YoutubeDL 基础上扩展下载行为
+
+版本历史：
+==========
+
+v1.0 (2026-10-17)
+--------------
+- 初始版本
+  * 同一视频的视频流和音频流（DASH）同时下载，全部完成后再交给 ffmpeg 合并
+  * 分段多连接下载：单个大文件拆分为多个 HTTP Range 请求并行下载，按顺序拼接
+  * CDN 镜像优选：下载前对主地址和备用地址测速选择最快的镜像，速度过低时自动切换
+  * 使用 SQLite 下载记录（DownloadArchive）时同时写入视频元数据
+  * 配置 metadata_cache 时，B站接口请求经由本地元数据缓存
+  * 配置 job_control 时，每个请求前检查暂停/取消，打开的响应登记到任务以便取消时关闭
+  * 配置 bandwidth_limiter 时，所有响应的读取经过全局限速器
+  * 配置 circuit_breaker 时，请求前等待所在域名的熔断结束，HTTP 412/429 计入熔断器
+  * 记录每个线程最近一次下载错误（ignoreerrors 模式下用于判断错误类型和是否重试）
+  * 所有实例共用同一个连接池（见 connection_pool），关闭实例时不关闭共享连接
+  * 配置 cookie_cache 时，浏览器Cookie从缓存获取（见 cookie_cache），不再每个实例都读取浏览器数据库
+"""
+import functools
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import yt_dlp
+from yt_dlp.cookies import CookieLoadError
+from yt_dlp.downloader import get_suitable_downloader
+from yt_dlp.downloader.common import FileDownloader
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.extractor.bilibili import BiliBiliIE
+from yt_dlp.networking import Request
+from yt_dlp.networking.exceptions import HTTPError, RequestError
+from yt_dlp.utils import ContentTooShortError, DownloadError
+
+from connection_pool import get_request_director
+from download_archive import DownloadArchive
+from job_control import bind_job_control, get_job_control
+from metadata_cache import REFRESH_EXTENSION
+from retry_policy import RATE_LIMIT_STATUSES, get_host
+
+
+# B站 upos 视频节点的常用镜像域名（签名与域名无关，可互换使用）
+UPOS_MIRROR_HOSTS = (
+    'upos-sz-mirrorali.bilivideo.com',
+    'upos-sz-mirrorcos.bilivideo.com',
+    'upos-sz-mirrorhw.bilivideo.com',
+    'upos-sz-mirroraliov.bilivideo.com',
+    'upos-sz-mirrorcosov.bilivideo.com',
+    'upos-hz-mirrorakam.akamaized.net',
+)
+# 可替换为镜像域名的节点（upos 源站及 PCDN 节点）
+_REPLACEABLE_HOST_RE = re.compile(r'^(?:upos-[\w-]+\.(?:bilivideo\.com|akamaized\.net)|[\w-]+\.mcdn\.bilivideo\.cn|[\w.-]+\.szbdyd\.com)$')
+
+
+def get_mirror_candidates(info_dict):
+    """
+    获取某一路流的候选下载地址
+
+    依次为：当前地址、接口返回的备用地址（backup_urls）、替换为各 upos 镜像域名后的地址。
+
+    Args:
+        info_dict: 单个格式的info字典
+
+    Returns:
+        list: 去重后的候选地址
+    """
+    primary_url = info_dict['url']
+    candidates = [primary_url, *(info_dict.get('backup_urls') or [])]
+    for url in list(candidates):
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.hostname and _REPLACEABLE_HOST_RE.match(parsed.hostname):
+            candidates.extend(parsed._replace(netloc=host).geturl() for host in UPOS_MIRROR_HOSTS)
+    return list(dict.fromkeys(candidates))
+
+
+class BiliBiliMirrorIE(BiliBiliIE):
+    """在B站视频提取器的基础上保留各格式的备用CDN地址（backupUrl）"""
+
+    IE_NAME = BiliBiliIE.IE_NAME
+
+    @classmethod
+    def ie_key(cls):
+        # 沿用原提取器的key，保证下载记录（archive）中的ID不变
+        return BiliBiliIE.ie_key()
+
+    def extract_formats(self, play_info):
+        formats = super().extract_formats(play_info)
+        backup_urls = {}
+        for stream in [
+            *(play_info.get('durl') or []),
+            *((play_info.get('dash') or {}).get('video') or []),
+            *((play_info.get('dash') or {}).get('audio') or []),
+        ]:
+            if not isinstance(stream, dict):
+                continue
+            url = stream.get('baseUrl') or stream.get('base_url') or stream.get('url')
+            backups = stream.get('backupUrl') or stream.get('backup_url')
+            if url and backups:
+                backup_urls[url] = [backup for backup in backups if isinstance(backup, str)]
+        for fmt in formats:
+            if fmt.get('url') in backup_urls:
+                fmt['backup_urls'] = backup_urls[fmt['url']]
+        return formats
+
+
+# 记录当前线程所属的下载任务（音视频并行下载的子线程指向发起下载的线程）
+_stream_context = threading.local()
+
+
+def get_download_owner() -> int:
+    """
+    获取当前下载所属的线程ID
+
+    音视频流在子线程中并行下载时，返回发起该视频下载的线程ID，
+    便于进度回调把同一视频的多路流合并为一个进度。
+
+    Returns:
+        int: 线程ID
+    """
+    return getattr(_stream_context, 'owner', None) or threading.get_ident()
+
+
+class _SlowMirrorError(Exception):
+    """当前镜像速度低于阈值，需要切换镜像"""
+
+
+class SegmentedHttpFD(FileDownloader):
+    """
+    分段多连接HTTP下载器
+
+    CDN 对单个 TCP 连接限速时，把文件拆分为多个 Range 请求，用多个连接同时下载。
+    每个分段写入独立的 .segN 临时文件（支持断点续传），全部完成后按顺序拼接。
+    启用镜像优选时，下载前对候选CDN地址测速并选用最快的镜像，下载中速度持续过低则切换到下一个镜像。
+
+    额外参数（通过 YoutubeDL params 传入）：
+        segmented_connections: 分段（连接）数
+        cdn_mirror_selection: 是否启用CDN镜像优选
+        mirror_min_speed: 可选，单个连接的最低速度（字节/秒），低于该值时切换镜像
+        pause_check: 可选，下载线程每读取一块数据前调用，暂停时阻塞、任务取消时抛出异常
+        bandwidth_limiter: 可选，全局限速器（在 BiliYoutubeDL.urlopen 中接入，限速等待不计入镜像测速）
+    """
+
+    # 每个分段的最小大小，文件过小时减少分段数
+    MIN_SEGMENT_SIZE = 2 * 1024 * 1024
+    # 单次读取的数据块大小
+    CHUNK_SIZE = 256 * 1024
+    # 进度上报间隔（秒）
+    PROGRESS_INTERVAL = 0.25
+    # 镜像测速：下载的数据量、超时时间（秒）和最多测速的镜像数
+    PROBE_BYTES = 512 * 1024
+    PROBE_TIMEOUT = 5
+    MAX_PROBE_MIRRORS = 8
+    # 镜像切换：默认最低速度（字节/秒）和统计窗口（秒）
+    MIRROR_MIN_SPEED = 200 * 1024
+    MIRROR_SPEED_WINDOW = 8
+
+    @staticmethod
+    def supports(info_dict, params):
+        """判断该流能否使用分段下载（仅限普通HTTP直链）"""
+        return get_suitable_downloader(info_dict, params) is HttpFD
+
+    def real_download(self, filename, info_dict):
+        headers = dict(info_dict.get('http_headers') or {})
+        tmpfilename = self.temp_name(filename)
+
+        self._mirrors = [info_dict['url']]
+        self._mirror_index = 0
+        self._mirror_lock = threading.Lock()
+        if self.params.get('cdn_mirror_selection'):
+            self._mirrors = self._rank_mirrors(get_mirror_candidates(info_dict), headers)
+        url = self._mirrors[0]
+
+        total_bytes = self._probe_size(url, headers)
+        if not total_bytes:
+            # 服务器不支持Range请求或无法获取文件大小，退回普通下载
+            self.to_screen('[download] Server does not support range requests, falling back to single connection')
+            return self._fallback_download(filename, {**info_dict, 'url': url})
+
+        segment_count = max(1, min(
+            int(self.params.get('segmented_connections') or 1),
+            total_bytes // self.MIN_SEGMENT_SIZE or 1))
+        segment_size = -(-total_bytes // segment_count)  # 向上取整
+        segments = []
+        for index in range(segment_count):
+            start = index * segment_size
+            end = min(total_bytes, start + segment_size) - 1
+            seg_filename = f'{tmpfilename}.seg{index}'
+            # 已存在的分段文件从断点继续
+            done = min(self.filesize_or_none(seg_filename) or 0, end - start + 1)
+            segments.append({'start': start, 'end': end, 'filename': seg_filename, 'done': done})
+
+        self.report_destination(filename)
+        self.to_screen(f'[download] Downloading {total_bytes} bytes with {segment_count} connections')
+
+        stop_event = threading.Event()
+        errors = []
+
+        def segment_worker(segment):
+            try:
+                self._download_segment(headers, segment, stop_event)
+            except BaseException as e:
+                errors.append(e)
+                stop_event.set()
+
+        threads = [threading.Thread(target=segment_worker, args=(segment,), daemon=True) for segment in segments]
+        start_time = time.time()
+        resumed_bytes = sum(segment['done'] for segment in segments)
+        for thread in threads:
+            thread.start()
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(self.PROGRESS_INTERVAL)
+                downloaded_bytes = sum(segment['done'] for segment in segments)
+                elapsed = time.time() - start_time
+                speed = self.calc_speed(start_time, time.time(), downloaded_bytes - resumed_bytes)
+                # 进度回调中会处理暂停和取消
+                self._hook_progress({
+                    'status': 'downloading',
+                    'downloaded_bytes': downloaded_bytes,
+                    'total_bytes': total_bytes,
+                    'filename': filename,
+                    'tmpfilename': tmpfilename,
+                    'elapsed': elapsed,
+                    'speed': speed,
+                    'eta': self.calc_eta(speed, total_bytes - downloaded_bytes),
+                }, info_dict)
+        finally:
+            # 正常结束时各分段已完成；回调抛出异常（如取消下载）时通知各分段停止
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            raise errors[0]
+
+        downloaded_bytes = sum(segment['done'] for segment in segments)
+        if downloaded_bytes != total_bytes:
+            raise ContentTooShortError(downloaded_bytes, total_bytes)
+
+        # 按顺序拼接各分段
+        with open(tmpfilename, 'wb') as out_file:
+            for segment in segments:
+                with open(segment['filename'], 'rb') as seg_file:
+                    while True:
+                        chunk = seg_file.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        out_file.write(chunk)
+        for segment in segments:
+            self.try_remove(segment['filename'])
+
+        self.try_rename(tmpfilename, filename)
+        self._hook_progress({
+            'status': 'finished',
+            'downloaded_bytes': total_bytes,
+            'total_bytes': total_bytes,
+            'filename': filename,
+            'elapsed': time.time() - start_time,
+        }, info_dict)
+        return True
+
+    def _probe_size(self, url, headers):
+        """用 bytes=0-0 请求探测文件大小，同时确认服务器支持Range"""
+        try:
+            response = self.ydl.urlopen(Request(url, headers={**headers, 'Range': 'bytes=0-0'}))
+        except Exception as e:
+            self.report_warning(f'Unable to probe file size: {e}')
+            return None
+        try:
+            if response.status != 206:
+                return None
+            match = re.search(r'/(\d+)$', response.headers.get('Content-Range') or '')
+            return int(match.group(1)) if match else None
+        finally:
+            response.close()
+
+    def _download_segment(self, headers, segment, stop_event):
+        """下载单个分段，失败时从断点重试，当前镜像过慢时切换镜像"""
+        retries = self.params.get('retries', 10)
+        pause_check = self.params.get('pause_check')
+        check_speed = len(self._mirrors) > 1
+        min_speed = self.params.get('mirror_min_speed') or self.MIRROR_MIN_SPEED
+        length = segment['end'] - segment['start'] + 1
+        attempt = 0
+
+        while segment['done'] < length:
+            if stop_event.is_set():
+                return
+            url = self._current_mirror()
+            range_start = segment['start'] + segment['done']
+            try:
+                response = self.ydl.urlopen(Request(
+                    url, headers={**headers, 'Range': f'bytes={range_start}-{segment["end"]}'}))
+                try:
+                    if response.status != 206:
+                        raise DownloadError(f'Server ignored range request (HTTP {response.status})')
+                    window_start, window_bytes = time.time(), 0
+                    throttle_wait = getattr(response, 'throttle_wait', 0.0)
+                    with open(segment['filename'], 'ab') as seg_file:
+                        while segment['done'] < length:
+                            if stop_event.is_set():
+                                return
+                            if pause_check is not None:
+                                pause_start = time.time()
+                                pause_check()
+                                # 暂停的时间不计入测速窗口
+                                window_start += time.time() - pause_start
+                            chunk = response.read(min(self.CHUNK_SIZE, length - segment['done']))
+                            if not chunk:
+                                break
+                            # 限速造成的等待同样不计入测速窗口，避免限速时误判镜像过慢
+                            waited = getattr(response, 'throttle_wait', 0.0)
+                            window_start += waited - throttle_wait
+                            throttle_wait = waited
+                            seg_file.write(chunk)
+                            segment['done'] += len(chunk)
+                            window_bytes += len(chunk)
+
+                            window_elapsed = time.time() - window_start
+                            if check_speed and window_elapsed >= self.MIRROR_SPEED_WINDOW:
+                                if window_bytes / window_elapsed < min_speed:
+                                    raise _SlowMirrorError(window_bytes / window_elapsed)
+                                window_start, window_bytes = time.time(), 0
+                finally:
+                    response.close()
+                if segment['done'] < length:
+                    raise ContentTooShortError(segment['done'], length)
+            except _SlowMirrorError as e:
+                self._switch_mirror(url, f'速度过低 ({self.format_speed(e.args[0]).strip()})')
+            except (DownloadError, ContentTooShortError, OSError, RequestError) as e:
+                if len(self._mirrors) > 1:
+                    self._switch_mirror(url, f'请求失败 ({e})')
+                attempt += 1
+                if attempt > retries:
+                    raise
+                self.report_retry(e, attempt, retries)
+                # 其他分段出错或下载被取消时立即结束等待
+                stop_event.wait(min(2 ** attempt, 30))
+
+    def _current_mirror(self):
+        with self._mirror_lock:
+            return self._mirrors[self._mirror_index]
+
+    def _switch_mirror(self, failed_url, reason):
+        """当前镜像不可用时切换到下一个镜像（多个分段同时发现时只切换一次）"""
+        with self._mirror_lock:
+            if self._mirrors[self._mirror_index] != failed_url:
+                return
+            self._mirror_index = (self._mirror_index + 1) % len(self._mirrors)
+            new_url = self._mirrors[self._mirror_index]
+        self.to_screen(
+            f'[CDN] {urllib.parse.urlsplit(failed_url).netloc} {reason}，'
+            f'切换到镜像 {urllib.parse.urlsplit(new_url).netloc}')
+
+    def _probe_mirror(self, url, headers):
+        """
+        对单个镜像测速
+
+        Returns:
+            tuple: (延迟秒数, 速度字节/秒)，失败返回None
+        """
+        start_time = time.time()
+        try:
+            response = self.ydl.urlopen(Request(
+                url, headers={**headers, 'Range': f'bytes=0-{self.PROBE_BYTES - 1}'},
+                extensions={'timeout': self.PROBE_TIMEOUT}))
+        except Exception:
+            return None
+        try:
+            if response.status not in (200, 206):
+                return None
+            latency = time.time() - start_time
+            received = 0
+            while received < self.PROBE_BYTES and time.time() - start_time < self.PROBE_TIMEOUT:
+                chunk = response.read(min(64 * 1024, self.PROBE_BYTES - received))
+                if not chunk:
+                    break
+                received += len(chunk)
+            elapsed = max(time.time() - start_time - latency, 1e-3)
+            return latency, received / elapsed
+        except Exception:
+            return None
+        finally:
+            response.close()
+
+    def _rank_mirrors(self, candidates, headers):
+        """并行测速候选镜像，按速度从快到慢排序（测速失败的镜像被排除）"""
+        candidates = candidates[:self.MAX_PROBE_MIRRORS]
+        if len(candidates) <= 1:
+            return candidates
+        with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+            results = list(executor.map(lambda url: self._probe_mirror(url, headers), candidates))
+
+        ranked = sorted(
+            ((url, result) for url, result in zip(candidates, results) if result is not None),
+            key=lambda item: item[1][1], reverse=True)
+        if not ranked:
+            self.to_screen('[CDN] 所有镜像测速失败，使用默认地址')
+            return candidates[:1]
+
+        best_url, (latency, speed) = ranked[0]
+        self.to_screen(
+            f'[CDN] 已测速 {len(candidates)} 个镜像，选用 {urllib.parse.urlsplit(best_url).netloc}'
+            f'（延迟 {latency * 1000:.0f} ms，速度 {self.format_speed(speed).strip()}）')
+        return [url for url, _ in ranked]
+
+    def _fallback_download(self, filename, info_dict):
+        """使用yt-dlp自带的单连接HTTP下载器"""
+        fd = HttpFD(self.ydl, self.params)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        return fd.real_download(filename, info_dict)
+
+
+class BiliYoutubeDL(yt_dlp.YoutubeDL):
+    """扩展的YoutubeDL，支持同一视频的多路流并行下载、分段下载和CDN镜像优选"""
+
+    def __init__(self, params=None, auto_init=True):
+        super().__init__(params, auto_init)
+        if auto_init and self.params.get('cdn_mirror_selection'):
+            # 替换B站视频提取器，保留备用CDN地址供镜像测速使用
+            self.add_info_extractor(BiliBiliMirrorIE)
+        # 每个调用线程各自记录正在处理的多路流分组
+        self._stream_groups = threading.local()
+        # 每个调用线程最近处理完的视频（含最终文件路径），写入下载记录时使用
+        self._processed = threading.local()
+        # 每个调用线程最近一次的错误（异常对象或错误信息）
+        self._errors = threading.local()
+        # 每个调用线程写入或命中的下载记录ID，用于判断条目的下载结果
+        self._archived = threading.local()
+
+    def process_info(self, info_dict):
+        """处理单个视频；需要合并的多路流（如 bv+ba）改为并行下载"""
+        requested_formats = info_dict.get('requested_formats') or []
+        group = None
+        if self.params.get('parallel_streams', True) and len(requested_formats) > 1:
+            group = {'remaining': len(requested_formats), 'threads': [], 'results': []}
+        self._stream_groups.current = group
+        try:
+            result = super().process_info(info_dict)
+            # 保存副本：process_video_result 随后会从格式副本中删除与视频信息重复的字段
+            self._processed.info = dict(info_dict)
+            return result
+        finally:
+            self._stream_groups.current = None
+            # 容错：process_info 中途返回时，确保已启动的子线程结束
+            if group:
+                for thread in group['threads']:
+                    thread.join()
+
+    @functools.cached_property
+    def cookiejar(self):
+        """配置了Cookie缓存（cookie_cache）时，浏览器Cookie从缓存获取"""
+        cache = self.params.get('cookie_cache')
+        browser_spec = self.params.get('cookiesfrombrowser')
+        if cache is None or browser_spec is None or self.params.get('cookiefile') is not None:
+            return super().cookiejar
+        try:
+            return cache.get_jar(browser_spec, self)
+        except Exception as e:
+            # 与 yt-dlp 读取失败时的处理一致：输出错误并抛出 CookieLoadError
+            self.report_error(str(e), tb=''.join(traceback.format_exception(e)))
+            raise CookieLoadError('failed to load cookies') from e
+
+    @functools.cached_property
+    def _request_director(self):
+        """使用进程内共享的请求分发器，连接在实例之间复用（close() 时不会关闭）"""
+        return get_request_director(self)
+
+    def trouble(self, message=None, tb=None, is_error=True):
+        """记录错误（ignoreerrors 模式下错误不会抛出，调用方通过 pop_last_error 获取）"""
+        if is_error:
+            self._errors.last = sys.exc_info()[1] or message
+        return super().trouble(message, tb, is_error)
+
+    def pop_last_error(self):
+        """
+        取出当前线程最近一次的错误并清除
+
+        Returns:
+            BaseException | str | None: 异常对象（没有异常时为错误信息），没有错误时返回None
+        """
+        error = getattr(self._errors, 'last', None)
+        self._errors.last = None
+        return error
+
+    def pop_archived_ids(self):
+        """
+        取出当前线程写入或命中（已在记录中而跳过）的下载记录ID并清除
+
+        多P视频、合集等条目展开后每个视频各有一个记录ID（如 "bilibili BVxxx_p1"），
+        ignoreerrors 模式下以本次处理涉及的记录ID（且没有错误）判断条目是否完成。
+
+        Returns:
+            set: 下载记录ID集合
+        """
+        archived = getattr(self._archived, 'ids', None) or set()
+        self._archived.ids = set()
+        return archived
+
+    def _track_archive_id(self, info_dict):
+        archive_id = self._make_archive_id(info_dict)
+        if archive_id is not None:
+            if getattr(self._archived, 'ids', None) is None:
+                self._archived.ids = set()
+            self._archived.ids.add(archive_id)
+
+    def in_download_archive(self, info_dict):
+        """检查视频是否已下载；命中时记录到当前线程的记录ID中（已下载的视频也算作完成）"""
+        archived = super().in_download_archive(info_dict)
+        if archived:
+            self._track_archive_id(info_dict)
+        return archived
+
+    def is_entry_archived(self, entry):
+        """
+        列表条目是否已全部下载（不计入当前线程的记录ID）
+
+        多P视频在所有分P完成后才写入条目本身的记录（见 record_entry_archive），
+        因此只有全部分P都已下载的条目才会返回True。
+        """
+        return super().in_download_archive(entry)
+
+    def record_entry_archive(self, entry, archived_ids):
+        """
+        条目的所有视频都已下载（或已在记录中）时，为条目本身写入下载记录
+
+        Args:
+            entry: 列表条目
+            archived_ids: 处理该条目时的下载记录ID（pop_archived_ids 的结果）
+        """
+        archive_id = self._make_archive_id(entry)
+        if archive_id is None or archive_id in archived_ids or self.is_entry_archived(entry):
+            return
+        self.record_download_archive(entry)
+
+    def urlopen(self, req):
+        """
+        发送请求；配置了元数据缓存（metadata_cache）时，可缓存的接口请求优先使用缓存
+
+        配置了任务控制令牌（job_control）时，暂停期间请求阻塞在发送前，任务取消时抛出 JobCancelled；
+        返回的响应登记到任务，取消时关闭，正在读取的下载随即结束。
+        配置了限速器（bandwidth_limiter）时，响应的读取按全局速度上限限速。
+        配置了熔断器（circuit_breaker）时，所在域名熔断期间请求等待，返回 412/429 时计入熔断器。
+        """
+        control = self.params.get('job_control')
+        if control is not None:
+            control.checkpoint()
+        breaker = self.params.get('circuit_breaker')
+        if breaker is not None:
+            breaker.wait(get_host(req), control)
+        cache = self.params.get('metadata_cache')
+        if cache is None and isinstance(req, Request):
+            # 缓存刷新扩展只由元数据缓存处理，未配置缓存时移除（yt-dlp 会拒绝不认识的扩展）
+            req.extensions.pop(REFRESH_EXTENSION, None)
+        try:
+            if cache is None:
+                response = super().urlopen(req)
+            else:
+                response = cache.urlopen(req, super().urlopen, self.cookiejar)
+        except HTTPError as e:
+            if breaker is not None and e.status in RATE_LIMIT_STATUSES:
+                breaker.record_rate_limited(get_host(req), f'HTTP {e.status}')
+            raise
+        if control is not None:
+            control.register_response(response)
+        limiter = self.params.get('bandwidth_limiter')
+        if limiter is not None:
+            limiter.wrap_response(response)
+        return response
+
+    def record_download_archive(self, info_dict):
+        """写入下载记录；使用 DownloadArchive 时附带标题、画质、文件路径等元数据"""
+        self._track_archive_id(info_dict)
+        archive = self.params.get('download_archive')
+        if not isinstance(archive, DownloadArchive):
+            return super().record_download_archive(info_dict)
+        vid_id = self._make_archive_id(info_dict)
+        assert vid_id
+
+        # 调用时 info_dict 是选择格式前的视频信息，最终文件路径和画质在刚处理完的格式副本中
+        processed = getattr(self._processed, 'info', None) or {}
+        if processed.get('id') == info_dict.get('id'):
+            info_dict = {**info_dict, **processed}
+        self.write_debug(f'Adding to archive: {vid_id}')
+        archive.add(vid_id, info_dict)
+
+    def dl(self, name, info, subtitle=False, test=False):
+        """
+        下载单个文件
+
+        process_info 会依次对每一路流调用 dl。在多路流分组中，前几路流在子线程中启动后立即返回，
+        最后一路流在当前线程下载，并等待其他流全部完成后汇总结果，保证合并前所有文件已就绪。
+        """
+        group = getattr(self._stream_groups, 'current', None)
+        # 带 requested_formats 的调用表示由单个下载器（如ffmpeg）一次性下载全部流，不做拆分
+        if group is None or subtitle or test or info.get('requested_formats'):
+            return self._download_file(name, info, subtitle, test)
+
+        parent_dl = self._download_file
+        group['remaining'] -= 1
+
+        if group['remaining'] > 0:
+            owner = get_download_owner()
+            control = get_job_control()
+
+            def stream_worker():
+                _stream_context.owner = owner
+                # 子线程同样属于发起下载的任务（ffmpeg 等子进程登记到该任务）
+                bind_job_control(control)
+                try:
+                    group['results'].append((parent_dl(name, info), None))
+                except BaseException as e:
+                    group['results'].append(((False, False), e))
+
+            thread = threading.Thread(target=stream_worker, daemon=True)
+            group['threads'].append(thread)
+            thread.start()
+            # 真实结果在最后一路流返回时汇总
+            return True, False
+
+        try:
+            success, real_download = parent_dl(name, info)
+        finally:
+            for thread in group['threads']:
+                thread.join()
+
+        for (partial_success, partial_real_download), error in group['results']:
+            if error is not None:
+                raise error
+            success = success and partial_success
+            real_download = real_download or partial_real_download
+        return success, real_download
+
+    def _download_file(self, name, info, subtitle=False, test=False):
+        """下载单个文件，启用分段下载或CDN镜像优选时对HTTP直链使用自定义下载器"""
+        use_custom_fd = (int(self.params.get('segmented_connections') or 1) > 1
+                         or self.params.get('cdn_mirror_selection'))
+        if (use_custom_fd
+                and not subtitle and not test and name != '-'
+                and SegmentedHttpFD.supports(info, self.params)):
+            fd = SegmentedHttpFD(self, self.params)
+            for ph in self._progress_hooks:
+                fd.add_progress_hook(ph)
+            self.write_debug(f'Invoking {fd.FD_NAME} downloader on "{info["url"]}"')
+            new_info = self._copy_infodict(info)
+            if new_info.get('http_headers') is None:
+                new_info['http_headers'] = self._calc_headers(new_info)
+            return fd.download(name, new_info, subtitle)
+        return super().dl(name, info, subtitle, test)
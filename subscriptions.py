@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+订阅管理
+保存收藏夹、UP主空间等订阅源，后台定时检查新视频
+
+版本历史：
+==========
+
+v1.0 (2026-10-17)
+--------------
+- 初始版本
+  * 订阅列表保存在 subscriptions.json，程序重启后继续生效
+  * 每个订阅源可单独设置检查间隔，检查时间带随机抖动，相邻两次检查之间保持最小间隔，避免集中请求
+  * 只获取上次检查之后的新视频（列表从新到旧，遇到已见过的视频即停止）
+  * 记录每个订阅源的检查时间、新视频数、接口请求次数和错误信息
+  * 每个订阅源可设置下载优先级
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from playlist_pipeline import iter_playlist_entries
+from stream_downloader import BiliYoutubeDL
+
+
+class RequestCountingLogger:
+    """
+    静默的 yt-dlp 日志记录器，只统计接口请求次数
+
+    提取器每次请求接口前都会输出 "[提取器] ID: Downloading ..." 形式的提示，按此计数。
+    """
+
+    REQUEST_RE = re.compile(r'^\[[^\]]+\] [^:]+: Download')
+
+    def __init__(self):
+        self.api_requests = 0
+        self.last_error = None
+
+    def debug(self, msg):
+        if self.REQUEST_RE.match(msg):
+            self.api_requests += 1
+
+    def info(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        self.last_error = msg
+
+
+def poll_source(ydl_opts, subscription, max_seen_ids=20):
+    """
+    检查订阅源的新视频
+
+    列表按从新到旧的顺序逐页获取，遇到上次记录的任一视频ID即停止，通常只需请求第一页。
+    记录多个最近的视频ID，即使最新的视频被删除或取消收藏也能正确停止。
+    首次检查只记录当前最新的视频，由调用方对整个订阅源做一次完整同步。
+
+    Args:
+        ydl_opts: yt-dlp 配置（代理、Cookie等）
+        subscription: 订阅信息字典
+        max_seen_ids: 记录的最近视频ID数
+
+    Returns:
+        dict: {'title', 'new_entries', 'seen_ids', 'initial', 'api_requests'}
+    """
+    logger = RequestCountingLogger()
+    seen_ids = subscription.get('seen_ids') or []
+    initial = not seen_ids
+    new_entries = []
+    latest_ids = []
+
+    with BiliYoutubeDL({**ydl_opts, 'logger': logger, 'ignoreerrors': False}) as ydl:
+        info = ydl.extract_info(subscription['url'], download=False, process=False)
+        if not info or 'entries' not in info:
+            raise ValueError('订阅链接不是收藏夹或UP主空间等列表')
+
+        for entry in iter_playlist_entries(info['entries']):
+            entry_id = entry.get('id') or entry.get('url')
+            if entry_id in seen_ids:
+                break
+            if len(latest_ids) < max_seen_ids:
+                latest_ids.append(entry_id)
+            if initial:
+                # 首次检查只需要最新的若干个视频作为基准，无需遍历整个列表
+                if len(latest_ids) >= max_seen_ids:
+                    break
+                continue
+            new_entries.append(entry)
+
+    return {
+        'title': info.get('title') or subscription.get('title'),
+        'new_entries': new_entries,
+        'seen_ids': (latest_ids + seen_ids)[:max_seen_ids],
+        'initial': initial,
+        'api_requests': logger.api_requests,
+    }
+
+
+class SubscriptionStore:
+    """
+    订阅列表（JSON文件），所有读写线程安全
+
+    每个订阅源是一个字典：
+        url, title, interval（检查间隔，分钟）, priority（下载优先级）, next_poll, last_poll,
+        seen_ids（最近的视频ID）, last_new（上次发现的新视频数）,
+        last_api_requests / total_api_requests（接口请求次数）, last_error
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._subscriptions = []
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._subscriptions = json.load(f)
+            except (OSError, ValueError):
+                self._subscriptions = []
+
+    def _save(self):
+        # 先写临时文件再替换，避免写入中途退出导致订阅列表损坏
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._subscriptions, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def list(self):
+        """返回所有订阅的副本"""
+        with self._lock:
+            return [dict(subscription) for subscription in self._subscriptions]
+
+    def add(self, url, interval, priority=0):
+        """
+        添加订阅（已存在时只更新检查间隔和优先级）
+
+        Returns:
+            bool: 是否为新订阅
+        """
+        with self._lock:
+            for subscription in self._subscriptions:
+                if subscription['url'] == url:
+                    subscription['interval'] = interval
+                    subscription['priority'] = priority
+                    self._save()
+                    return False
+            self._subscriptions.append({
+                'url': url,
+                'title': None,
+                'interval': interval,
+                'priority': priority,
+                'next_poll': time.time(),
+                'last_poll': None,
+                'seen_ids': [],
+                'last_new': 0,
+                'last_api_requests': 0,
+                'total_api_requests': 0,
+                'last_error': None,
+            })
+            self._save()
+            return True
+
+    def remove(self, url):
+        with self._lock:
+            self._subscriptions = [s for s in self._subscriptions if s['url'] != url]
+            self._save()
+
+    def update(self, url, **fields):
+        with self._lock:
+            for subscription in self._subscriptions:
+                if subscription['url'] == url:
+                    subscription.update(fields)
+                    self._save()
+                    return
+
+    def next_due(self):
+        """返回下次检查时间最早的订阅（副本），没有订阅时返回None"""
+        with self._lock:
+            if not self._subscriptions:
+                return None
+            return dict(min(self._subscriptions, key=lambda s: s.get('next_poll') or 0))
+
+
+class SubscriptionScheduler:
+    """
+    订阅检查调度器（后台线程）
+
+    按各订阅源的下次检查时间依次检查，一次只检查一个源；
+    相邻两次检查至少间隔 MIN_POLL_GAP 秒，下次检查时间 = 间隔 x (1 ± JITTER)，
+    多个订阅源的检查时间会逐渐错开，不会同时发出大量请求。
+    """
+
+    # 检查间隔的随机抖动比例
+    JITTER = 0.2
+    # 相邻两次检查的最小间隔（秒）
+    MIN_POLL_GAP = 5
+    # 没有订阅时的空闲等待时间（秒）
+    IDLE_WAIT = 60
+
+    def __init__(self, store, poll):
+        """
+        Args:
+            store: SubscriptionStore
+            poll: 检查函数 poll(subscription) -> dict，返回需要更新到订阅信息中的字段
+        """
+        self.store = store
+        self.poll = poll
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def wake(self):
+        """订阅列表变化（添加、立即检查）时唤醒调度线程重新计算等待时间"""
+        self._wake_event.set()
+
+    def poll_now(self, url):
+        """将订阅源安排为立即检查"""
+        self.store.update(url, next_poll=0)
+        self.wake()
+
+    def _wait(self, timeout):
+        self._wake_event.wait(timeout)
+        self._wake_event.clear()
+
+    def _run(self):
+        last_poll_end = 0
+        while not self._stop_event.is_set():
+            subscription = self.store.next_due()
+            if subscription is None:
+                self._wait(self.IDLE_WAIT)
+                continue
+
+            now = time.time()
+            delay = max((subscription.get('next_poll') or 0) - now, last_poll_end + self.MIN_POLL_GAP - now)
+            if delay > 0:
+                self._wait(delay)
+                continue
+
+            fields = {}
+            try:
+                fields = self.poll(subscription) or {}
+                fields['last_error'] = None
+            except Exception as e:
+                fields['last_error'] = str(e)
+
+            last_poll_end = time.time()
+            interval = subscription['interval'] * 60
+            fields['last_poll'] = last_poll_end
+            fields['next_poll'] = last_poll_end + interval * random.uniform(1 - self.JITTER, 1 + self.JITTER)
+            self.store.update(subscription['url'], **fields)